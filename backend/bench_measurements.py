@@ -0,0 +1,144 @@
+# bench_measurements.py
+"""
+Benchmark da consulta de janela (jogador, métrica, intervalo de recorded_at)
+em measurements, antes e depois do índice composto + partições mensais.
+
+Cria duas tabelas num schema separado, com os mesmos dados sintéticos:
+  - plain: layout antigo (PK id, índice só em player_id)
+  - partitioned: RANGE mensal em recorded_at + (player_id, metric, recorded_at)
+
+Uso:
+    python bench_measurements.py --rows 10000000 --players 2000 --queries 300
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+
+from database import engine
+
+METRICS = ["hrv_rmssd", "total_distance", "sprint_distance", "player_load", "max_speed"]
+WINDOW = timedelta(days=14)
+
+COLUMNS = "id BIGINT, player_id UUID, metric VARCHAR, value FLOAT, unit VARCHAR, recorded_at TIMESTAMPTZ, meta JSON"
+
+
+async def setup(schema: str, rows: int, players: int, days: int, end: datetime) -> None:
+    start = end - timedelta(days=days)
+    async with engine.begin() as conn:
+        await conn.execute(text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
+        await conn.execute(text(f"CREATE SCHEMA {schema}"))
+        await conn.execute(text(f"CREATE TABLE {schema}.players (n INT PRIMARY KEY, id UUID NOT NULL)"))
+        await conn.execute(
+            text(f"INSERT INTO {schema}.players VALUES (:n, :id)"),
+            [{"n": n, "id": uuid.uuid4()} for n in range(players)],
+        )
+
+        await conn.execute(text(f"CREATE TABLE {schema}.plain ({COLUMNS}, PRIMARY KEY (id))"))
+        await conn.execute(text(
+            f"CREATE TABLE {schema}.partitioned ({COLUMNS}, PRIMARY KEY (id, recorded_at)) "
+            f"PARTITION BY RANGE (recorded_at)"
+        ))
+        month = datetime(start.year, start.month, 1, tzinfo=timezone.utc)
+        while month <= end:
+            nxt = datetime(month.year + (month.month == 12), month.month % 12 + 1, 1, tzinfo=timezone.utc)
+            await conn.execute(text(
+                f"CREATE TABLE {schema}.partitioned_y{month.year}m{month.month:02d} "
+                f"PARTITION OF {schema}.partitioned FOR VALUES FROM ('{month.isoformat()}') TO ('{nxt.isoformat()}')"
+            ))
+            month = nxt
+
+    metrics = "ARRAY[" + ",".join(f"'{m}'" for m in METRICS) + "]"
+    batch = 1_000_000
+    for offset in range(0, rows, batch):
+        size = min(batch, rows - offset)
+        async with engine.begin() as conn:
+            await conn.execute(text(
+                f"INSERT INTO {schema}.plain "
+                f"SELECT g, p.id, ({metrics})[1 + g % {len(METRICS)}], random() * 100, 'u', "
+                f"       CAST(:start AS timestamptz) + random() * (CAST(:end AS timestamptz) - CAST(:start AS timestamptz)), '{{}}'::json "
+                f"FROM generate_series(CAST(:first AS bigint), CAST(:last AS bigint)) g "
+                f"JOIN {schema}.players p ON p.n = g % {players}"
+            ), {"start": start, "end": end, "first": offset + 1, "last": offset + size})
+        print(f"  {offset + size:,} linhas geradas")
+
+    async with engine.begin() as conn:
+        await conn.execute(text(f"INSERT INTO {schema}.partitioned SELECT * FROM {schema}.plain"))
+        await conn.execute(text(f"CREATE INDEX ON {schema}.plain (player_id)"))
+        await conn.execute(text(f"CREATE INDEX ON {schema}.partitioned (player_id, metric, recorded_at)"))
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text(f"VACUUM ANALYZE {schema}.plain"))
+        await conn.execute(text(f"VACUUM ANALYZE {schema}.partitioned"))
+
+
+async def run_queries(schema: str, table: str, samples: list) -> list:
+    q = text(
+        f"SELECT count(*), avg(value), stddev_pop(value) FROM {schema}.{table} "
+        f"WHERE player_id = :pid AND metric = :metric AND recorded_at >= :since AND recorded_at < :until"
+    )
+    timings = []
+    async with engine.connect() as conn:
+        for pid, metric, until in samples:
+            started = time.perf_counter()
+            await conn.execute(q, {"pid": pid, "metric": metric, "since": until - WINDOW, "until": until})
+            timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def report(name: str, timings: list) -> None:
+    timings = sorted(timings)
+    pct = lambda p: timings[min(len(timings) - 1, int(len(timings) * p))]
+    print(
+        f"{name:<12} p50={statistics.median(timings):8.2f} ms  p95={pct(0.95):8.2f} ms  "
+        f"p99={pct(0.99):8.2f} ms  max={timings[-1]:8.2f} ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark da consulta de janela em measurements.")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--players", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=730, help="Período coberto pelos dados sintéticos.")
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--schema", default="bench_measurements")
+    parser.add_argument("--reuse", action="store_true", help="Reaproveita as tabelas de uma execução anterior.")
+    parser.add_argument("--keep", action="store_true", help="Não apaga o schema ao final.")
+    args = parser.parse_args()
+
+    end = datetime.now(timezone.utc)
+    if not args.reuse:
+        print(f"📦 Gerando {args.rows:,} medições em {args.schema}...")
+        started = time.perf_counter()
+        await setup(args.schema, args.rows, args.players, args.days, end)
+        print(f"   pronto em {time.perf_counter() - started:.1f}s")
+
+    async with engine.connect() as conn:
+        player_ids = (await conn.execute(text(f"SELECT id FROM {args.schema}.players"))).scalars().all()
+    rng = random.Random(42)
+    samples = [
+        (rng.choice(player_ids), rng.choice(METRICS), end - timedelta(days=rng.uniform(0, args.days - 14)))
+        for _ in range(args.queries)
+    ]
+
+    # Aquecimento: mesma quantidade de cache para as duas tabelas
+    for table in ("plain", "partitioned"):
+        await run_queries(args.schema, table, samples[:20])
+
+    print(f"⏱️ {args.queries} consultas de janela de {WINDOW.days} dias:")
+    report("antes", await run_queries(args.schema, "plain", samples))
+    report("depois", await run_queries(args.schema, "partitioned", samples))
+
+    if not args.keep:
+        async with engine.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA {args.schema} CASCADE"))
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -11,6 +11,38 @@ class Settings(BaseSettings):
     JWT_SECRET: str
     JWT_ALG: str = "HS256"
     ACCESS_TOKEN_EXPIRE_HOURS: int = 8
+    DB_POOL_SIZE: int = 5  # conexões mantidas abertas por processo
+    DB_MAX_OVERFLOW: int = 10  # conexões extras sob pico, fechadas ao voltar ao pool
+    DB_POOL_TIMEOUT: float = 30.0  # segundos esperando uma conexão livre antes de erro
+    DB_POOL_RECYCLE: int = 1800  # recicla conexões mais velhas que isso (-1 desliga)
+    DB_POOL_PRE_PING: bool = True  # testa a conexão no checkout e descarta as mortas
+    DB_PGBOUNCER: bool = False  # pgbouncer em modo transaction (Supabase pooler): sem cache de statements
+    INGEST_JOB_WORKERS: int = 4
+    INGEST_JOBS_PER_USER: int = 2  # jobs rodando por técnico, somando todos os workers
+    INGEST_JOB_HEARTBEAT_SECONDS: int = 15  # job sem heartbeat por 4x isso é dado como órfão
+    AUTH_USER_CACHE_TTL_SECONDS: int = 60  # 0 desliga o cache de usuário
+    AUTH_USER_CACHE_MAX_ENTRIES: int = 10000
+    AUTH_STATELESS: bool = False  # confia nas claims sub/role/uid do JWT, sem consultar o banco
+    PASSWORD_POOL_WORKERS: int = 2  # threads dedicadas ao bcrypt
+    PASSWORD_POOL_MAX_QUEUE: int = 64
+    LOGIN_RATE_LIMIT: int = 10  # tentativas por IP e falhas por email na janela (0 desliga)
+    LOGIN_RATE_WINDOW_SECONDS: int = 60
+    TRUSTED_PROXIES: str = ""  # IPs/CIDRs (vírgula) cujo X-Forwarded-For é aceito no rate limit
+    RANKING_CACHE_TTL_SECONDS: int = 300  # 0 desliga o cache de rankings
+    AI_CACHE_BACKEND: str = "memory"  # memory | sql | off
+    AI_CACHE_TTL_SECONDS: int = 6 * 3600
+    AI_CACHE_MAX_ENTRIES: int = 1000
+    AI_BATCH_CONCURRENCY: int = 5  # chamadas simultâneas ao Gemini no /api/analyze/batch
+    AI_BATCH_MAX_PLAYERS: int = 60
+    HTTP_MAX_CONNECTIONS: int = 20
+    HTTP_MAX_KEEPALIVE: int = 10
+    HTTP_KEEPALIVE_EXPIRY: float = 60.0
+    HTTP2_ENABLED: bool = True
+    HTTP_CONNECT_TIMEOUT: float = 5.0
+    HTTP_READ_TIMEOUT: float = 90.0
+    HTTP_MAX_RETRIES: int = 3
+    HTTP_BACKOFF_BASE: float = 0.5
+    HTTP_BACKOFF_MAX: float = 10.0
 
     @property
     def cors_origins(self) -> List[str]:
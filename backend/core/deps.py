@@ -1,16 +1,139 @@
-from typing import AsyncGenerator
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, AsyncGenerator, Dict, Optional
+
+import asyncpg
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from jose import jwt, JWTError
-from sqlalchemy import select
+from sqlalchemy import select, text
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from database import SessionLocal
+from database import SessionLocal, db_url
 import models
 from .config import settings
 
+logger = logging.getLogger("uvicorn")
+
+# Canal do NOTIFY que invalida o cache de usuário em todos os processos
+# (payload = email; vazio limpa tudo)
+USER_CACHE_CHANNEL = "user_cache_invalidate"
+# Espera antes de reabrir a conexão do LISTEN que caiu
+LISTEN_RECONNECT_SECONDS = 5.0
+
 bearer_scheme = HTTPBearer(auto_error=False)
 
+
+class UserCache:
+    """
+    Cache em processo (LRU + TTL) do usuário autenticado, chave = `sub` do JWT.
+
+    Guarda um snapshot desanexado de sessão (models.User transitório), então
+    o que sai daqui serve só para leitura. Mutações de usuário devem chamar
+    `notify_user_changed` na mesma transação: o NOTIFY chega a todos os
+    processos (inclusive fora do servidor, ex.: reset_password.py), que
+    escutam o canal com uma conexão própria (`listen`). Sem LISTEN (pgbouncer
+    em modo transaction, conexão caída) a defasagem máxima volta a ser o TTL.
+    """
+
+    def __init__(self, ttl: int, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, tuple[float, models.User]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.stateless = 0
+        self.db_lookup_seconds = 0.0
+        self._listener: Optional[asyncpg.Connection] = None
+        self._closing = False
+
+    def get(self, email: str) -> Optional[models.User]:
+        if self.ttl <= 0:
+            return None
+        item = self._data.get(email)
+        if item is None or item[0] < time.monotonic():
+            self._data.pop(email, None)
+            return None
+        self._data.move_to_end(email)
+        return item[1]
+
+    def set(self, user: models.User) -> None:
+        if self.ttl <= 0:
+            return
+        snapshot = models.User(
+            id=user.id,
+            email=user.email,
+            password_hash=user.password_hash,
+            role=user.role,
+            created_at=user.created_at,
+        )
+        self._data[user.email] = (time.monotonic() + self.ttl, snapshot)
+        self._data.move_to_end(user.email)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def invalidate(self, email: Optional[str] = None) -> None:
+        if email is None:
+            self._data.clear()
+        else:
+            self._data.pop(email.lower(), None)
+
+    async def listen(self) -> None:
+        if self.ttl <= 0 or settings.DB_PGBOUNCER:
+            return
+        self._closing = False
+        try:
+            self._listener = await asyncpg.connect(db_url.replace("+asyncpg", "", 1))
+            await self._listener.add_listener(USER_CACHE_CHANNEL, self._on_notify)
+            self._listener.add_termination_listener(self._on_listener_lost)
+        except Exception as e:
+            self._listener = None
+            logger.warning(f"LISTEN {USER_CACHE_CHANNEL} indisponível ({e!r}); cache de usuário só expira pelo TTL")
+
+    async def close(self) -> None:
+        self._closing = True
+        if self._listener is not None:
+            await self._listener.close()
+            self._listener = None
+
+    def _on_notify(self, _conn, _pid, _channel, payload: str) -> None:
+        self.invalidate(payload or None)
+
+    def _on_listener_lost(self, _conn) -> None:
+        # Notificações podem ter se perdido enquanto a conexão caía
+        self._listener = None
+        self.invalidate()
+        if not self._closing:
+            asyncio.get_running_loop().call_later(LISTEN_RECONNECT_SECONDS, lambda: asyncio.ensure_future(self.listen()))
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        avg_lookup = self.db_lookup_seconds / self.misses if self.misses else None
+        skipped = self.hits + self.stateless
+        return {
+            "mode": "stateless" if settings.AUTH_STATELESS else "cached",
+            "hits": self.hits,
+            "misses": self.misses,
+            "stateless": self.stateless,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "entries": len(self._data),
+            "ttl_seconds": self.ttl,
+            "listening": self._listener is not None,
+            "avg_db_lookup_ms": round(avg_lookup * 1000, 3) if avg_lookup is not None else None,
+            # Estimativa: consultas evitadas x custo médio observado de uma consulta
+            "db_time_saved_ms": round(skipped * avg_lookup * 1000, 1) if avg_lookup is not None else None,
+        }
+
+
+user_cache = UserCache(settings.AUTH_USER_CACHE_TTL_SECONDS, settings.AUTH_USER_CACHE_MAX_ENTRIES)
+
+async def notify_user_changed(db: AsyncSession, email: Optional[str] = None) -> None:
+    """Invalida o usuário no cache de todos os processos quando a transação de `db` for commitada."""
+    await db.execute(text("SELECT pg_notify(:channel, :email)"), {"channel": USER_CACHE_CHANNEL, "email": (email or "").lower()})
+
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     async with SessionLocal() as session:
         yield session
@@ -20,10 +143,7 @@ async def get_user_by_email(db: AsyncSession, email: str):
     result = await db.execute(select(models.User).where(models.User.email == normalized_email))
     return result.scalar_one_or_none()
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
-    db: AsyncSession = Depends(get_db),
-) -> models.User:
+async def _authenticate(credentials: Optional[HTTPAuthorizationCredentials], db: AsyncSession, allow_stateless: bool) -> models.User:
     if not credentials or credentials.scheme.lower() != "bearer":
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -40,7 +160,7 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    email = payload.get("sub")
+    email = (payload.get("sub") or "").lower()
     if not email:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -48,11 +168,44 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    # Modo stateless: confia nas claims assinadas (sem ida ao banco).
+    # Tokens antigos, sem role/uid, caem no caminho normal.
+    if allow_stateless and settings.AUTH_STATELESS and payload.get("role") and payload.get("uid"):
+        user_cache.stateless += 1
+        return models.User(id=uuid.UUID(payload["uid"]), email=email, role=payload["role"], password_hash="")
+
+    user = user_cache.get(email)
+    if user is not None:
+        user_cache.hits += 1
+        return user
+
+    started = time.perf_counter()
     user = await get_user_by_email(db, email)
+    user_cache.db_lookup_seconds += time.perf_counter() - started
+    user_cache.misses += 1
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User no longer exists",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    user_cache.set(user)
     return user
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
+    db: AsyncSession = Depends(get_db),
+) -> models.User:
+    """
+    Usuário autenticado. Com AUTH_STATELESS só id, email e role vêm
+    preenchidos (direto das claims do JWT); rotas que leem outras colunas
+    usam get_current_user_record.
+    """
+    return await _authenticate(credentials, db, allow_stateless=True)
+
+async def get_current_user_record(
+    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
+    db: AsyncSession = Depends(get_db),
+) -> models.User:
+    """Como get_current_user, mas sempre com todas as colunas (cache ou banco), mesmo no modo stateless."""
+    return await _authenticate(credentials, db, allow_stateless=False)
@@ -0,0 +1,97 @@
+import asyncio
+import logging
+import random
+from typing import Optional
+
+import httpx
+
+from .config import settings
+
+logger = logging.getLogger("uvicorn")
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# Cliente HTTP compartilhado para chamadas externas (Gemini e futuras integrações).
+# Criado no startup e fechado no shutdown; mantém conexões/TLS vivos entre requisições.
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _build_client() -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=settings.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+    )
+    timeout = httpx.Timeout(
+        connect=settings.HTTP_CONNECT_TIMEOUT,
+        read=settings.HTTP_READ_TIMEOUT,
+        write=settings.HTTP_CONNECT_TIMEOUT,
+        pool=settings.HTTP_CONNECT_TIMEOUT,
+    )
+    http2 = settings.HTTP2_ENABLED
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("HTTP2_ENABLED, mas o pacote 'h2' não está instalado; usando HTTP/1.1.")
+            http2 = False
+    return httpx.AsyncClient(http2=http2, limits=limits, timeout=timeout)
+
+
+async def init_http_client() -> None:
+    global _client
+    if _client is None:
+        _client = _build_client()
+
+
+async def close_http_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Cliente compartilhado (criado sob demanda fora do ciclo do app, ex.: scripts)."""
+    global _client
+    if _client is None:
+        _client = _build_client()
+    return _client
+
+
+def _backoff_delay(attempt: int, response: Optional[httpx.Response]) -> float:
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), settings.HTTP_BACKOFF_MAX)
+    # Exponencial com "full jitter"
+    cap = min(settings.HTTP_BACKOFF_MAX, settings.HTTP_BACKOFF_BASE * (2 ** attempt))
+    return random.uniform(0, cap)
+
+
+async def request_with_retry(method: str, url: str, **kwargs) -> httpx.Response:
+    """
+    Requisição pelo cliente compartilhado com retry (backoff exponencial + jitter)
+    em 429/5xx e erros de transporte. A última resposta/erro é devolvida/relançada.
+    """
+    client = get_http_client()
+    attempt = 0
+    while True:
+        response = None
+        try:
+            response = await client.request(method, url, **kwargs)
+            if response.status_code not in RETRY_STATUS or attempt >= settings.HTTP_MAX_RETRIES:
+                return response
+        except httpx.TransportError:
+            if attempt >= settings.HTTP_MAX_RETRIES:
+                raise
+        delay = _backoff_delay(attempt, response)
+        logger.warning(
+            "Retry %s/%s para %s em %.2fs (%s)",
+            attempt + 1, settings.HTTP_MAX_RETRIES, httpx.URL(url).host, delay,
+            response.status_code if response is not None else "erro de transporte",
+        )
+        if response is not None:
+            await response.aclose()
+        await asyncio.sleep(delay)
+        attempt += 1
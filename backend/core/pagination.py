@@ -0,0 +1,25 @@
+import base64
+from datetime import datetime
+from typing import Any, Callable, Tuple
+from uuid import UUID
+
+from fastapi import HTTPException
+
+# ------------------------------------------------------------------------------
+# Cursores opacos para paginação keyset em (timestamp, id)
+# ------------------------------------------------------------------------------
+
+
+def encode_cursor(ts: datetime, key: Any) -> str:
+    raw = f"{ts.isoformat()}|{key}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, key_type: Callable[[str], Any] = UUID) -> Tuple[datetime, Any]:
+    """Inverso de encode_cursor; 400 se o cursor foi adulterado."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        ts, key = raw.split("|", 1)
+        return datetime.fromisoformat(ts), key_type(key)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
@@ -0,0 +1,113 @@
+import ipaddress
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Union
+
+from fastapi import HTTPException, Request, status
+
+from .config import settings
+
+# Quantas chaves (IP / email) ficam em memória
+MAX_KEYS = 50000
+
+
+class SlidingWindowLimiter:
+    """
+    Limite de N eventos por janela de `window` segundos, por chave, em processo.
+    Usado em /auth/login e /auth/register para que o custo do bcrypt não
+    possa ser usado para esgotar o pool de senhas.
+    """
+
+    def __init__(self, limit: int, window: float, max_keys: int = MAX_KEYS):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._events: "OrderedDict[str, deque]" = OrderedDict()
+        self.rejected = 0
+
+    def check(self, *keys: str) -> None:
+        """429 se alguma das chaves já estourou o limite na janela (não registra nada)."""
+        if self.limit <= 0:
+            return
+        now = time.monotonic()
+        retry_after = 0.0
+        for key in keys:
+            events = self._events.get(key)
+            if events is None:
+                continue
+            while events and events[0] <= now - self.window:
+                events.popleft()
+            if len(events) >= self.limit:
+                retry_after = max(retry_after, events[0] + self.window - now)
+        if retry_after:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many attempts, try again later",
+                headers={"Retry-After": str(int(retry_after) + 1)},
+            )
+
+    def record(self, *keys: str) -> None:
+        """Registra um evento para cada chave."""
+        if self.limit <= 0:
+            return
+        now = time.monotonic()
+        for key in keys:
+            events = self._events.setdefault(key, deque())
+            events.append(now)
+            self._events.move_to_end(key)
+        while len(self._events) > self.max_keys:
+            self._events.popitem(last=False)
+
+    def hit(self, *keys: str) -> None:
+        """Registra uma tentativa para cada chave; 429 se alguma estourou o limite."""
+        self.check(*keys)
+        self.record(*keys)
+
+    def reset(self, *keys: str) -> None:
+        for key in keys:
+            self._events.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "window_seconds": self.window,
+            "tracked_keys": len(self._events),
+            "rejected": self.rejected,
+        }
+
+
+def _parse_networks(value: str) -> List[Union[ipaddress.IPv4Network, ipaddress.IPv6Network]]:
+    return [ipaddress.ip_network(item.strip(), strict=False) for item in value.split(",") if item.strip()]
+
+
+def _is_trusted(host: str) -> bool:
+    try:
+        addr = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(addr in net for net in trusted_proxies)
+
+
+def client_ip(request: Request) -> str:
+    """
+    IP do cliente para o rate limit. X-Forwarded-For / X-Real-IP só são lidos
+    quando a conexão vem de um proxy listado em TRUSTED_PROXIES (senão qualquer
+    cliente forjaria o cabeçalho); no X-Forwarded-For vale o endereço mais à
+    direita que não é de um proxy confiável. Alternativa: rodar o uvicorn com
+    --proxy-headers --forwarded-allow-ips, que já reescreve request.client.
+    """
+    peer = request.client.host if request.client else "unknown"
+    if not _is_trusted(peer):
+        return peer
+    forwarded = [h.strip() for h in request.headers.get("x-forwarded-for", "").split(",") if h.strip()]
+    for host in reversed(forwarded):
+        if not _is_trusted(host):
+            return host
+    if forwarded:
+        return forwarded[0]
+    return request.headers.get("x-real-ip", "").strip() or peer
+
+
+trusted_proxies = _parse_networks(settings.TRUSTED_PROXIES)
+login_limiter = SlidingWindowLimiter(settings.LOGIN_RATE_LIMIT, settings.LOGIN_RATE_WINDOW_SECONDS)
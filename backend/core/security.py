@@ -1,5 +1,9 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Any, Dict, Optional
+from fastapi import HTTPException, status
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from .config import settings
@@ -15,6 +19,87 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     except ValueError:
         return False
 
+class PasswordPool:
+    """
+    Executa bcrypt (hash/verify, ~200 ms cada) em um pool de threads dedicado,
+    fora do event loop. Com mais de PASSWORD_POOL_MAX_QUEUE tarefas esperando,
+    novas requisições recebem 503 em vez de acumular latência.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+
+    async def _run(self, fn, *args):
+        if self.queued >= self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication service busy, try again shortly",
+                headers={"Retry-After": "1"},
+            )
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        loop = asyncio.get_running_loop()
+        submitted = time.perf_counter()
+
+        def job():
+            # Na thread do pool: contadores só são alterados no event loop
+            loop.call_soon_threadsafe(self._started, time.perf_counter() - submitted)
+            return fn(*args)
+
+        self.queued += 1
+        future = self._executor.submit(job)
+        future.add_done_callback(lambda f: loop.call_soon_threadsafe(self._finished, f.cancelled()))
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            future.cancel()  # ainda na fila: não chega a rodar
+            raise
+
+    def _started(self, waited: float) -> None:
+        self.queued -= 1
+        self.running += 1
+        self.wait_seconds += waited
+
+    def _finished(self, cancelled: bool) -> None:
+        if cancelled:
+            self.queued -= 1
+        else:
+            self.running -= 1
+            self.completed += 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "queue_depth": self.queued,
+            "running": self.running,
+            "max_queue": self.max_queue,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.wait_seconds / self.completed * 1000, 1) if self.completed else None,
+        }
+
+
+password_pool = PasswordPool(settings.PASSWORD_POOL_WORKERS, settings.PASSWORD_POOL_MAX_QUEUE)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     expire_delta = expires_delta or timedelta(hours=settings.ACCESS_TOKEN_EXPIRE_HOURS)
@@ -1,5 +1,13 @@
+import time
+import uuid
+from collections import deque
+from typing import Any, Dict
+
+from sqlalchemy import event, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from core.config import settings
 
 # Fix for Supabase/Render URLs that use postgres:// instead of postgresql://
@@ -9,13 +17,119 @@ if db_url and db_url.startswith("postgres://"):
 elif db_url and db_url.startswith("postgresql://"):
      db_url = db_url.replace("postgresql://", "postgresql+asyncpg://", 1)
 
+# Amostras recentes de espera no checkout usadas no p95
+WAIT_SAMPLES = 1000
+
+
+class PoolStats:
+    """Contadores do pool de conexões: espera no checkout, timeouts, reconexões."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.connects = 0
+        self.invalidated = 0
+        self.peak_checked_out = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self._recent = deque(maxlen=WAIT_SAMPLES)
+
+    def record_wait(self, seconds: float) -> None:
+        self.checkouts += 1
+        self.wait_seconds += seconds
+        self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+        self._recent.append(seconds)
+
+    def stats(self, pool) -> Dict[str, Any]:
+        recent = sorted(self._recent)
+        p95 = recent[min(len(recent) - 1, int(len(recent) * 0.95))] if recent else 0.0
+        capacity = pool.size() + max(pool._max_overflow, 0)
+        checked_out = pool.checkedout()
+        return {
+            "pool_size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "checked_out": checked_out,
+            "idle": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "utilization": round(checked_out / capacity, 3) if capacity else None,
+            "peak_checked_out": self.peak_checked_out,
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "connects": self.connects,
+            "invalidated": self.invalidated,
+            "avg_wait_ms": round(self.wait_seconds / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+            "p95_wait_ms": round(p95 * 1000, 3),
+            "max_wait_ms": round(self.max_wait_seconds * 1000, 3),
+        }
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """QueuePool que mede quanto cada checkout esperou por uma conexão livre."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except PoolTimeoutError:
+            pool_stats.timeouts += 1
+            raise
+        pool_stats.record_wait(time.perf_counter() - started)
+        pool_stats.peak_checked_out = max(pool_stats.peak_checked_out, self.checkedout())
+        return conn
+
+
+def _engine_options() -> Dict[str, Any]:
+    options: Dict[str, Any] = {
+        "poolclass": TimedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+    if settings.DB_PGBOUNCER:
+        # pgbouncer em modo transaction: uma sessão pode trocar de backend entre
+        # transações, então nada de prepared statements em cache nem nomes fixos
+        options["connect_args"] = {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+        }
+    return options
+
+
+async def ping() -> float:
+    """SELECT 1 por uma conexão do pool; devolve a latência em ms."""
+    started = time.perf_counter()
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+    return round((time.perf_counter() - started) * 1000, 3)
+
+
+def db_pool_stats() -> Dict[str, Any]:
+    return pool_stats.stats(engine.sync_engine.pool)
+
+
+pool_stats = PoolStats()
+
 # Usa create_async_engine para operações assíncronas
-engine = create_async_engine(db_url)
+engine = create_async_engine(db_url, **_engine_options())
+
+
+@event.listens_for(engine.sync_engine, "connect")
+def _on_connect(dbapi_connection, connection_record):
+    pool_stats.connects += 1
+
+
+@event.listens_for(engine.sync_engine, "invalidate")
+def _on_invalidate(dbapi_connection, connection_record, exception):
+    pool_stats.invalidated += 1
+
 
 # Fábrica de sessões assíncronas
 SessionLocal = sessionmaker(
-    autocommit=False, 
-    autoflush=False, 
-    bind=engine, 
+    autocommit=False,
+    autoflush=False,
+    bind=engine,
     class_=AsyncSession
 )
\ No newline at end of file
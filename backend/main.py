@@ -1,20 +1,25 @@
 import logging
 import os
 from fastapi import FastAPI
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 
 from models import Base
-from database import engine
+from database import db_pool_stats, engine, ping
+from migrations import run_migrations
 from core.config import settings
-from routers import auth, reports, players, ingest, ai
+from core.http import init_http_client, close_http_client
+from core.deps import user_cache
+from core.security import password_pool
+from services.jobs import ingest_jobs
+from routers import auth, reports, players, ingest, ai, squad, metrics
 
 # ------------------------------------------------------------------------------
 # Configuração Básica
 # ------------------------------------------------------------------------------
 
-app = FastAPI(title="Jorn Sports API", version="1.0.0")
+app = FastAPI(title="Jorn Sports API", version="1.0.0", default_response_class=ORJSONResponse)
 logger = logging.getLogger("uvicorn")
 
 # Servir arquivos estáticos
@@ -25,17 +30,40 @@ app.mount("/public", StaticFiles(directory="../public"), name="public")
 async def read_index():
     return FileResponse(os.path.join("../public", "index.html"))
 
+@app.get("/health")
+async def health():
+    """Liveness + banco: 503 se não conseguir uma conexão do pool."""
+    try:
+        latency = await ping()
+    except Exception as e:
+        logger.warning(f"Health check do banco falhou: {e!r}")
+        return ORJSONResponse({"status": "unavailable", "db_pool": db_pool_stats()}, status_code=503)
+    return {"status": "ok", "db_latency_ms": latency, "db_pool": db_pool_stats()}
+
 @app.on_event("startup")
 async def on_startup():
     logger.info("Verificando e criando tabelas do banco de dados...")
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await run_migrations(conn)
     logger.info("Tabelas do banco de dados prontas.")
+    ingest_jobs.start()
+    await user_cache.listen()
+
+    await init_http_client()
     
     logger.info(f"GEMINI_API_URL em uso: {settings.GEMINI_API_URL}")
     if "/v1beta/" in settings.GEMINI_API_URL:
         logger.warning("GEMINI_API_URL está em v1beta. Verifique se isso é intencional.")
 
+@app.on_event("shutdown")
+async def on_shutdown():
+    await ingest_jobs.stop()
+    await user_cache.close()
+    await close_http_client()
+    password_pool.shutdown()
+    await engine.dispose()
+
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -43,6 +71,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Include Routers
@@ -51,3 +80,5 @@ app.include_router(reports.router)
 app.include_router(players.router)
 app.include_router(ingest.router)
 app.include_router(ai.router)
+app.include_router(squad.router)
+app.include_router(metrics.router)
@@ -1,11 +1,14 @@
 # manage_db.py
 import argparse
 import asyncio
-from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
 
 from database import engine            # usa seu engine assíncrono
 from models import Base                # usa seus modelos declarativos
+from migrations import run_migrations
+from services.partitions import convert_to_partitioned
+from services.readiness import rebuild_daily_metrics
 
 async def ping_db(engine: AsyncEngine) -> None:
     try:
@@ -20,6 +23,7 @@ async def init_db(engine: AsyncEngine) -> None:
     async with engine.begin() as conn:
         print("📦 Criando tabelas...")
         await conn.run_sync(Base.metadata.create_all)
+        await run_migrations(conn)
     print("✅ Tabelas criadas.")
 
 async def drop_db(engine: AsyncEngine) -> None:
@@ -33,15 +37,35 @@ async def reset_db(engine: AsyncEngine) -> None:
         print("🔄 Resetando (drop & create)...")
         await conn.run_sync(Base.metadata.drop_all)
         await conn.run_sync(Base.metadata.create_all)
+        await run_migrations(conn)
     print("✅ Reset concluído.")
 
+async def migrate_db(engine: AsyncEngine) -> None:
+    async with engine.begin() as conn:
+        print("🛠️ Aplicando ajustes de schema (colunas/índices)...")
+        await run_migrations(conn)
+    print("✅ Schema atualizado.")
+
+async def partition_measurements(engine: AsyncEngine, keep_old: bool) -> None:
+    async with engine.begin() as conn:
+        print("🗂️ Convertendo measurements para partições mensais (tabela travada durante a cópia)...")
+        copied, skipped = await convert_to_partitioned(conn, keep_old=keep_old)
+    print(f"✅ {copied} medições copiadas; {skipped} sem recorded_at ignoradas.")
+
+async def rebuild_daily(engine: AsyncEngine) -> None:
+    async with AsyncSession(engine) as session:
+        print("📊 Recalculando player_daily_metrics a partir de measurements...")
+        await rebuild_daily_metrics(session)
+        await session.commit()
+    print("✅ Agregados diários reconstruídos.")
+
 async def main():
     parser = argparse.ArgumentParser(
-        description="Gestão do banco (init/drop/reset/ping) para o Jorn Sports."
+        description="Gestão do banco (init/drop/reset/ping/migrate/partition-measurements/rebuild-daily) para o Jorn Sports."
     )
     parser.add_argument(
         "cmd",
-        choices=["init", "drop", "reset", "ping"],
+        choices=["init", "drop", "reset", "ping", "migrate", "partition-measurements", "rebuild-daily"],
         help="Ação a executar no banco."
     )
     parser.add_argument(
@@ -49,6 +73,11 @@ async def main():
         action="store_true",
         help="Confirma operações destrutivas sem perguntar."
     )
+    parser.add_argument(
+        "--keep-old",
+        action="store_true",
+        help="partition-measurements: mantém a tabela original como measurements_unpartitioned."
+    )
     args = parser.parse_args()
 
     try:
@@ -56,6 +85,17 @@ async def main():
             await ping_db(engine)
         elif args.cmd == "init":
             await init_db(engine)
+        elif args.cmd == "migrate":
+            await migrate_db(engine)
+        elif args.cmd == "partition-measurements":
+            if not args.yes:
+                resp = input("⚠️ Isso trava e reescreve a tabela measurements. Continuar? [digite YES]: ")
+                if resp.strip() != "YES":
+                    print("Operação cancelada.")
+                    return
+            await partition_measurements(engine, args.keep_old)
+        elif args.cmd == "rebuild-daily":
+            await rebuild_daily(engine)
         elif args.cmd == "drop":
             if not args.yes:
                 resp = input("⚠️ Isso vai APAGAR todas as tabelas. Continuar? [digite YES]: ")
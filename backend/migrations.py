@@ -0,0 +1,266 @@
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+# ------------------------------------------------------------------------------
+# Ajustes de schema para bancos já existentes
+# ------------------------------------------------------------------------------
+# create_all só cria tabelas que não existem; colunas, índices e backfills em
+# tabelas já existentes entram aqui, em ordem. Cada passo roda uma única vez
+# (registrado em schema_migrations) e é escrito de forma idempotente, para
+# bancos novos em que create_all já criou tudo. Um passo pode ser SQL ou uma
+# função async que recebe a conexão.
+
+
+async def _backfill_daily_metrics(conn: AsyncConnection) -> None:
+    """
+    player_daily_metrics só é alimentada por ingestões novas; num banco que já
+    tinha medições, readiness/análise ficariam vazias até um rebuild manual.
+    """
+    from services.readiness import rebuild_daily_metrics
+
+    await rebuild_daily_metrics(conn)
+
+
+async def _dedupe_measurements(conn: AsyncConnection) -> None:
+    """Remove duplicatas pela chave natural (fica a mais recente) e refaz os agregados diários."""
+    from services.readiness import rebuild_daily_metrics
+
+    removed = (await conn.execute(text(
+        """
+        DELETE FROM measurements m
+        USING (
+            SELECT id, recorded_at, row_number() OVER (
+                PARTITION BY player_id, metric, recorded_at, source ORDER BY id DESC
+            ) AS rn
+            FROM measurements
+        ) d
+        WHERE m.id = d.id AND m.recorded_at = d.recorded_at AND d.rn > 1
+        """
+    ))).rowcount
+    if removed:
+        await rebuild_daily_metrics(conn)
+
+
+async def _canonicalize_measurements(conn: AsyncConnection) -> None:
+    """
+    Reescreve medições/alertas antigos com o nome canônico da métrica e a
+    unidade canônica. Quando dois nomes caem na mesma chave natural, fica a
+    linha que já era canônica (senão a mais recente).
+    """
+    from services.normalization import CANONICAL_UNITS, metric_resolver, normalize_unit
+    from services.readiness import rebuild_daily_metrics
+
+    names = (await conn.execute(text("SELECT DISTINCT metric FROM measurements WHERE metric IS NOT NULL"))).scalars().all()
+    raw = [name for name in names if metric_resolver.resolve(name) not in ("", name)]
+    canon = [metric_resolver.resolve(name) for name in raw]
+    changed = 0
+    if raw:
+        params = {"raw": raw, "canon": canon, "affected": raw + canon}
+        changed += (await conn.execute(text(
+            """
+            DELETE FROM measurements m
+            USING (
+                SELECT s.id, s.recorded_at, row_number() OVER (
+                    PARTITION BY s.player_id, COALESCE(a.canon, s.metric), s.recorded_at, s.source
+                    ORDER BY (a.canon IS NULL) DESC, s.id DESC
+                ) AS rn
+                FROM measurements s
+                LEFT JOIN unnest(CAST(:raw AS varchar[]), CAST(:canon AS varchar[])) AS a(raw, canon) ON s.metric = a.raw
+                WHERE s.metric = ANY(CAST(:affected AS varchar[]))
+            ) d
+            WHERE m.id = d.id AND m.recorded_at = d.recorded_at AND d.rn > 1
+            """
+        ), params)).rowcount
+        mapping = "unnest(CAST(:raw AS varchar[]), CAST(:canon AS varchar[])) AS a(raw, canon)"
+        changed += (await conn.execute(text(
+            f"UPDATE measurements m SET metric = a.canon FROM {mapping} WHERE m.metric = a.raw"
+        ), params)).rowcount
+        await conn.execute(text(f"UPDATE alerts t SET metric = a.canon FROM {mapping} WHERE t.metric = a.raw"), params)
+
+    pairs = (await conn.execute(text(
+        "SELECT DISTINCT metric, unit FROM measurements WHERE metric = ANY(CAST(:metrics AS varchar[]))"
+    ), {"metrics": list(CANONICAL_UNITS)})).all()
+    for metric, unit in pairs:
+        try:
+            factor, canonical_unit = normalize_unit(metric, 1.0, unit or "")
+        except ValueError:
+            continue  # unidade desconhecida ou de outra grandeza: fica como está
+        if factor == 1.0 and unit == canonical_unit:
+            continue
+        changed += (await conn.execute(text(
+            "UPDATE measurements SET value = value * :factor, unit = :canonical "
+            "WHERE metric = :metric AND unit IS NOT DISTINCT FROM :unit"
+        ), {"factor": factor, "canonical": canonical_unit, "metric": metric, "unit": unit})).rowcount
+
+    if changed:
+        await rebuild_daily_metrics(conn)
+
+
+MIGRATIONS = [
+    (
+        "003_ingest_jobs_heartbeat",
+        [
+            "ALTER TABLE ingest_jobs ADD COLUMN IF NOT EXISTS worker_id VARCHAR",
+            "ALTER TABLE ingest_jobs ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMPTZ",
+            "ALTER TABLE ingest_jobs ADD COLUMN IF NOT EXISTS spool_path VARCHAR",
+            "CREATE INDEX IF NOT EXISTS ix_ingest_jobs_owner_status ON ingest_jobs (owner_email, status)",
+        ],
+    ),
+    (
+        "005_player_daily_metrics_backfill",
+        [_backfill_daily_metrics],
+    ),
+    (
+        "016_players_promoted_columns",
+        [
+            "ALTER TABLE players ADD COLUMN IF NOT EXISTS prosoccer_id VARCHAR",
+            "ALTER TABLE players ADD COLUMN IF NOT EXISTS owner_email VARCHAR",
+            "ALTER TABLE players ADD COLUMN IF NOT EXISTS player_code VARCHAR",
+            "ALTER TABLE players ADD COLUMN IF NOT EXISTS club_code VARCHAR",
+            # Backfill: o sub-dict `manual` tem precedência sobre as chaves soltas
+            """
+            UPDATE players SET
+                prosoccer_id = COALESCE(prosoccer_id, external_ids ->> 'prosoccer'),
+                owner_email = COALESCE(owner_email, lower(COALESCE(
+                    external_ids -> 'manual' ->> 'owner_email', external_ids ->> 'owner_email'))),
+                player_code = COALESCE(player_code,
+                    external_ids -> 'manual' ->> 'player_code', external_ids ->> 'player_code'),
+                club_code = COALESCE(club_code,
+                    external_ids -> 'manual' ->> 'club_code', external_ids ->> 'club_code')
+            WHERE external_ids IS NOT NULL
+            """,
+            "CREATE INDEX IF NOT EXISTS ix_players_prosoccer_id ON players (prosoccer_id)",
+            "CREATE INDEX IF NOT EXISTS ix_players_player_code ON players (player_code)",
+            "CREATE INDEX IF NOT EXISTS ix_players_owner_created_at ON players (owner_email, created_at DESC, id DESC)",
+            "CREATE INDEX IF NOT EXISTS ix_players_owner_club ON players (owner_email, club_code)",
+            "CREATE INDEX IF NOT EXISTS ix_players_name ON players (first_name, last_name)",
+        ],
+    ),
+    (
+        "017_player_code_sequences",
+        [
+            # O gerador antigo (count()+1) deixou códigos repetidos por técnico: as
+            # cópias mais novas ganham o próximo número livre do mesmo prefixo
+            # (o código sem os dígitos finais), antes do índice único
+            """
+            WITH codes AS (
+                SELECT
+                    id,
+                    owner_email,
+                    player_code,
+                    substring(player_code FROM '^(.*?)[0-9]*$') AS prefix,
+                    row_number() OVER (PARTITION BY owner_email, player_code ORDER BY created_at, id) AS copy
+                FROM players
+                WHERE owner_email IS NOT NULL AND player_code IS NOT NULL
+            ),
+            tops AS (
+                SELECT owner_email, prefix, max(COALESCE(substring(player_code FROM '([0-9]+)$')::int, 0)) AS top
+                FROM codes
+                GROUP BY owner_email, prefix
+            ),
+            renumbered AS (
+                SELECT
+                    c.id,
+                    t.top + row_number() OVER (PARTITION BY c.owner_email, c.prefix ORDER BY c.player_code, c.copy, c.id) AS seq,
+                    c.prefix
+                FROM codes c
+                JOIN tops t ON t.owner_email = c.owner_email AND t.prefix = c.prefix
+                WHERE c.copy > 1
+            ),
+            codes_new AS (
+                SELECT id, prefix || lpad(seq::text, greatest(3, length(seq::text)), '0') AS player_code
+                FROM renumbered
+            )
+            UPDATE players p SET
+                player_code = n.player_code,
+                external_ids = CASE WHEN json_typeof(p.external_ids) = 'object' THEN jsonb_set(
+                    jsonb_set(p.external_ids::jsonb, '{player_code}', to_jsonb(n.player_code), false),
+                    '{manual,player_code}', to_jsonb(n.player_code), false
+                )::json ELSE p.external_ids END
+            FROM codes_new n
+            WHERE p.id = n.id
+            """,
+            # A tabela em si vem do create_all; aqui só o estado inicial dos contadores
+            # (depois da renumeração, para não reemitir os números novos)
+            """
+            INSERT INTO player_code_sequences (owner_email, club_code, coach_code, last_value)
+            SELECT owner_email, club_code, coach_code, max(seq)
+            FROM (
+                SELECT
+                    owner_email,
+                    club_code,
+                    COALESCE(external_ids -> 'manual' ->> 'coach_code', external_ids ->> 'coach_code') AS coach_code,
+                    substring(player_code FROM '([0-9]+)$')::int AS seq
+                FROM players
+                WHERE owner_email IS NOT NULL AND club_code IS NOT NULL AND player_code IS NOT NULL
+            ) codes
+            WHERE coach_code IS NOT NULL AND seq IS NOT NULL
+            GROUP BY owner_email, club_code, coach_code
+            ON CONFLICT (owner_email, club_code, coach_code)
+            DO UPDATE SET last_value = GREATEST(player_code_sequences.last_value, EXCLUDED.last_value)
+            """,
+            "CREATE UNIQUE INDEX IF NOT EXISTS ux_players_owner_player_code ON players (owner_email, player_code)",
+        ],
+    ),
+    (
+        "021_reports_listing_indexes",
+        [
+            "CREATE INDEX IF NOT EXISTS ix_reports_date_id ON reports (date DESC, id DESC)",
+            "CREATE INDEX IF NOT EXISTS ix_reports_athlete_name_lower ON reports (lower(athlete_name))",
+            # Sem a extensão (sem permissão ou não instalada) a busca aproximada vira LIKE sem índice
+            """
+            DO $$ BEGIN
+                CREATE EXTENSION IF NOT EXISTS pg_trgm;
+            EXCEPTION WHEN insufficient_privilege OR feature_not_supported THEN
+                RAISE NOTICE 'pg_trgm indisponível; busca aproximada de relatórios sem índice';
+            END $$
+            """,
+            """
+            DO $$ BEGIN
+                IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm') THEN
+                    CREATE INDEX IF NOT EXISTS ix_reports_athlete_name_trgm
+                        ON reports USING gin (lower(athlete_name) gin_trgm_ops);
+                END IF;
+            END $$
+            """,
+        ],
+    ),
+    (
+        "022_measurements_natural_key",
+        [
+            "ALTER TABLE measurements ADD COLUMN IF NOT EXISTS source VARCHAR NOT NULL DEFAULT 'csv'",
+            "ALTER TABLE ingest_jobs ADD COLUMN IF NOT EXISTS updated INTEGER DEFAULT 0",
+            "ALTER TABLE ingest_jobs ADD COLUMN IF NOT EXISTS skipped INTEGER DEFAULT 0",
+            _dedupe_measurements,
+            # Vale para a tabela antiga e para a particionada; a conversão para
+            # partições é explícita: `python managed_db.py partition-measurements`
+            "CREATE UNIQUE INDEX IF NOT EXISTS ux_measurements_natural_key "
+            "ON measurements (player_id, metric, recorded_at, source)",
+            # Coberto pelo prefixo da chave natural (também serve às séries por métrica)
+            "DROP INDEX IF EXISTS ix_measurements_player_id",
+        ],
+    ),
+    (
+        "023_canonical_metric_names",
+        [_canonicalize_measurements],
+    ),
+]
+
+
+async def run_migrations(conn: AsyncConnection) -> None:
+    # Vários workers sobem juntos: só um aplica, os demais esperam a transação
+    await conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('schema_migrations'))"))
+    await conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "name VARCHAR PRIMARY KEY, applied_at TIMESTAMPTZ NOT NULL DEFAULT now())"
+    ))
+    applied = set((await conn.execute(text("SELECT name FROM schema_migrations"))).scalars())
+    for name, statements in MIGRATIONS:
+        if name in applied:
+            continue
+        for statement in statements:
+            if callable(statement):
+                await statement(conn)
+            else:
+                await conn.execute(text(statement))
+        await conn.execute(text("INSERT INTO schema_migrations (name) VALUES (:name)"), {"name": name})
@@ -1,6 +1,6 @@
 import uuid
 
-from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer, JSON, String, Text, func
+from sqlalchemy import BigInteger, Column, Date, DateTime, Float, ForeignKey, Index, Integer, JSON, String, Text, func
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import declarative_base
 
@@ -25,20 +25,66 @@ class Player(Base):
     first_name = Column(String)
     last_name = Column(String)
     external_ids = Column(JSON, default={})
+    # Campos consultados com frequência, promovidos de external_ids (que continua
+    # com a cópia completa para exibição)
+    prosoccer_id = Column(String, index=True)
+    owner_email = Column(String)
+    player_code = Column(String, index=True)
+    club_code = Column(String)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (
+        Index("ix_players_owner_created_at", "owner_email", created_at.desc(), id.desc()),
+        Index("ix_players_owner_club", "owner_email", "club_code"),
+        Index("ux_players_owner_player_code", "owner_email", "player_code", unique=True),
+        Index("ix_players_name", "first_name", "last_name"),
+    )
+
+
+class PlayerCodeSequence(Base):
+    """Último número usado no player_code de cada (técnico, clube, técnico-código)."""
+    __tablename__ = "player_code_sequences"
+
+    owner_email = Column(String, primary_key=True)
+    club_code = Column(String, primary_key=True)
+    coach_code = Column(String, primary_key=True)
+    last_value = Column(Integer, nullable=False, default=0)
+
 
 class Measurement(Base):
     __tablename__ = "measurements"
 
-    id = Column(Integer, primary_key=True)
-    player_id = Column(UUID(as_uuid=True), ForeignKey("players.id"), index=True)
+    # Particionada por mês em recorded_at (services/partitions.py cria as
+    # partições na ingestão); por isso recorded_at faz parte da PK.
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    player_id = Column(UUID(as_uuid=True), ForeignKey("players.id"))
     metric = Column(String)
     value = Column(Float)
     unit = Column(String)
-    recorded_at = Column(DateTime(timezone=True))
+    recorded_at = Column(DateTime(timezone=True), primary_key=True)
+    source = Column(String, nullable=False, default="csv", server_default="csv")
     meta = Column(JSON, default={})
 
+    # Chave natural: reenviar o mesmo arquivo atualiza em vez de duplicar.
+    # Também atende às consultas de janela (jogador, métrica, intervalo).
+    __table_args__ = (
+        Index("ux_measurements_natural_key", "player_id", "metric", "recorded_at", "source", unique=True),
+        {"postgresql_partition_by": "RANGE (recorded_at)"},
+    )
+
+
+class PlayerDailyMetric(Base):
+    """Agregado diário (UTC) de carga e HRV por atleta, mantido pela ingestão."""
+    __tablename__ = "player_daily_metrics"
+
+    player_id = Column(UUID(as_uuid=True), ForeignKey("players.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    load_total = Column(Float, nullable=False, default=0.0)
+    load_count = Column(Integer, nullable=False, default=0)
+    hrv_sum = Column(Float, nullable=False, default=0.0)
+    hrv_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
 
 class Alert(Base):
     __tablename__ = "alerts"
@@ -61,3 +107,62 @@ class Report(Base):
     dados_atleta = Column(JSON, default={})
     analysis = Column(JSON, default={})
     date = Column(DateTime(timezone=True), server_default=func.now())
+
+    # O índice trigram (busca aproximada) depende do pg_trgm e fica só na migração 021
+    __table_args__ = (
+        Index("ix_reports_date_id", date.desc(), id.desc()),
+        Index("ix_reports_athlete_name_lower", func.lower(athlete_name)),
+    )
+
+
+class IngestJob(Base):
+    __tablename__ = "ingest_jobs"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    owner_email = Column(String, nullable=False, index=True)
+    filename = Column(String)
+    status = Column(String, nullable=False, default="queued")
+    total_bytes = Column(BigInteger, default=0)
+    bytes_read = Column(BigInteger, default=0)
+    rows_processed = Column(Integer, default=0)
+    inserted = Column(Integer, default=0)
+    updated = Column(Integer, default=0)
+    skipped = Column(Integer, default=0)
+    error_count = Column(Integer, default=0)
+    errors = Column(JSON, default=[])
+    detail = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+    # Worker dono (host:pid), heartbeat e arquivo temporário: recuperação de jobs órfãos
+    worker_id = Column(String)
+    heartbeat_at = Column(DateTime(timezone=True))
+    spool_path = Column(String)
+
+    __table_args__ = (
+        Index("ix_ingest_jobs_owner_status", "owner_email", "status"),
+    )
+
+
+class IngestedFile(Base):
+    """Arquivos já ingeridos por técnico (sha256 do conteúdo), para reenvios."""
+    __tablename__ = "ingested_files"
+
+    owner_email = Column(String, primary_key=True)
+    sha256 = Column(String(64), primary_key=True)
+    filename = Column(String)
+    size_bytes = Column(BigInteger)
+    rows_processed = Column(Integer, default=0)
+    inserted = Column(Integer, default=0)
+    updated = Column(Integer, default=0)
+    skipped = Column(Integer, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class AIResponseCache(Base):
+    __tablename__ = "ai_response_cache"
+
+    key = Column(String(64), primary_key=True)
+    response = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
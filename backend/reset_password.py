@@ -4,6 +4,7 @@ from sqlalchemy import select
 from database import engine
 from models import User
 from core.security import get_password_hash
+from core.deps import notify_user_changed
 
 async def reset_password(email: str, new_password: str):
     print(f"Procurando usuário: {email}")
@@ -33,6 +34,8 @@ async def reset_password(email: str, new_password: str):
             new_hash = get_password_hash(new_password)
             user.password_hash = new_hash
             session.add(user)
+            # Processo separado do servidor: o NOTIFY (entregue no commit) invalida o cache de lá
+            await notify_user_changed(session, email)
             await session.commit()
             print(f"✅ Senha atualizada com sucesso para: {new_password}")
 
@@ -1,150 +1,84 @@
+import asyncio
 import json
 import bleach
-import httpx
-from fastapi import APIRouter, Depends, HTTPException, status
-from pydantic import BaseModel, Field
-from typing import Literal
-from sqlalchemy.ext.asyncio import AsyncSession
-
-import models
-from core.deps import get_db, get_current_user
-from core.config import settings
-from services.evaluation import evaluate_athlete
-
-router = APIRouter(prefix="/api/analyze", tags=["ai"])
-
-import json
-import bleach
-import httpx
-import statistics
-from datetime import datetime, timedelta, timezone
+from typing import List
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException, status
-from pydantic import BaseModel
-from sqlalchemy import select, desc
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 import models
 from core.deps import get_db, get_current_user
 from core.config import settings
+from core.http import get_http_client, request_with_retry
+from database import SessionLocal
+from services.ai_cache import ai_cache
+from services.ai_stream import AnalysisStreamParser
 from services.evaluation import evaluate_athlete
+from services.rankings import eval_input
+from services.readiness import load_daily_metrics, summarize_daily
 
 router = APIRouter(prefix="/api/analyze", tags=["ai"])
 
 class AIAnalysisRequest(BaseModel):
     player_id: UUID
+    force_refresh: bool = False  # ignora o cache e chama o Gemini
 
-async def _get_metrics_summary(db: AsyncSession, player_id: UUID):
-    """
-    Calcula métricas avançadas (HRV drop, ACWR) baseadas no histórico.
-    """
-    # Buscar últimos 28 dias
-    since = datetime.now(timezone.utc) - timedelta(days=28)
-    q = select(models.Measurement).where(
-        models.Measurement.player_id == player_id,
-        models.Measurement.recorded_at >= since
-    ).order_by(desc(models.Measurement.recorded_at))
-    
-    result = await db.execute(q)
-    measurements = result.scalars().all()
-    
-    # Organizar por métrica
-    data = {}
-    for m in measurements:
-        if m.metric not in data:
-            data[m.metric] = []
-        data[m.metric].append((m.recorded_at, m.value))
-
-    alerts = []
-    summary = []
-
-    # 1. Regra de Ouro: HRV (rMSSD)
-    # Se a média dos últimos 3 dias for 20% menor que a média dos últimos 21 dias -> Fadiga
-    if "hrv_rmssd" in data:
-        vals = sorted(data["hrv_rmssd"], key=lambda x: x[0], reverse=True) # mais recente primeiro
-        if len(vals) >= 3:
-            recent_3 = [v[1] for v in vals[:3]]
-            avg_3 = statistics.mean(recent_3)
-            
-            # Baseline (até 21 dias atrás, excluindo os 3 recentes se quiser ser estrito, 
-            # mas aqui pegaremos tudo exceto os 3 recentes para comparar)
-            rest = [v[1] for v in vals[3:]]
-            if len(rest) >= 5: # precisa de um mínimo de histórico
-                avg_chronic = statistics.mean(rest)
-                drop_pct = (avg_chronic - avg_3) / avg_chronic * 100
-                
-                summary.append(f"HRV Recente (3d): {avg_3:.1f}ms | Basal: {avg_chronic:.1f}ms")
-                
-                if drop_pct > 20:
-                    alerts.append(f"ALERTA CRÍTICO: Queda de {drop_pct:.1f}% no HRV. Sinal forte de fadiga acumulada ou má recuperação.")
-                elif drop_pct > 10:
-                     alerts.append(f"ATENÇÃO: Queda de {drop_pct:.1f}% no HRV. Monitorar carga.")
-            else:
-                summary.append(f"HRV Recente: {avg_3:.1f}ms (Sem histórico suficiente para baseline)")
-
-    # 2. ACWR (Total Distance ou Load)
-    # Razão Aguda (7 dias) / Crônica (28 dias)
-    metric_load = "total_distance" # ou session_load se tiver
-    if metric_load in data:
-        vals = sorted(data[metric_load], key=lambda x: x[0], reverse=True)
-        now = datetime.now(timezone.utc)
-        
-        acute_vals = [v[1] for v in vals if (now - v[0]).days <= 7]
-        chronic_vals = [v[1] for v in vals if (now - v[0]).days <= 28]
-        
-        if chronic_vals:
-            acute_load = sum(acute_vals)
-            chronic_avg = sum(chronic_vals) / 4 # média semanal do mês
-            
-            if chronic_avg > 0:
-                acwr = acute_load / chronic_avg
-                summary.append(f"ACWR (Carga Aguda/Crônica): {acwr:.2f}")
-                
-                if acwr > 1.5:
-                    alerts.append(f"RISCO DE LESÃO: ACWR de {acwr:.2f} (Muito alto). Pico agudo de carga.")
-                elif acwr < 0.8:
-                    alerts.append(f"Destreinamento: ACWR de {acwr:.2f} (Baixo).")
-    
-    return "\n".join(summary), "\n".join(alerts)
+class AIBatchRequest(BaseModel):
+    player_ids: List[UUID] = Field(..., min_length=1, max_length=settings.AI_BATCH_MAX_PLAYERS)
+    force_refresh: bool = False
 
-@router.post("")
-async def analyze_athlete(
-    payload: AIAnalysisRequest,
-    _current_user: models.User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db),
-):
+def _metrics_summary(daily_rows: list):
     """
-    Gera relatório holístico (Dados Cadastrais + Histórico GPS/HRV).
+    Calcula métricas avançadas (HRV drop, ACWR) a partir dos agregados diários
+    (player_daily_metrics) dos últimos 28 dias.
     """
-    # 1. Buscar Atleta e Avaliação
-    player = await db.get(models.Player, payload.player_id)
-    if not player:
-        raise HTTPException(status_code=404, detail="Atleta não encontrado")
-        
+    result = summarize_daily(daily_rows)
+    return "\n".join(result["summary"]), "\n".join(result["alerts"])
+
+_ALLOWED_TAGS = ["p", "ul", "li", "strong", "em", "br", "span", "b", "i"]
+_HTML_FIELDS = ("relatorio", "comparacao", "plano_treino")
+_GENERATION_CONFIG = {"responseMimeType": "application/json"}
+
+class _AnalysisContext:
+    """Tudo que a análise precisa do banco, resolvido antes de chamar o Gemini."""
+
+    def __init__(self, player, assessment, metrics_summary, metrics_alerts, sys_eval):
+        self.player = player
+        self.assessment = assessment
+        self.metrics_summary = metrics_summary
+        self.metrics_alerts = metrics_alerts
+        self.sys_eval = sys_eval
+        self.prompt = _build_prompt(self)
+        self.cache_key = ai_cache.key_for(self.prompt, settings.GEMINI_API_URL, _GENERATION_CONFIG)
+
+def _build_context(player: models.Player, daily_rows: list) -> _AnalysisContext:
     ext = player.external_ids or {}
     assessment = ext.get("assessment")
     
     if not assessment:
         raise HTTPException(status_code=400, detail="Atleta sem avaliação física/técnica cadastrada. Preencha o perfil primeiro.")
 
-    # 2. Calcular Métricas Reais
-    metrics_summary, metrics_alerts = await _get_metrics_summary(db, payload.player_id)
+    # Métricas Reais
+    metrics_summary, metrics_alerts = _metrics_summary(daily_rows)
 
-    # 3. Avaliação do Sistema (Potencial, Posição)
-    # Adaptar assessment para o formato esperado pelo evaluate_athlete
-    eval_input = {
-        "nome": player.first_name,
-        "sobrenome": player.last_name or "",
-        "idade": 20, # TODO: Adicionar data de nascimento no cadastro
-        **assessment
-    }
-    # Fallbacks seguros se faltar campo
-    if "idade" not in eval_input: eval_input["idade"] = 20
-    
-    sys_eval = evaluate_athlete(eval_input)
+    # Avaliação do Sistema (Potencial, Posição)
+    sys_eval = evaluate_athlete(eval_input(player.first_name, player.last_name, assessment))
+    return _AnalysisContext(player, assessment, metrics_summary, metrics_alerts, sys_eval)
 
-    # 4. Prompt
-    prompt = f"""
+async def _load_context(db: AsyncSession, player_id: UUID) -> _AnalysisContext:
+    player = await db.get(models.Player, player_id)
+    if not player:
+        raise HTTPException(status_code=404, detail="Atleta não encontrado")
+    rows = await load_daily_metrics(db, [player_id])
+    return _build_context(player, rows[player_id])
+
+def _build_prompt(ctx: _AnalysisContext) -> str:
+    player, assessment, sys_eval = ctx.player, ctx.assessment, ctx.sys_eval
+    metrics_summary, metrics_alerts = ctx.metrics_summary, ctx.metrics_alerts
+    return f"""
 Você é um fisiologista e analista de performance de elite. Analise este atleta de forma HOLÍSTICA.
 Combine a avaliação técnica (olheiro) com os DADOS FISIOLÓGICOS REAIS (GPS/HRV) para dar um veredito.
 
@@ -173,37 +107,221 @@ SAÍDA ESPERADA (JSON ÚNICO):
 }}
 """.strip()
 
-    # 5. Chamar Gemini
-    api_url = f"{settings.GEMINI_API_URL}?key={settings.GEMINI_API_KEY}"
-    gemini_payload = {
+def _gemini_payload(prompt: str) -> dict:
+    return {
         "contents": [{"parts": [{"text": prompt}]}],
-        "generationConfig": {"responseMimeType": "application/json"}
+        "generationConfig": _GENERATION_CONFIG
     }
-    
-    async with httpx.AsyncClient(timeout=90) as client:
+
+def _sanitize(final_response: dict) -> dict:
+    for k in _HTML_FIELDS:
+        if k in final_response:
+            final_response[k] = bleach.clean(final_response[k], tags=_ALLOWED_TAGS, strip=True)
+    return final_response
+
+def _fallback(ctx: _AnalysisContext) -> dict:
+    # Fallback em caso de erro da IA para não quebrar o fluxo
+    return {
+        "relatorio": f"<p>Não foi possível gerar a análise IA no momento. <br><strong>Alertas Detectados:</strong><br>{ctx.metrics_alerts or 'Nenhum'}</p>",
+        "comparacao": "<p>Indisponível.</p>",
+        "plano_treino": "<ul><li>Monitorar carga de treino</li><li>Manter hidratação</li></ul>",
+        "evaluation": ctx.sys_eval
+    }
+
+def _with_context(ai_part: dict, ctx: _AnalysisContext, cached: bool) -> dict:
+    return {
+        **ai_part,
+        "evaluation": ctx.sys_eval,
+        "system_alerts": ctx.metrics_alerts, # Retornar alertas crus também
+        "cached": cached,
+    }
+
+async def _generate(ctx: _AnalysisContext, force_refresh: bool = False):
+    """Resposta completa da análise (cache ou Gemini) e se ela é válida (não é fallback)."""
+    # Reaproveita análise idêntica do cache
+    cached = None if force_refresh else await ai_cache.get(ctx.cache_key)
+    if cached is not None:
+        return _with_context(cached, ctx, cached=True), True
+
+    # Chamar Gemini
+    api_url = f"{settings.GEMINI_API_URL}?key={settings.GEMINI_API_KEY}"
+    try:
+        resp = await request_with_retry("POST", api_url, json=_gemini_payload(ctx.prompt), headers={"Content-Type": "application/json"})
+        resp.raise_for_status()
+        data_ai = resp.json()
+        text = data_ai["candidates"][0]["content"]["parts"][0]["text"]
+        final_response = _sanitize(json.loads(text))
+    except Exception as e:
+        print(f"Erro Gemini: {e}")
+        return _fallback(ctx), False
+
+    await ai_cache.set(ctx.cache_key, final_response)
+    return _with_context(final_response, ctx, cached=False), True
+
+@router.post("")
+async def analyze_athlete(
+    payload: AIAnalysisRequest,
+    _current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Gera relatório holístico (Dados Cadastrais + Histórico GPS/HRV).
+    """
+    ctx = await _load_context(db, payload.player_id)
+    result, _ok = await _generate(ctx, payload.force_refresh)
+    return result
+
+def _stream_url() -> str:
+    base = settings.GEMINI_API_URL.replace(":generateContent", ":streamGenerateContent")
+    return f"{base}?alt=sse&key={settings.GEMINI_API_KEY}"
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+@router.post("/stream")
+async def analyze_athlete_stream(
+    payload: AIAnalysisRequest,
+    _current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Mesma análise de POST /api/analyze, via Server-Sent Events:
+      event: evaluation -> avaliação do sistema + alertas (logo após o banco)
+      event: delta      -> {"field", "html"} trechos já sanitizados do Gemini
+      event: done       -> resposta final completa (mesmo formato do endpoint normal)
+    """
+    # Todo acesso ao banco acontece antes de começar o stream
+    ctx = await _load_context(db, payload.player_id)
+
+    async def events():
+        yield _sse("evaluation", {"evaluation": ctx.sys_eval, "system_alerts": ctx.metrics_alerts})
+
+        cached = None if payload.force_refresh else await ai_cache.get(ctx.cache_key)
+        if cached is not None:
+            yield _sse("done", _with_context(cached, ctx, cached=True))
+            return
+
+        parser = AnalysisStreamParser(_HTML_FIELDS, _ALLOWED_TAGS)
+        chunks = []
         try:
-            resp = await client.post(api_url, json=gemini_payload, headers={"Content-Type": "application/json"})
-            resp.raise_for_status()
-            data_ai = resp.json()
-            text = data_ai["candidates"][0]["content"]["parts"][0]["text"]
-            final_response = json.loads(text)
+            client = get_http_client()
+            async with client.stream("POST", _stream_url(), json=_gemini_payload(ctx.prompt)) as resp:
+                resp.raise_for_status()
+                async for line in resp.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data_ai = json.loads(line[5:])
+                    for part in (data_ai.get("candidates") or [{}])[0].get("content", {}).get("parts", []):
+                        text = part.get("text") or ""
+                        chunks.append(text)
+                        for field, html in parser.feed(text):
+                            yield _sse("delta", {"field": field, "html": html})
+            for field, html in parser.close():
+                yield _sse("delta", {"field": field, "html": html})
+            final_response = _sanitize(json.loads("".join(chunks)))
         except Exception as e:
-            print(f"Erro Gemini: {e}")
-            # Fallback em caso de erro da IA para não quebrar o fluxo
-            return {
-                "relatorio": f"<p>Não foi possível gerar a análise IA no momento. <br><strong>Alertas Detectados:</strong><br>{metrics_alerts or 'Nenhum'}</p>",
-                "comparacao": "<p>Indisponível.</p>",
-                "plano_treino": "<ul><li>Monitorar carga de treino</li><li>Manter hidratação</li></ul>",
-                "evaluation": sys_eval
-            }
-
-    # Sanitize
-    _allowed_tags = ["p", "ul", "li", "strong", "em", "br", "span", "b", "i"]
-    for k in ("relatorio", "comparacao", "plano_treino"):
-        if k in final_response:
-            final_response[k] = bleach.clean(final_response[k], tags=_allowed_tags, strip=True)
+            print(f"Erro Gemini (stream): {e}")
+            yield _sse("done", _fallback(ctx))
+            return
 
-    final_response["evaluation"] = sys_eval
-    final_response["system_alerts"] = metrics_alerts # Retornar alertas crus também
-    
-    return final_response
+        await ai_cache.set(ctx.cache_key, final_response)
+        yield _sse("done", _with_context(final_response, ctx, cached=False))
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.post("/batch")
+async def analyze_squad(
+    payload: AIBatchRequest,
+    _current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Gera e salva relatórios de vários atletas (ex.: elenco antes do jogo).
+    Atletas e agregados diários são carregados em duas queries; o Gemini é
+    chamado com no máximo AI_BATCH_CONCURRENCY requisições simultâneas.
+    Progresso via Server-Sent Events:
+      event: progress -> {"player_id", "status", "done", "total", ...} por atleta
+      event: done     -> relatórios gravados (uma única transação) e falhas
+    """
+    player_ids = list(dict.fromkeys(payload.player_ids))
+    q = select(models.Player).where(models.Player.id.in_(player_ids))
+    players = {p.id: p for p in (await db.execute(q)).scalars().all()}
+    daily = await load_daily_metrics(db, list(players))
+
+    contexts, failed = {}, []
+    for pid in player_ids:
+        player = players.get(pid)
+        if player is None:
+            failed.append({"player_id": str(pid), "detail": "Atleta não encontrado"})
+            continue
+        try:
+            contexts[pid] = _build_context(player, daily[pid])
+        except HTTPException as e:
+            failed.append({"player_id": str(pid), "detail": e.detail})
+
+    async def events():
+        total = len(player_ids)
+        done = 0
+        for item in failed:
+            done += 1
+            yield _sse("progress", {**item, "status": "error", "done": done, "total": total})
+
+        slots = asyncio.Semaphore(settings.AI_BATCH_CONCURRENCY)
+
+        async def run(pid, ctx):
+            async with slots:
+                result, ok = await _generate(ctx, payload.force_refresh)
+            return pid, ctx, result, ok
+
+        tasks = [asyncio.create_task(run(pid, ctx)) for pid, ctx in contexts.items()]
+        generated = []
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                pid, ctx, result, ok = await next_done
+                done += 1
+                if ok:
+                    generated.append((pid, ctx, result))
+                else:
+                    failed.append({"player_id": str(pid), "detail": "Falha ao gerar análise IA"})
+                yield _sse("progress", {
+                    "player_id": str(pid),
+                    "status": "ok" if ok else "error",
+                    "cached": result.get("cached", False),
+                    "done": done,
+                    "total": total,
+                })
+        finally:
+            # Cliente desconectou no meio: não deixa chamadas órfãs
+            for task in tasks:
+                task.cancel()
+
+        saved = []
+        if generated:
+            async with SessionLocal() as session:
+                reports = [
+                    models.Report(
+                        athlete_name=f"{ctx.player.first_name} {ctx.player.last_name or ''}".strip(),
+                        dados_atleta=eval_input(ctx.player.first_name, ctx.player.last_name, ctx.assessment),
+                        analysis=result,
+                    )
+                    for _, ctx, result in generated
+                ]
+                session.add_all(reports)
+                await session.flush()
+                saved = [
+                    {"player_id": str(pid), "report_id": report.id}
+                    for (pid, _, _), report in zip(generated, reports)
+                ]
+                await session.commit()
+
+        yield _sse("done", {"reports": saved, "failed": failed, "total": total})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,11 +1,12 @@
 from datetime import timedelta
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from pydantic import BaseModel, EmailStr, Field
 from sqlalchemy.ext.asyncio import AsyncSession
 
 import models
-from core.deps import get_db, get_current_user, get_user_by_email
-from core.security import get_password_hash, verify_password, create_access_token
+from core.deps import get_db, get_current_user_record, get_user_by_email, user_cache
+from core.rate_limit import client_ip, login_limiter
+from core.security import create_access_token, password_pool
 from core.config import settings
 
 router = APIRouter(prefix="/auth", tags=["auth"])
@@ -24,18 +25,20 @@ class TokenResponse(BaseModel):
     expires_in: int
 
 @router.post("/register", status_code=status.HTTP_201_CREATED)
-async def register_coach(payload: RegisterRequest, db: AsyncSession = Depends(get_db)):
+async def register_coach(payload: RegisterRequest, request: Request, db: AsyncSession = Depends(get_db)):
     email = payload.email.lower()
+    login_limiter.hit(f"ip:{client_ip(request)}")
     existing_user = await get_user_by_email(db, email)
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="Email already registered",
         )
-    user = models.User(email=email, password_hash=get_password_hash(payload.password))
+    user = models.User(email=email, password_hash=await password_pool.hash(payload.password))
     db.add(user)
     await db.commit()
     await db.refresh(user)
+    user_cache.invalidate(email)
     return {
         "id": str(user.id),
         "email": user.email,
@@ -44,22 +47,30 @@ async def register_coach(payload: RegisterRequest, db: AsyncSession = Depends(ge
     }
 
 @router.post("/login", response_model=TokenResponse)
-async def login(payload: LoginRequest, db: AsyncSession = Depends(get_db)):
+async def login(payload: LoginRequest, request: Request, db: AsyncSession = Depends(get_db)):
+    email = payload.email.lower()
+    # Por IP conta toda tentativa; por email só as falhas (zeradas no sucesso),
+    # para que logins legítimos repetidos não bloqueiem a conta
+    email_key = f"email:{email}"
+    login_limiter.check(email_key)
+    login_limiter.hit(f"ip:{client_ip(request)}")
     # Authenticate user logic inline or helper
-    user = await get_user_by_email(db, payload.email.lower())
-    if not user or not verify_password(payload.password, user.password_hash):
+    user = await get_user_by_email(db, email)
+    if not user or not await password_pool.verify(payload.password, user.password_hash):
+        login_limiter.record(email_key)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    login_limiter.reset(email_key)
     expires_delta = timedelta(hours=settings.ACCESS_TOKEN_EXPIRE_HOURS)
-    token = create_access_token({"sub": user.email, "role": user.role}, expires_delta)
+    token = create_access_token({"sub": user.email, "role": user.role, "uid": str(user.id)}, expires_delta)
     return TokenResponse(access_token=token, expires_in=int(expires_delta.total_seconds()))
 
 @router.get("/me") # Changed from /api/me to /auth/me or keep /api/me? The plan said /auth/me implicitly by grouping. I'll add a separate router for /api if needed, but /auth/me is standard. Wait, the original was /api/me. I will keep it here but maybe alias or move to a user router. I'll keep it in auth for now but path /me relative to /auth -> /auth/me.
-async def read_me(current_user: models.User = Depends(get_current_user)):
+async def read_me(current_user: models.User = Depends(get_current_user_record)):
     return {
         "id": str(current_user.id),
         "email": current_user.email,
@@ -1,227 +1,256 @@
-import csv
-import io
-from datetime import datetime, timedelta, timezone
-from uuid import UUID
+import hashlib
+import os
+import re
+import tempfile
+import uuid
+from datetime import datetime, timezone
 from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
-from sqlalchemy import select
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from sqlalchemy import func
 from sqlalchemy.ext.asyncio import AsyncSession
 
 import models
 from core.deps import get_db, get_current_user
+from services.ingestion import (
+    BulkIngestor, CSVStream, WideLayout, file_sha256, find_ingested_file, register_ingested_file,
+)
+from services.columnar import COLUMNAR_CHUNK_SIZE, ColumnarStream
+from services.jobs import ingest_jobs
+from services.normalization import find_date_key
 
 router = APIRouter(prefix="/api/ingest", tags=["ingest"])
 
 # ------------------------------------------------------------------------------
 # Utilitários para Ingestão/Normalização (CSV GPS/HRV)
 # ------------------------------------------------------------------------------
-KNOWN_DATE_KEYS = ["recorded_at","date","data","dia","datetime","timestamp","Date"]
-METRIC_ALIASES = {
-    "Total Distance": "total_distance",
-    "total_distance": "total_distance",
-    "High Speed Running Distance": "high_speed_distance",
-    "HSR Distance": "high_speed_distance",
-    "HMLD": "high_metabolic_load_distance",
-    "Sprint Distance": "sprint_distance",
-    "rMSSD": "hrv_rmssd",
-    "HRV": "hrv_rmssd",
-    "avg_hrv": "hrv_rmssd",
-    "ACWR": "acwr",
-    "session_load": "session_load",
-}
-
-async def _find_or_create_player(
-    db: AsyncSession,
-    first,
-    last,
-    external_id=None,
-    owner_email: str | None = None,
-):
-    """Tenta achar por external_id (prosoccer) ou por (nome, sobrenome).
-       Se não existir, cria o jogador.
+# Aliases de métricas/unidades e colunas de data: services/normalization.py
+REQUIRED_COLUMNS = {"first_name","last_name","external_id","metric","value","unit"}
+
+def _check_columns(fieldnames) -> tuple[str, Optional[WideLayout]]:
     """
-    if external_id:
-        q = select(models.Player).where(
-            models.Player.external_ids["prosoccer"].as_string() == external_id
-        )
-        r = await db.execute(q)
-        p = r.scalar_one_or_none()
-        if p:
-            return p
-
-    q = select(models.Player).where(
-        models.Player.first_name == first,
-        models.Player.last_name == last
-    )
-    r = await db.execute(q)
-    p = r.scalar_one_or_none()
-    if p:
-        if owner_email:
-            ext = dict(p.external_ids or {})
-            if not ext.get("owner_email"):
-                ext["owner_email"] = owner_email.lower()
-                p.external_ids = ext
-                await db.commit()
-                await db.refresh(p)
-        return p
-
-    p = models.Player(
-        first_name=first,
-        last_name=last,
-        external_ids={
-            **({"prosoccer": external_id} if external_id else {}),
-            **({"owner_email": owner_email.lower()} if owner_email else {}),
-        },
-    )
-    db.add(p)
-    await db.commit()
-    await db.refresh(p)
-    return p
-
-def _score_from_window(value, window_values, higher_better=True):
-    """Transforma um valor em score 0..100 baseado em z-score + CDF normal."""
-    import math, statistics
-    if not window_values:
-        return 50.0
-    mu = statistics.mean(window_values)
-    sd = statistics.pstdev(window_values) or 1e-6
-    z = (value - mu) / sd
-    if not higher_better:
-        z = -z
-    pct = 0.5 * (1 + math.erf(z / math.sqrt(2)))
-    return round(100 * pct, 2)
-
-async def _process_after_insert(db: AsyncSession, player_id, metric, value, ts, higher_better=True):
-    """Após inserir uma medição: calcula score da janela e gera alertas simples."""
-    since = ts - timedelta(days=14)
-    q = select(models.Measurement.value).where(
-        models.Measurement.player_id == player_id,
-        models.Measurement.metric == metric,
-        models.Measurement.recorded_at >= since
-    ).order_by(models.Measurement.recorded_at)
-    r = await db.execute(q)
-    window = [row[0] for row in r.all()]
-    score = _score_from_window(value, window, higher_better=higher_better)
-
-    # Regras simples de alerta (exemplo)
-    alert = None
-    if metric.upper() == "HRV" and score < 30:
-        alert = models.Alert(
-            player_id=player_id,
-            level="WARNING",
-            metric=metric,
-            message=f"HRV baixo (score {score})",
-            payload={"value": value, "ts": ts.isoformat()}
-        )
-    if metric.upper() == "LDH" and value > 250:
-        alert = models.Alert(
-            player_id=player_id,
-            level="CRITICAL",
-            metric=metric,
-            message=f"LDH elevado ({value})",
-            payload={"ts": ts.isoformat()}
+    Valida o cabeçalho. Formato longo: devolve a coluna de data (recorded_at ou
+    um KNOWN_DATE_KEYS) e None. Formato largo (uma coluna por métrica): devolve
+    "recorded_at" e o WideLayout detectado.
+    """
+    layout = WideLayout.detect(fieldnames)
+    if layout:
+        return "recorded_at", layout
+    found = set([h.strip() for h in fieldnames])
+    missing = REQUIRED_COLUMNS - found
+    date_key = find_date_key(fieldnames)
+    if date_key is None:
+        missing.add("recorded_at")
+    if missing:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Colunas ausentes: {', '.join(sorted(missing))}. Cabeçalhos: {', '.join(sorted(found))}"
         )
+    return date_key, None
+
+def _open_columnar(fileobj) -> tuple[ColumnarStream, str, Optional[WideLayout]]:
+    """Abre Parquet/Arrow IPC e valida cabeçalho e tipos das colunas (400 se não der)."""
+    try:
+        stream = ColumnarStream(fileobj)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Não foi possível ler o arquivo: {e}")
+    date_key, layout = _check_columns(stream.fieldnames)
+    if layout:
+        date_key = layout.date_key  # sem melt prévio: a coluna de data mantém o nome do arquivo
+    try:
+        stream.check_types(date_key, layout)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Tipo de coluna inválido: {e}")
+    return stream, date_key, layout
+
+def _spool_suffix(filename: Optional[str], columnar: bool) -> str:
+    """Extensão do arquivo enviado (só letras/dígitos), para o spool não fingir ser CSV."""
+    ext = os.path.splitext(filename or "")[1].lower()
+    if re.fullmatch(r"\.[a-z0-9]{1,10}", ext):
+        return ext
+    return ".bin" if columnar else ".csv"
 
-    if alert:
-        db.add(alert)
-        await db.commit()
+def _spool_to_disk(src, suffix: str) -> tuple[str, int, str]:
+    """Copia o upload para um arquivo temporário que sobrevive à requisição (e calcula o sha256)."""
+    digest = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(prefix="ingest-", suffix=suffix, delete=False) as dst:
+        for chunk in iter(lambda: src.read(1024 * 1024), b""):
+            digest.update(chunk)
+            dst.write(chunk)
+        return dst.name, dst.tell(), digest.hexdigest()
 
-    return score
+def _check_spooled(path: str, columnar: bool) -> None:
+    with open(path, "rb") as fh:
+        if columnar:
+            _open_columnar(fh)
+        else:
+            _check_columns(CSVStream(fh).fieldnames)
 
 @router.post("/csv")
 async def ingest_csv(
     file: UploadFile = File(...),
+    background: bool = False,
+    force: bool = False,
     current_user: models.User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     """
     CSV esperado:
       first_name,last_name,external_id,metric,value,unit,recorded_at (ISO-8601 com Z)
-    Sem transação aninhada. Faz flush por linha e commit 1x no final.
+    A data também é aceita como date/data/dia/datetime/timestamp. Nomes de
+    métrica passam pelo METRIC_ALIASES (sem caixa/espaços) e os valores são
+    convertidos para a unidade canônica (ver services.normalization).
+    Exports largos (uma linha por sessão, uma coluna por métrica, ex.:
+    "Player Name,Date,Total Distance (km),Max Speed") são detectados pelo
+    cabeçalho e derretidos em streaming (services.ingestion.WideLayout).
+    Leitura em streaming (memória constante) e gravação em lote
+    (ver services.ingestion.BulkIngestor), commit por bloco.
+    Idempotente: cada linha é um upsert pela chave natural e a resposta traz
+    inserted/updated/skipped. Um arquivo idêntico a um já ingerido pelo técnico
+    nem é lido (`duplicate_of` na resposta); ?force=true reprocessa.
+    Com ?background=true devolve 202 + job_id; acompanhe em /api/ingest/jobs/{id}.
     """
-    # 1) Lê/decodifica robusto
+    owner_email = current_user.email if current_user else None
+
+    if background:
+        return await _start_background_job(file, owner_email, force, db)
+
+    sha256 = await run_in_threadpool(file_sha256, file.file)
+    if not force:
+        previous = await find_ingested_file(db, owner_email, sha256)
+        if previous:
+            return previous
+
+    # 1) Abre o stream: encoding/delimitador detectados no primeiro bloco
     try:
-        raw = await file.read()
+        stream = await run_in_threadpool(CSVStream, file.file)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Não foi possível ler o arquivo: {e}")
+    date_key, layout = _check_columns(stream.fieldnames)
+
+    # 2) Lotes de tamanho fixo -> pipeline de inserção (formato largo é derretido por lote)
+    ingestor = BulkIngestor(db, owner_email=owner_email, date_key=date_key, layout=layout)
+    while True:
+        batch = await run_in_threadpool(stream.read_batch, ingestor.read_size)
+        if not batch:
+            break
+        await ingestor.feed(batch)
+    summary = await ingestor.finish()
+    await register_ingested_file(db, owner_email, sha256, file.filename, stream.bytes_read, ingestor)
+    return summary
+
+@router.post("/parquet")
+@router.post("/arrow")
+async def ingest_columnar(
+    file: UploadFile = File(...),
+    background: bool = False,
+    force: bool = False,
+    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Parquet ou Arrow IPC (arquivo .arrow/.feather ou stream); o formato é
+    detectado pelo conteúdo, nos dois caminhos. Mesmas colunas do CSV, longo
+    ou largo, só que tipadas: data como timestamp/date (sem fuso = UTC) ou
+    texto ISO-8601, valores numéricos ou texto. Cada lote é validado de forma
+    vetorizada (services.columnar.ColumnarStream) e gravado pelo mesmo
+    BulkIngestor, em blocos de COLUMNAR_CHUNK_SIZE linhas. Erros continuam por
+    linha ("row" = posição da linha de dados no arquivo, a partir de 1).
+    Idempotência, ?force e ?background funcionam como em /csv.
+    """
+    owner_email = current_user.email if current_user else None
 
-    text = None
-    for enc in ("utf-8-sig", "utf-8", "latin-1"):
-        try:
-            text = raw.decode(enc)
+    if background:
+        return await _start_background_job(file, owner_email, force, db, columnar=True)
+
+    sha256 = await run_in_threadpool(file_sha256, file.file)
+    if not force:
+        previous = await find_ingested_file(db, owner_email, sha256)
+        if previous:
+            return previous
+
+    stream, date_key, layout = await run_in_threadpool(_open_columnar, file.file)
+    ingestor = BulkIngestor(db, owner_email=owner_email, chunk_size=COLUMNAR_CHUNK_SIZE, source=stream.source)
+    while True:
+        batch = await run_in_threadpool(stream.read_batch, date_key, layout)
+        if batch is None:
             break
-        except Exception:
-            continue
-    if text is None:
-        raise HTTPException(status_code=400, detail="Falha ao decodificar o arquivo (tente UTF-8).")
+        await ingestor.feed_validated(*batch)
+    summary = await ingestor.finish()
+    await register_ingested_file(db, owner_email, sha256, file.filename, stream.total_bytes, ingestor)
+    return summary
 
-    # 2) Detecta delimitador , ou ;
+async def _start_background_job(file: UploadFile, owner_email: str, force: bool, db: AsyncSession, columnar: bool = False):
+    try:
+        path, size, sha256 = await run_in_threadpool(_spool_to_disk, file.file, _spool_suffix(file.filename, columnar))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Não foi possível ler o arquivo: {e}")
+    if not force:
+        previous = await find_ingested_file(db, owner_email, sha256)
+        if previous:
+            os.unlink(path)
+            return previous
     try:
-        sample = text[:4096]
-        dialect = csv.Sniffer().sniff(sample, delimiters=",;")
+        await run_in_threadpool(_check_spooled, path, columnar)
     except Exception:
-        class _D: delimiter = ","
-        dialect = _D()
+        os.unlink(path)
+        raise
 
-    reader = csv.DictReader(io.StringIO(text), dialect=dialect)
+    job_id = str(uuid.uuid4())
+    db.add(models.IngestJob(
+        id=job_id,
+        owner_email=owner_email.lower(),
+        filename=file.filename,
+        status="queued",
+        total_bytes=size,
+        worker_id=ingest_jobs.worker_id,
+        heartbeat_at=func.now(),
+        spool_path=path,
+    ))
+    await db.commit()
+    ingest_jobs.submit(job_id, path, owner_email.lower(), sha256=sha256, filename=file.filename, columnar=columnar)
+    return JSONResponse(status_code=202, content={"job_id": job_id, "status": "queued"})
 
-    required = {"first_name","last_name","external_id","metric","value","unit","recorded_at"}
-    found = set([h.strip() for h in (reader.fieldnames or [])])
-    missing = required - found
-    if missing:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Colunas ausentes: {', '.join(sorted(missing))}. Cabeçalhos: {', '.join(sorted(found))}"
-        )
+@router.get("/jobs/{job_id}")
+async def get_ingest_job(
+    job_id: str,
+    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Progresso de um job de ingestão: linhas, throughput, erros e ETA."""
+    job = await db.get(models.IngestJob, job_id)
+    if not job or job.owner_email != current_user.email.lower():
+        raise HTTPException(status_code=404, detail="Job não encontrado")
 
-    inserted = 0
-    errors = []
-
-    # 3) Processa linhas sem abrir db.begin()
-    for _ in reader:
-        row = {k: (_ or "").strip() for k, _ in _.items()}  # trim seguro
-        try:
-            p = await _find_or_create_player(
-                db,
-                row["first_name"], row["last_name"],
-                row["external_id"] or None,
-                owner_email=current_user.email if current_user else None,
-            )
-
-            # Data/valor
-            try:
-                ts = datetime.fromisoformat(row["recorded_at"].replace("Z","+00:00"))
-            except Exception as e:
-                raise ValueError(f"recorded_at inválido: '{row['recorded_at']}' ({e})")
-            try:
-                val = float(str(row["value"]).replace(",", "."))
-            except Exception:
-                raise ValueError(f"value inválido: '{row['value']}'")
-
-            m = models.Measurement(
-                player_id=p.id,
-                metric=row["metric"],
-                value=val,
-                unit=row.get("unit") or "",
-                recorded_at=ts,
-                meta={"source": "csv"}
-            )
-            db.add(m)
-            # garante PK/visibilidade para selects subsequentes
-            await db.flush()
-
-            # gera alerta simples (essa função pode dar commit; tudo bem)
-            await _process_after_insert(
-                db, p.id, row["metric"], val, ts,
-                higher_better=(row["metric"].upper() not in {"LDH","CORTISOL","AST","GLICOSE"})
-            )
-
-            inserted += 1
-
-        except Exception as e:
-            errors.append({"row": reader.line_num, "error": str(e), "row_data": row})
-
-    # 4) Um commit no final (as linhas válidas ficam)
-    await db.commit()
-    return {"inserted": inserted, "errors": errors}
+    throughput = None
+    eta_seconds = None
+    if job.started_at:
+        end = job.finished_at or datetime.now(timezone.utc)
+        elapsed = (end - job.started_at).total_seconds()
+        if elapsed > 0:
+            throughput = round(job.rows_processed / elapsed, 1)
+        if job.status == "running" and job.bytes_read and job.total_bytes:
+            remaining = max(job.total_bytes - job.bytes_read, 0)
+            eta_seconds = round(elapsed * remaining / job.bytes_read, 1)
+
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "filename": job.filename,
+        "rows_processed": job.rows_processed,
+        "inserted": job.inserted,
+        "updated": job.updated,
+        "skipped": job.skipped,
+        "error_count": job.error_count,
+        "errors": job.errors or [],
+        "bytes_read": job.bytes_read,
+        "total_bytes": job.total_bytes,
+        "rows_per_second": throughput,
+        "eta_seconds": eta_seconds,
+        "detail": job.detail,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Depends
+
+import models
+from core.deps import get_current_user, user_cache
+from core.rate_limit import login_limiter
+from core.security import password_pool
+from database import db_pool_stats
+from services.ai_cache import ai_cache
+
+router = APIRouter(prefix="/api/metrics", tags=["metrics"])
+
+@router.get("")
+async def get_metrics(_current_user: models.User = Depends(get_current_user)):
+    """Contadores internos do processo (caches, filas) para observabilidade."""
+    return {
+        "ai_cache": ai_cache.stats(),
+        "user_cache": user_cache.stats(),
+        "password_pool": password_pool.stats(),
+        "login_limiter": login_limiter.stats(),
+        "db_pool": db_pool_stats(),
+    }
@@ -1,14 +1,26 @@
 import re
+import uuid
 from datetime import datetime, timezone, timedelta
+from itertools import groupby
+from operator import itemgetter
 from uuid import UUID
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List, Literal, Optional
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, Field
-from sqlalchemy import select, desc
+from sqlalchemy import BigInteger, cast, desc, func, literal_column, select, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 import models
 from core.deps import get_db, get_current_user
+from core.pagination import decode_cursor, encode_cursor
+from services.downsample import lttb_indices
+from services.evaluation import POSITIONS
+from services.normalization import metric_resolver
+from services.rankings import FORMATIONS, ranking_cache
 
 router = APIRouter(prefix="/api/players", tags=["players"])
 
@@ -47,14 +59,6 @@ def _normalize_code(source: str | None, fallback: str) -> str:
         cleaned = (cleaned + fallback).upper()
     return cleaned[:3]
 
-def _extract_manual_info(player: models.Player) -> dict:
-    ext = player.external_ids or {}
-    manual = dict(ext.get("manual") or {})
-    for key in ("player_code", "club_name", "club_code", "coach_name", "coach_code", "owner_email", "sequence"):
-        if key not in manual and key in ext:
-            manual[key] = ext.get(key)
-    return manual
-
 def _ensure_external_ids(player: models.Player, manual_info: dict) -> dict:
     ext = dict(player.external_ids or {})
     ext.update({
@@ -68,50 +72,69 @@ def _ensure_external_ids(player: models.Player, manual_info: dict) -> dict:
     ext["manual"] = manual_info
     return ext
 
-def _existing_codes_and_max_seq(players: list[models.Player], club_code: str, coach_code: str, owner_email: str) -> tuple[set[str], int]:
-    existing_codes: set[str] = set()
-    max_seq = 0
-    for player in players:
-        manual = _extract_manual_info(player)
-        if not manual:
-            continue
-        if manual.get("club_code") != club_code:
-            continue
-        if manual.get("coach_code") != coach_code:
-            continue
-        owner = (manual.get("owner_email") or "").lower()
-        if owner and owner != owner_email:
-            continue
-        code = manual.get("player_code")
-        if code:
-            existing_codes.add(code)
-            match = re.search(r"(\d+)$", code)
-            if match:
-                max_seq = max(max_seq, int(match.group(1)))
-    return existing_codes, max_seq
+PLAYER_PAGE_DEFAULT = 100
+PLAYER_PAGE_MAX = 500
+
+# Tentativas de gerar um código livre (colisão só com códigos antigos fora do contador)
+PLAYER_CODE_ATTEMPTS = 5
+
+async def _next_sequence(db: AsyncSession, owner_email: str, club_code: str, coach_code: str) -> int:
+    """Incrementa e devolve o contador do (técnico, clube, código do técnico) em um único UPSERT."""
+    seq_table = models.PlayerCodeSequence
+    stmt = pg_insert(seq_table).values(
+        owner_email=owner_email, club_code=club_code, coach_code=coach_code, last_value=1,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[seq_table.owner_email, seq_table.club_code, seq_table.coach_code],
+        set_={"last_value": seq_table.last_value + 1},
+    ).returning(seq_table.last_value)
+    return (await db.execute(stmt)).scalar_one()
 
 @router.get("", response_model=List[PlayerListResponse])
 async def list_players(
-    _current_user: models.User = Depends(get_current_user),
+    response: Response,
+    limit: int = Query(PLAYER_PAGE_DEFAULT, ge=1, le=PLAYER_PAGE_MAX),
+    cursor: Optional[str] = None,
+    current_user: models.User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    """Lista todos os jogadores cadastrados."""
-    # TODO: Filtrar por owner_email se quiser restringir ao técnico logado
-    result = await db.execute(select(models.Player).order_by(desc(models.Player.created_at)))
-    players = result.scalars().all()
-    
-    response = []
-    for p in players:
-        manual = _extract_manual_info(p)
-        response.append(PlayerListResponse(
-            id=p.id,
-            first_name=p.first_name,
-            last_name=p.last_name,
-            player_code=manual.get("player_code"),
-            club_name=manual.get("club_name"),
-            created_at=p.created_at
-        ))
-    return response
+    """
+    Lista os jogadores do técnico logado, do mais recente para o mais antigo.
+    Paginação por cursor em (created_at, id): se houver mais páginas, o
+    header X-Next-Cursor traz o valor para o parâmetro `cursor`.
+    """
+    ext = models.Player.external_ids
+    q = select(
+        models.Player.id,
+        models.Player.first_name,
+        models.Player.last_name,
+        models.Player.player_code,
+        func.coalesce(ext[("manual", "club_name")].as_string(), ext["club_name"].as_string()),
+        models.Player.created_at,
+    ).where(
+        models.Player.owner_email == current_user.email.lower()
+    ).order_by(
+        desc(models.Player.created_at), desc(models.Player.id)
+    ).limit(limit + 1)
+    if cursor:
+        q = q.where(tuple_(models.Player.created_at, models.Player.id) < tuple_(*decode_cursor(cursor)))
+
+    rows = (await db.execute(q)).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(rows[-1][5], rows[-1][0])
+
+    return [
+        PlayerListResponse(
+            id=pid,
+            first_name=first_name,
+            last_name=last_name,
+            player_code=player_code,
+            club_name=club_name,
+            created_at=created_at,
+        )
+        for pid, first_name, last_name, player_code, club_name, created_at in rows
+    ]
 
 @router.post("/manual", response_model=ManualPlayerResponse, status_code=status.HTTP_201_CREATED)
 async def create_manual_player(
@@ -135,41 +158,49 @@ async def create_manual_player(
     club_code = _normalize_code(payload.club_code or club_name, "CLB")
     coach_code = _normalize_code(payload.coach_code or coach_name, "COA")
 
-    players_res = await db.execute(select(models.Player))
-    players = players_res.scalars().all()
-    existing_codes, max_seq = _existing_codes_and_max_seq(players, club_code, coach_code, owner_email)
-
-    seq = max_seq + 1
-    player_code = f"{club_code}{coach_code}{seq:03d}"
-    while player_code in existing_codes:
-        seq += 1
+    # A linha do contador fica travada até o commit: criações simultâneas
+    # para o mesmo clube/técnico são serializadas, sem ler a tabela de jogadores.
+    for _ in range(PLAYER_CODE_ATTEMPTS):
+        seq = await _next_sequence(db, owner_email, club_code, coach_code)
         player_code = f"{club_code}{coach_code}{seq:03d}"
 
-    player = models.Player(
-        first_name=first_name,
-        last_name=last_name,
-        external_ids={},
-    )
-    manual_info = {
-        "player_code": player_code,
-        "club_name": club_name,
-        "club_code": club_code,
-        "coach_name": coach_name,
-        "coach_code": coach_code,
-        "owner_email": owner_email,
-        "sequence": seq,
-        "created_at": datetime.now(timezone.utc).isoformat(),
-    }
-    player.external_ids = _ensure_external_ids(player, manual_info)
+        player = models.Player(
+            first_name=first_name,
+            last_name=last_name,
+            external_ids={},
+            owner_email=owner_email,
+            player_code=player_code,
+            club_code=club_code,
+        )
+        manual_info = {
+            "player_code": player_code,
+            "club_name": club_name,
+            "club_code": club_code,
+            "coach_name": coach_name,
+            "coach_code": coach_code,
+            "owner_email": owner_email,
+            "sequence": seq,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        }
+        player.external_ids = _ensure_external_ids(player, manual_info)
+        player_id = player.id = uuid.uuid4()
+
+        try:
+            async with db.begin_nested():
+                db.add(player)
+        except IntegrityError:
+            continue  # código já usado (cadastro anterior ao contador): tenta o próximo
+        break
+    else:
+        raise HTTPException(status_code=409, detail="Não foi possível gerar um código único para o atleta.")
 
-    db.add(player)
     await db.commit()
-    await db.refresh(player)
+    ranking_cache.invalidate(owner_email)
 
     return ManualPlayerResponse(
-        id=player.id,
-        first_name=player.first_name,
-        last_name=player.last_name,
+        id=player_id,
+        first_name=first_name,
+        last_name=last_name,
         player_code=player_code,
         club_name=club_name,
         club_code=club_code,
@@ -178,6 +209,37 @@ async def create_manual_player(
         created_at=datetime.fromisoformat(manual_info["created_at"]),
     )
 
+@router.get("/rankings")
+async def player_rankings(
+    position: str | None = None,
+    k: int = Query(10, ge=1, le=100),
+    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Top-k atletas do técnico por posição (ou para todas as posições)."""
+    if position and position not in POSITIONS:
+        raise HTTPException(status_code=400, detail=f"Posição inválida. Use uma de: {', '.join(POSITIONS)}")
+    table = await ranking_cache.table(db, current_user.email)
+    positions = [position] if position else POSITIONS
+    return {pos: table.top_k(pos, k) for pos in positions}
+
+@router.get("/lineup")
+async def best_lineup(
+    formation: str = "4-3-3",
+    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Melhor escalação: atribuição ótima atleta -> posição para o esquema escolhido."""
+    if formation not in FORMATIONS:
+        raise HTTPException(status_code=400, detail=f"Esquema inválido. Use um de: {', '.join(FORMATIONS)}")
+    table = await ranking_cache.table(db, current_user.email)
+    lineup = table.best_lineup(FORMATIONS[formation])
+    return {
+        "formation": formation,
+        "total_score": round(sum(item["score"] for item in lineup), 1),
+        "lineup": lineup,
+    }
+
 # ------------------------------------------------------------------------------
 # Novos Endpoints para Perfil do Atleta
 # ------------------------------------------------------------------------------
@@ -216,37 +278,74 @@ async def update_assessment(
     ext = dict(player.external_ids or {})
     ext["assessment"] = data.model_dump()
     player.external_ids = ext
+    owner_email = player.owner_email
     
     db.add(player)
     await db.commit()
+    ranking_cache.invalidate(owner_email)
     return {"status": "success", "assessment": ext["assessment"]}
 
+HISTORY_MAX_POINTS = 5000
+
 @router.get("/{player_id}/history")
 async def get_player_history(
     player_id: UUID,
     days: int = 28,
+    metric: Optional[str] = None,
+    format: Literal["points", "columnar"] = "points",
+    bucket: Optional[Literal["day", "week"]] = None,
+    points: Optional[int] = Query(None, ge=3, le=HISTORY_MAX_POINTS),
     _current_user: models.User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    """Retorna histórico de GPS/HRV para gráficos."""
+    """
+    Retorna histórico de GPS/HRV para gráficos.
+
+    format=points (padrão): {métrica: [{"date", "value"}]}, data ISO-8601 com a
+    precisão gravada (no bucket, o início do bucket).
+    format=columnar: {métrica: {"t": [epoch ms], "v": [valores]}} — arrays paralelos.
+    bucket=day|week agrega no banco (média, com min/max/n no modo columnar);
+    points=N reduz cada série a N pontos com LTTB.
+    """
     since = datetime.now(timezone.utc) - timedelta(days=days)
-    
-    q = select(models.Measurement).where(
-        models.Measurement.player_id == player_id,
-        models.Measurement.recorded_at >= since
-    ).order_by(models.Measurement.recorded_at)
-    
-    result = await db.execute(q)
-    measurements = result.scalars().all()
-    
-    # Agrupar por métrica
+    m = models.Measurement
+    conditions = [m.player_id == player_id, m.recorded_at >= since]
+    if metric:
+        conditions.append(m.metric == metric_resolver.resolve(metric))
+
+    series: dict = {}
+    if bucket:
+        # Literais (e não parâmetros) para o GROUP BY reconhecer a mesma expressão
+        start = func.date_trunc(literal_column(f"'{bucket}'"), func.timezone(literal_column("'UTC'"), m.recorded_at))
+        epoch = cast(func.extract("epoch", start) * 1000, BigInteger)
+        q = select(
+            m.metric, epoch, func.avg(m.value), func.min(m.value), func.max(m.value), func.count(),
+        ).where(*conditions).group_by(m.metric, epoch).order_by(m.metric, epoch)
+        for name, rows in groupby((await db.execute(q)).all(), key=itemgetter(0)):
+            _, t, v, lo, hi, n = zip(*rows)
+            series[name] = {"t": list(t), "v": list(v), "min": list(lo), "max": list(hi), "n": list(n)}
+    else:
+        epoch = cast(func.floor(func.extract("epoch", m.recorded_at) * 1000), BigInteger)
+        q = select(m.metric, epoch, m.value, m.recorded_at).where(*conditions).order_by(m.metric, m.recorded_at)
+        for name, rows in groupby((await db.execute(q)).all(), key=itemgetter(0)):
+            _, t, v, at = zip(*rows)
+            series[name] = {"t": list(t), "v": list(v)}
+            if format == "points":
+                # O formato points devolve o recorded_at original (microssegundos)
+                series[name]["at"] = list(at)
+
+    if points:
+        for name, data in series.items():
+            if len(data["t"]) > points:
+                idx = lttb_indices(np.asarray(data["t"]), np.asarray(data["v"], dtype=np.float64), points)
+                series[name] = {key: np.asarray(values)[idx].tolist() for key, values in data.items()}
+
+    if format == "columnar":
+        # Já são tipos nativos: dispensa o jsonable_encoder
+        return ORJSONResponse(series)
+
     history = {}
-    for m in measurements:
-        if m.metric not in history:
-            history[m.metric] = []
-        history[m.metric].append({
-            "date": m.recorded_at.isoformat(),
-            "value": m.value
-        })
-        
+    for name, data in series.items():
+        dates = data.get("at") or [datetime.fromtimestamp(t / 1000, timezone.utc) for t in data["t"]]
+        history[name] = [{"date": at.isoformat(), "value": v} for at, v in zip(dates, data["v"])]
     return history
@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from pydantic import BaseModel
-from sqlalchemy import select, func, desc
+from sqlalchemy import select, func, desc, text, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 
 import models
 from core.deps import get_db, get_current_user
+from core.pagination import decode_cursor, encode_cursor
 
 router = APIRouter(prefix="/api/reports", tags=["reports"])
 
@@ -30,19 +33,76 @@ async def create_report(
     await db.refresh(new_report)
     return new_report
 
+REPORT_PAGE_DEFAULT = 50
+REPORT_PAGE_MAX = 200
+
+# pg_trgm instalado? (consultado uma vez por processo)
+_trgm_available: Optional[bool] = None
+
+async def _has_trgm(db: AsyncSession) -> bool:
+    global _trgm_available
+    if _trgm_available is None:
+        _trgm_available = bool((await db.execute(
+            text("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')")
+        )).scalar())
+    return _trgm_available
+
 @router.get("")
 async def get_reports(
+    response: Response,
     athlete: str | None = None,
+    q: str | None = Query(None, min_length=2, max_length=120),
+    include: Optional[Literal["analysis"]] = None,
+    limit: int = Query(REPORT_PAGE_DEFAULT, ge=1, le=REPORT_PAGE_MAX),
+    cursor: Optional[str] = None,
     _current_user: models.User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    """Busca todos os relatórios salvos no banco de dados (opcional: ?athlete=)."""
-    query = select(models.Report).order_by(models.Report.date.desc())
+    """
+    Lista os relatórios do mais recente para o mais antigo, em páginas.
+
+    Por padrão só id, athlete_name e date; ?include=analysis traz também
+    dados_atleta e analysis. ?athlete= filtra pelo nome exato (sem caixa) e
+    ?q= faz busca aproximada (trecho do nome ou similaridade trigram).
+    Paginação por cursor em (date, id) via header X-Next-Cursor.
+    """
+    report = models.Report
+    if include == "analysis":
+        query = select(report)
+    else:
+        query = select(report.id, report.athlete_name, report.date)
+    query = query.order_by(desc(report.date), desc(report.id)).limit(limit + 1)
+
+    name = func.lower(report.athlete_name)
     if athlete:
-        query = query.where(func.lower(models.Report.athlete_name) == func.lower(athlete))
+        query = query.where(name == func.lower(athlete))
+    if q:
+        term = q.strip().lower()
+        match = name.contains(term, autoescape=True)
+        if await _has_trgm(db):
+            match = match | name.op("%")(term)
+        query = query.where(match)
+    if cursor:
+        query = query.where(tuple_(report.date, report.id) < tuple_(*decode_cursor(cursor, int)))
+
     result = await db.execute(query)
-    reports = result.scalars().all()
-    return reports
+    rows = result.scalars().all() if include == "analysis" else result.all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(rows[-1].date, rows[-1].id)
+    return rows if include == "analysis" else [row._asdict() for row in rows]
+
+@router.get("/{report_id}")
+async def get_report(
+    report_id: int,
+    _current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Relatório completo, com dados_atleta e analysis."""
+    report = await db.get(models.Report, report_id)
+    if not report:
+        raise HTTPException(status_code=404, detail="Relatório não encontrado")
+    return report
 
 @router.delete("/{report_id}")
 async def delete_report(
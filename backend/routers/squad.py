@@ -0,0 +1,50 @@
+from datetime import datetime, timezone
+
+from fastapi import APIRouter, Depends
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+from core.deps import get_db, get_current_user
+from services.readiness import load_daily_metrics, summarize_daily
+
+router = APIRouter(prefix="/api/squad", tags=["squad"])
+
+def _r(value, ndigits=1):
+    return round(value, ndigits) if value is not None else None
+
+@router.get("/readiness")
+async def squad_readiness(
+    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Prontidão do elenco do técnico logado (HRV drop + ACWR), ordenada por risco.
+    Usa os agregados diários: duas queries no total, independente do tamanho do elenco.
+    """
+    now = datetime.now(timezone.utc)
+    owner_email = current_user.email.lower()
+    q = select(models.Player.id, models.Player.first_name, models.Player.last_name).where(
+        models.Player.owner_email == owner_email
+    )
+    players = (await db.execute(q)).all()
+    daily = await load_daily_metrics(db, [p.id for p in players], now=now)
+
+    table = []
+    for p in players:
+        result = summarize_daily(daily.get(p.id, []), now=now)
+        table.append({
+            "player_id": str(p.id),
+            "first_name": p.first_name,
+            "last_name": p.last_name,
+            "risk": result["risk"],
+            "hrv_recent": _r(result["hrv_recent"]),
+            "hrv_baseline": _r(result["hrv_baseline"]),
+            "hrv_drop_pct": _r(result["hrv_drop_pct"]),
+            "acwr": _r(result["acwr"], 2),
+            "acute_load": _r(result["acute_load"]),
+            "alerts": result["alerts"],
+        })
+
+    table.sort(key=lambda row: (-row["risk"], -(row["hrv_drop_pct"] or 0), -(row["acwr"] or 0)))
+    return {"generated_at": now, "players": table}
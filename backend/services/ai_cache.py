@@ -0,0 +1,141 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+import models
+from core.config import settings
+from database import SessionLocal
+
+# ------------------------------------------------------------------------------
+# Cache de respostas do Gemini, endereçado pelo conteúdo do prompt
+# ------------------------------------------------------------------------------
+
+
+class MemoryCacheBackend:
+    """LRU em processo com TTL por entrada."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, tuple[float, dict]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[dict]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: dict, ttl: int) -> None:
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def size(self) -> int:
+        return len(self._data)
+
+
+class SQLCacheBackend:
+    """Tabela ai_response_cache: compartilhada entre workers, expira por TTL."""
+
+    # A cada N gravações remove as entradas vencidas
+    PRUNE_EVERY = 100
+
+    def __init__(self):
+        self._writes = 0
+
+    async def get(self, key: str) -> Optional[dict]:
+        async with SessionLocal() as db:
+            q = select(models.AIResponseCache.response).where(
+                models.AIResponseCache.key == key,
+                models.AIResponseCache.expires_at > datetime.now(timezone.utc),
+            )
+            return (await db.execute(q)).scalar_one_or_none()
+
+    async def set(self, key: str, value: dict, ttl: int) -> None:
+        now = datetime.now(timezone.utc)
+        stmt = pg_insert(models.AIResponseCache).values(
+            key=key, response=value, created_at=now, expires_at=now + timedelta(seconds=ttl)
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[models.AIResponseCache.key],
+            set_={"response": stmt.excluded.response, "created_at": now, "expires_at": stmt.excluded.expires_at},
+        )
+        async with SessionLocal() as db:
+            await db.execute(stmt)
+            self._writes += 1
+            if self._writes % self.PRUNE_EVERY == 0:
+                await db.execute(delete(models.AIResponseCache).where(models.AIResponseCache.expires_at <= now))
+            await db.commit()
+
+    def size(self) -> Optional[int]:
+        return None
+
+
+class AIResponseCache:
+    """
+    Cache das análises do Gemini. A chave é o hash do prompt já renderizado
+    (avaliação, resumo de métricas, alertas) + URL do modelo, então qualquer
+    mudança nos dados gera uma chave nova.
+    """
+
+    def __init__(self, backend: str, ttl: int, max_entries: int):
+        self.enabled = backend != "off"
+        self.ttl = ttl
+        self.backend = SQLCacheBackend() if backend == "sql" else MemoryCacheBackend(max_entries)
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    @staticmethod
+    def key_for(prompt: str, model_url: str, generation_config: Dict[str, Any]) -> str:
+        raw = json.dumps(
+            {"model": model_url, "prompt": prompt, "generationConfig": generation_config},
+            sort_keys=True, ensure_ascii=False,
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[dict]:
+        if not self.enabled:
+            return None
+        value = await self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: dict) -> None:
+        if not self.enabled:
+            return
+        await self.backend.set(key, value, self.ttl)
+        self.stores += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__ if self.enabled else "off",
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "entries": self.backend.size(),
+            "ttl_seconds": self.ttl,
+        }
+
+
+ai_cache = AIResponseCache(
+    backend=settings.AI_CACHE_BACKEND,
+    ttl=settings.AI_CACHE_TTL_SECONDS,
+    max_entries=settings.AI_CACHE_MAX_ENTRIES,
+)
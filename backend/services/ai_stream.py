@@ -0,0 +1,317 @@
+import html
+import html.entities
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# ------------------------------------------------------------------------------
+# Parsing incremental da resposta do Gemini (streamGenerateContent)
+# ------------------------------------------------------------------------------
+# Maior tag/comentário/entidade que esperamos completar antes de tratar como texto
+MAX_TAG_LEN = 256
+MAX_ENTITY_LEN = 34  # &CounterClockwiseContourIntegral;
+
+_ENTITY_RE = re.compile(r"&(#[0-9]{1,7}|#[xX][0-9a-fA-F]{1,6}|[a-zA-Z][a-zA-Z0-9]{1,31});")
+_PARTIAL_ENTITY_RE = re.compile(r"&[#a-zA-Z0-9]*")
+_TAG_NAME_RE = re.compile(r"[^\s/>]+")
+_CUT_TAG_RE = re.compile(r"</?[a-zA-Z][^\s/>]*[\s/]")
+_VOID_TAGS = {"br"}
+# Abrir estas tags fecha um <p> aberto (regra de "end tag implícita" do HTML5)
+_CLOSES_P = {"p", "ul", "li"}
+
+
+def _scan_markup(buf: str, i: int) -> Tuple[str, int]:
+    """
+    Classifica o markup que começa em buf[i] == "<", seguindo o tokenizador do
+    HTML5 (o mesmo do bleach/html5lib): ("tag", fim), ("comment", fim) ou
+    ("text", i + 1) quando o "<" é texto. Devolve ("partial", -1) se o trecho
+    ainda pode estar incompleto.
+    """
+    nxt = buf[i + 1:i + 2]
+    if not nxt:
+        return "partial", -1
+    if nxt == "!":
+        if buf.startswith("<!--", i):
+            for empty in ("<!-->", "<!--->"):
+                if buf.startswith(empty, i):
+                    return "comment", i + len(empty)
+            ends = [(k, len(t)) for t in ("-->", "--!>") for k in [buf.find(t, i + 4)] if k != -1]
+            if not ends:
+                return "partial", -1
+            end, size = min(ends)
+            return "comment", end + size
+        if len(buf) - i < 4 and "<!--".startswith(buf[i:]):
+            return "partial", -1
+    if nxt in "!?":
+        # doctype, <?...> e afins: comentário "bogus" até o próximo >
+        end = buf.find(">", i)
+        return ("comment", end + 1) if end != -1 else ("partial", -1)
+    if nxt == "/":
+        after = buf[i + 2:i + 3]
+        if not after:
+            return "partial", -1
+        if after == ">":
+            return "comment", i + 3  # </> é ignorado
+        if not after.isalpha():
+            return "text", i + 1  # </ 1> fica como texto (bleach)
+        start = i + 2
+    elif nxt.isalpha():
+        start = i + 1
+    else:
+        return "text", i + 1
+    # Fim da tag: o primeiro > fora de valor de atributo entre aspas
+    j, n = start, len(buf)
+    prev = ""
+    while j < n:
+        c = buf[j]
+        if c == ">":
+            return "tag", j + 1
+        if c in "\"'" and prev == "=":
+            close = buf.find(c, j + 1)
+            if close == -1:
+                return "partial", -1
+            j = close
+        if not c.isspace():
+            prev = c
+        j += 1
+    return "partial", -1
+
+
+class HTMLStreamSanitizer:
+    """
+    Sanitizador de HTML que aceita o texto em pedaços arbitrários.
+
+    Equivale ao bleach.clean(strip=True) usado na resposta final: tags
+    permitidas saem sem atributos; as demais (e comentários) são removidas
+    mantendo o texto interno; `<`, `>`, `&` soltos e entidades desconhecidas
+    são escapados. Tags, comentários e entidades cortados entre dois pedaços
+    ficam no buffer até completarem. A estrutura também segue o HTML5 onde é
+    possível sem olhar adiante (tags fechadas no fim, `</x>` fora de ordem
+    fecha as internas, `<p>`/`<li>` implícitos); aninhamento cruzado sai
+    diferente do bleach, mas sempre bem formado.
+    """
+
+    def __init__(self, allowed_tags: Iterable[str]):
+        self.allowed = {t.lower() for t in allowed_tags}
+        self._buf = ""
+        self._open: List[str] = []
+
+    def feed(self, text: str) -> str:
+        buf = self._buf + text
+        out: List[str] = []
+        i = 0
+        n = len(buf)
+        while i < n:
+            c = buf[i]
+            if c == "<":
+                kind, end = _scan_markup(buf, i)
+                if kind == "partial":
+                    if n - i < MAX_TAG_LEN:
+                        break  # ainda incompleto
+                    kind, end = "text", i + 1
+                if kind == "text":
+                    out.append("&lt;")
+                elif kind == "tag":
+                    self._tag(buf[i:end], out)
+                i = end
+            elif c == "&":
+                m = _ENTITY_RE.match(buf, i)
+                if m is not None and (m.group(1)[0] == "#" or m.group(1) + ";" in html.entities.html5):
+                    out.append(m.group(0))
+                    i = m.end()
+                elif n - i < MAX_ENTITY_LEN and _PARTIAL_ENTITY_RE.fullmatch(buf, i):
+                    break  # entidade possivelmente incompleta
+                else:
+                    out.append("&amp;")
+                    i += 1
+            elif c == ">":
+                out.append("&gt;")
+                i += 1
+            else:
+                j = i + 1
+                while j < n and buf[j] not in "<&>":
+                    j += 1
+                out.append(buf[i:j])
+                i = j
+        self._buf = buf[i:]
+        return "".join(out)
+
+    def close(self) -> str:
+        rest, self._buf = self._buf, ""
+        if rest.startswith(("<!", "<?")) or _CUT_TAG_RE.match(rest):
+            rest = ""  # comentário ou tag com atributos cortados pelo fim do texto: o HTML5 descarta
+        out = [html.escape(rest, quote=False)]
+        self._close_to(None, out)
+        return "".join(out)
+
+    def _tag(self, raw: str, out: List[str]) -> None:
+        closing = raw.startswith("</")
+        name = _TAG_NAME_RE.match(raw, 2 if closing else 1).group(0).lower()
+        if name not in self.allowed:
+            return
+        if name in _VOID_TAGS:
+            out.append(f"<{name}>")  # </br> vale como <br> no HTML5
+        elif closing:
+            if name in self._open:
+                self._close_to(name, out)
+            elif name == "p":
+                out.append("<p></p>")  # </p> solto vira um parágrafo vazio no HTML5
+        else:
+            if name == "li" and "li" in self._open[self._last("ul") + 1:]:
+                self._close_to("li", out)
+            if name in _CLOSES_P and "p" in self._open:
+                self._close_to("p", out)
+            self._open.append(name)
+            out.append(f"<{name}>")
+
+    def _last(self, name: str) -> int:
+        return max((k for k, tag in enumerate(self._open) if tag == name), default=-1)
+
+    def _close_to(self, name: Optional[str], out: List[str]) -> None:
+        """Fecha as tags abertas até `name` (inclusive); None fecha todas."""
+        stop = self._last(name) if name is not None else 0
+        while len(self._open) > stop:
+            out.append(f"</{self._open.pop()}>")
+
+
+class AnalysisStreamParser:
+    """
+    Lê o JSON de saída do Gemini à medida que chega e devolve, para os campos
+    de texto escolhidos, os trechos novos já sanitizados: [(campo, html)].
+
+    Só entende o formato pedido no prompt (objeto plano de strings); outros
+    valores são ignorados. O resultado final continua vindo do json.loads do
+    texto completo.
+    """
+
+    def __init__(self, fields: Iterable[str], allowed_tags: Iterable[str]):
+        self.fields = set(fields)
+        self.allowed_tags = list(allowed_tags)
+        self._sanitizers: Dict[str, HTMLStreamSanitizer] = {}
+        self._state = "start"
+        self._key: List[str] = []
+        self._field: Optional[str] = None
+        self._escape: Optional[str] = None  # None | "" | "uXXXX" parcial
+        self._high_surrogate: Optional[int] = None
+        self._depth = 0
+        self._in_nested_str = False
+        self._nested_escape = False
+
+    def feed(self, text: str) -> List[Tuple[str, str]]:
+        pieces: List[str] = []
+        out: List[Tuple[str, str]] = []
+
+        def flush():
+            if self._field is not None and pieces:
+                safe = self._sanitizer(self._field).feed("".join(pieces))
+                if safe:
+                    out.append((self._field, safe))
+            pieces.clear()
+
+        for c in text:
+            state = self._state
+            if state == "value":
+                if self._escape is not None:
+                    ch = self._unescape(c)
+                    if ch and self._field is not None:
+                        pieces.append(ch)
+                elif c == "\\":
+                    self._escape = ""
+                elif c == '"':
+                    flush()
+                    if self._field is not None:
+                        rest = self._sanitizer(self._field).close()
+                        if rest:
+                            out.append((self._field, rest))
+                    self._field = None
+                    self._state = "after_value"
+                elif self._field is not None:
+                    pieces.append(c)
+            elif state == "start":
+                if c == "{":
+                    self._state = "key_or_end"
+            elif state in ("key_or_end", "after_value"):
+                if c == '"':
+                    self._key = []
+                    self._state = "key"
+            elif state == "key":
+                if self._escape is not None:
+                    self._key.append(c)
+                    self._escape = None
+                elif c == "\\":
+                    self._escape = ""
+                elif c == '"':
+                    self._state = "colon"
+                else:
+                    self._key.append(c)
+            elif state == "colon":
+                if c == ":":
+                    self._state = "before_value"
+            elif state == "before_value":
+                if c == '"':
+                    key = "".join(self._key)
+                    self._field = key if key in self.fields else None
+                    self._state = "value"
+                elif not c.isspace():
+                    # número, bool, objeto ou lista: só pula até o fim
+                    self._depth = 1 if c in "{[" else 0
+                    self._in_nested_str = False
+                    self._state = "other"
+            elif state == "other":
+                self._skip_other(c)
+        flush()
+        return out
+
+    def close(self) -> List[Tuple[str, str]]:
+        out = []
+        for field, sanitizer in self._sanitizers.items():
+            rest = sanitizer.close()
+            if rest:
+                out.append((field, rest))
+        return out
+
+    def _sanitizer(self, field: str) -> HTMLStreamSanitizer:
+        if field not in self._sanitizers:
+            self._sanitizers[field] = HTMLStreamSanitizer(self.allowed_tags)
+        return self._sanitizers[field]
+
+    def _unescape(self, c: str) -> str:
+        """Consome um caractere de uma sequência de escape; devolve o texto pronto."""
+        if self._escape == "":
+            if c != "u":
+                self._escape = None
+                return {"n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f"}.get(c, c)
+            self._escape = "u"
+            return ""
+        self._escape += c
+        if len(self._escape) < 5:
+            return ""
+        code = int(self._escape[1:], 16)
+        self._escape = None
+        if 0xD800 <= code < 0xDC00:
+            self._high_surrogate = code
+            return ""
+        if 0xDC00 <= code < 0xE000 and self._high_surrogate is not None:
+            code = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+        self._high_surrogate = None
+        return chr(code)
+
+    def _skip_other(self, c: str) -> None:
+        if self._in_nested_str:
+            if self._nested_escape:
+                self._nested_escape = False
+            elif c == "\\":
+                self._nested_escape = True
+            elif c == '"':
+                self._in_nested_str = False
+            return
+        if c == '"':
+            self._in_nested_str = True
+        elif c in "{[":
+            self._depth += 1
+        elif c in "}]":
+            if self._depth == 0:
+                self._state = "start"  # fim do objeto principal
+            else:
+                self._depth -= 1
+        elif c == "," and self._depth == 0:
+            self._state = "after_value"
@@ -0,0 +1,314 @@
+from datetime import datetime, timedelta, timezone
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+from services.ingestion import ANONYMOUS_ROW, WideLayout, parse_recorded_at
+from services.normalization import find_column, metric_resolver, normalize_unit
+
+# ------------------------------------------------------------------------------
+# Ingestão de arquivos colunares (Parquet / Arrow IPC)
+# ------------------------------------------------------------------------------
+# Linhas por RecordBatch lido e por bloco gravado: as linhas já chegam
+# validadas, então um bloco maior quase nunca é descartado inteiro
+COLUMNAR_CHUNK_SIZE = 10000
+PARQUET_MAGIC = b"PAR1"
+ARROW_FILE_MAGIC = b"ARROW1"
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_NUMBER_RE = r"^[+-]?(\d+([.,]\d*)?|[.,]\d+)([eE][+-]?\d+)?$"
+
+
+def _is_text(t: pa.DataType) -> bool:
+    return pa.types.is_string(t) or pa.types.is_large_string(t)
+
+
+def _is_number(t: pa.DataType) -> bool:
+    return pa.types.is_integer(t) or pa.types.is_floating(t) or pa.types.is_decimal(t)
+
+
+def _plain(column: pa.Array) -> pa.Array:
+    """Colunas dictionary (comuns em Parquet) viram o tipo dos valores."""
+    if pa.types.is_dictionary(column.type):
+        return column.dictionary_decode()
+    return column
+
+
+def _texts(column: Optional[pa.Array]) -> Optional[pa.Array]:
+    """Texto 'trimado'; nulo vira ""."""
+    if column is None:
+        return None
+    column = _plain(column)
+    if not _is_text(column.type):
+        column = pc.cast(column, pa.string())
+    return pc.fill_null(pc.utf8_trim_whitespace(column), "")
+
+
+def _timestamps(column: pa.Array) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Datas como microssegundos UTC (int64) + máscara de inválidas. Timestamp
+    sem fuso é tratado como UTC (igual ao CSV). Texto é convertido em bloco;
+    só se algum valor não for ISO-8601 cai no parser do CSV, por valor distinto.
+    """
+    column = _plain(column)
+    if _is_text(column.type):
+        text = pc.utf8_trim_whitespace(column)
+        for target in (pa.timestamp("us", "UTC"), pa.timestamp("us")):
+            try:
+                column = pc.cast(text, target)
+                break
+            except pa.ArrowInvalid:
+                continue
+        else:
+            encoded = text.dictionary_encode()
+            parsed = []
+            for raw in encoded.dictionary.to_pylist():
+                try:
+                    parsed.append((parse_recorded_at(raw) - _EPOCH) // timedelta(microseconds=1))
+                except ValueError:
+                    parsed.append(None)
+            column = pc.take(pa.array(parsed, pa.int64()), encoded.indices)
+    if not pa.types.is_integer(column.type):
+        tz = column.type.tz if pa.types.is_timestamp(column.type) else None
+        column = pc.cast(column, pa.timestamp("us", tz), safe=False)
+    us = pc.cast(column, pa.int64()).to_numpy(zero_copy_only=False)
+    bad = pc.is_null(column).to_numpy(zero_copy_only=False)
+    return np.where(bad, 0, us).astype(np.int64), bad
+
+
+def _numbers(column: pa.Array) -> Tuple[np.ndarray, np.ndarray]:
+    """Valores como float64 + máscara de inválidos (nulo, texto não numérico, NaN/inf)."""
+    column = _plain(column)
+    if _is_text(column.type):
+        text = pc.utf8_trim_whitespace(column)
+        ok = pc.fill_null(pc.match_substring_regex(text, _NUMBER_RE), False)
+        column = pc.replace_substring(pc.if_else(ok, text, pa.scalar(None, column.type)), ",", ".")
+    values = pc.cast(column, pa.float64()).to_numpy(zero_copy_only=False)
+    bad = ~np.isfinite(values)
+    return np.where(bad, 0.0, values), bad
+
+
+def _present(column: pa.Array) -> np.ndarray:
+    """Células preenchidas de uma coluna de métrica (nulo, "" e NaN = não medida)."""
+    column = _plain(column)
+    if _is_text(column.type):
+        filled = pc.not_equal(pc.utf8_trim_whitespace(column), "")
+    elif pa.types.is_floating(column.type):
+        filled = pc.invert(pc.is_nan(column))
+    else:
+        filled = pc.is_valid(column)
+    return pc.fill_null(filled, False).to_numpy(zero_copy_only=False)
+
+
+def _datetimes(us: np.ndarray) -> List[datetime]:
+    """Microssegundos -> datetime UTC, convertendo cada instante distinto uma vez só."""
+    distinct, inverse = np.unique(us, return_inverse=True)
+    table = [_EPOCH + timedelta(microseconds=v) for v in distinct.tolist()]
+    return [table[i] for i in inverse.tolist()]
+
+
+def _jsonable(value):
+    return value if value is None or isinstance(value, (str, int, float, bool)) else str(value)
+
+
+def _shown(value) -> str:
+    """Valor como aparece na mensagem de erro (célula nula = vazia, igual ao CSV)."""
+    return "" if value is None else str(value)
+
+
+class ColumnarStream:
+    """
+    Leitura de Parquet ou Arrow IPC (arquivo ou stream) em RecordBatches de
+    até `batch_rows` linhas; o formato vem dos bytes mágicos, não da extensão.
+
+    Colunas tipadas dispensam o parse linha a linha do CSV: `read_batch`
+    valida o lote inteiro de forma vetorizada (pyarrow/numpy), resolve
+    métrica e unidade uma vez por valor distinto e devolve as linhas já no
+    formato do BulkIngestor (feed_validated), mais os erros por linha. O
+    número da linha nos erros é a posição no arquivo (1 = primeira linha de dados).
+    """
+
+    def __init__(self, fileobj: BinaryIO, batch_rows: int = COLUMNAR_CHUNK_SIZE):
+        head = fileobj.read(len(ARROW_FILE_MAGIC))
+        fileobj.seek(0, 2)
+        self.total_bytes = fileobj.tell()
+        fileobj.seek(0)
+        self._fileobj = fileobj
+        self.batch_rows = batch_rows
+        self.rows_read = 0
+        self.num_rows: Optional[int] = None
+
+        if head.startswith(PARQUET_MAGIC):
+            self.format = "parquet"
+            parquet = pq.ParquetFile(fileobj)
+            self.schema = parquet.schema_arrow
+            self.num_rows = parquet.metadata.num_rows
+            batches = parquet.iter_batches(batch_size=batch_rows)
+        elif head.startswith(ARROW_FILE_MAGIC):
+            self.format = "arrow"
+            reader = ipc.open_file(fileobj)
+            self.schema = reader.schema
+            self.num_rows = reader.count_rows()
+            batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+        else:
+            self.format = "arrow-stream"
+            reader = ipc.open_stream(fileobj)
+            self.schema = reader.schema
+            batches = iter(reader)
+        self._batches = self._rebatch(batches)
+        self.fieldnames = self.schema.names
+
+    @property
+    def source(self) -> str:
+        """Valor de `source` das medições: Arrow arquivo e stream são o mesmo dado."""
+        return "parquet" if self.format == "parquet" else "arrow"
+
+    @property
+    def bytes_read(self) -> int:
+        """Progresso em bytes (proporcional às linhas lidas quando o total é conhecido)."""
+        if self.num_rows:
+            return self.total_bytes * self.rows_read // self.num_rows
+        return self._fileobj.tell()
+
+    def _rebatch(self, batches: Iterable[pa.RecordBatch]) -> Iterator[pa.RecordBatch]:
+        for batch in batches:
+            for start in range(0, batch.num_rows, self.batch_rows):
+                yield batch.slice(start, self.batch_rows)
+
+    def check_types(self, date_key: str, layout: Optional[WideLayout] = None) -> None:
+        """Tipos aceitos por coluna; lança ValueError (o arquivo inteiro seria recusado linha a linha)."""
+        def check(name: Optional[str], accepts, expected: str) -> None:
+            if name is None:
+                return
+            t = self.schema.field(name).type
+            t = t.value_type if pa.types.is_dictionary(t) else t
+            if not accepts(t):
+                raise ValueError(f"coluna '{name}' com tipo {t} (esperado {expected})")
+
+        is_date = lambda t: pa.types.is_timestamp(t) or pa.types.is_date(t) or _is_text(t)
+        is_value = lambda t: _is_number(t) or _is_text(t)
+        is_label = lambda t: _is_text(t) or pa.types.is_integer(t)
+        check(date_key, is_date, "timestamp, date ou texto ISO-8601")
+        if layout:
+            for column, _, _ in layout.metric_columns:
+                check(column, is_value, "número ou texto")
+            for name in (layout.first_name, layout.last_name, layout.full_name, layout.external_id):
+                check(name, is_label, "texto")
+        else:
+            check(self._long_column("value"), is_value, "número ou texto")
+            for key in ("first_name", "last_name", "external_id", "metric", "unit"):
+                check(self._long_column(key), is_label, "texto")
+
+    def _long_column(self, key: str) -> str:
+        return find_column(self.fieldnames, [key])
+
+    def read_batch(self, date_key: str, layout: Optional[WideLayout] = None) -> Optional[Tuple[List[dict], List[dict]]]:
+        """Próximo lote como (itens válidos, erros); None no fim do arquivo."""
+        batch = next(self._batches, None)
+        if batch is None:
+            return None
+        first_row = self.rows_read + 1
+        self.rows_read += batch.num_rows
+        return self._validate(batch, first_row, date_key, layout)
+
+    def _validate(
+        self, batch: pa.RecordBatch, first_row: int, date_key: str, layout: Optional[WideLayout],
+    ) -> Tuple[List[dict], List[dict]]:
+        texts = lambda name: _texts(batch.column(name)).to_pylist() if name else [""] * batch.num_rows
+        ts_us, ts_bad = _timestamps(batch.column(date_key))
+
+        # Atleta: nome completo dos exports largos é separado no primeiro espaço,
+        # uma vez por nome distinto
+        if layout and layout.full_name:
+            names = _texts(batch.column(layout.full_name)).dictionary_encode()
+            split = [name.partition(" ") for name in names.dictionary.to_pylist()]
+            firsts = pa.array([first for first, _, _ in split], pa.string())
+            lasts = pa.array([last.strip() for _, _, last in split], pa.string())
+            first_names = pc.take(firsts, names.indices).to_pylist()
+            last_names = pc.take(lasts, names.indices).to_pylist()
+        else:
+            # Export largo só com coluna de id: nomes vazios, o atleta sai do external_id
+            first_names = texts(layout.first_name if layout else self._long_column("first_name"))
+            last_names = texts(layout.last_name if layout else self._long_column("last_name"))
+        external_ids = texts(layout.external_id if layout else self._long_column("external_id"))
+        anonymous = np.array([not (f or l or e) for f, l, e in zip(first_names, last_names, external_ids)], dtype=bool)
+
+        # Partes no formato longo: (linhas do lote, coluna de valor, códigos de
+        # métrica + tabela de nomes canônicos, códigos de unidade + tabela de unidades)
+        parts = []
+        if layout:
+            for name, metric, unit in layout.metric_columns:
+                idx = np.flatnonzero(_present(batch.column(name)))
+                zeros = np.zeros(len(idx), dtype=np.int64)
+                parts.append((idx, name, zeros, [metric], zeros, [unit]))
+        else:
+            metrics = _texts(batch.column(self._long_column("metric"))).dictionary_encode()
+            units = _texts(batch.column(self._long_column("unit"))).dictionary_encode()
+            parts.append((
+                np.arange(batch.num_rows),
+                self._long_column("value"),
+                metrics.indices.to_numpy().astype(np.int64),
+                [metric_resolver.resolve(m) for m in metrics.dictionary.to_pylist()],
+                units.indices.to_numpy().astype(np.int64),
+                units.dictionary.to_pylist(),
+            ))
+
+        items: List[dict] = []
+        errors: List[dict] = []
+        for idx, value_key, metric_codes, metric_table, unit_codes, unit_table in parts:
+            values, value_bad = _numbers(pc.take(batch.column(value_key), pa.array(idx, pa.int64())))
+
+            # Unidade canônica uma vez por par (métrica, unidade) distinto
+            pairs, inverse = np.unique(metric_codes * len(unit_table) + unit_codes, return_inverse=True)
+            conversions = []
+            for code in pairs.tolist():
+                metric, unit = metric_table[code // len(unit_table)], unit_table[code % len(unit_table)]
+                try:
+                    if not metric:
+                        raise ValueError("metric vazio")
+                    factor, canonical = normalize_unit(metric, 1.0, unit)
+                    conversions.append((metric, factor, canonical, None))
+                except ValueError as e:
+                    conversions.append((metric, 1.0, unit, str(e)))
+            pair_bad = np.array([c[3] is not None for c in conversions], dtype=bool)[inverse]
+            values = values * np.array([c[1] for c in conversions], dtype=np.float64)[inverse]
+            bad = ts_bad[idx] | value_bad | pair_bad | anonymous[idx]
+
+            # Daqui em diante só listas Python: indexar numpy por linha custaria mais que o dict
+            good = np.flatnonzero(~bad)
+            pair_metrics = [c[0] for c in conversions]
+            pair_units = [c[2] for c in conversions]
+            items.extend(
+                {
+                    "line": first_row + i,
+                    "row": None,
+                    "first_name": first_names[i],
+                    "last_name": last_names[i],
+                    "external_id": external_ids[i] or None,
+                    "metric": pair_metrics[p],
+                    "value": value,
+                    "unit": pair_units[p],
+                    "recorded_at": ts,
+                }
+                for i, p, value, ts in zip(
+                    idx[good].tolist(), inverse[good].tolist(), values[good].tolist(), _datetimes(ts_us[idx[good]]),
+                )
+            )
+
+            for k in np.flatnonzero(bad).tolist():
+                i = int(idx[k])
+                row = {name: _jsonable(value) for name, value in batch.slice(i, 1).to_pylist()[0].items()}
+                if ts_bad[i]:
+                    error = f"{date_key} inválido: '{_shown(row[date_key])}'"
+                elif value_bad[k]:
+                    error = f"{value_key} inválido: '{_shown(row[value_key])}'"
+                elif pair_bad[k]:
+                    error = conversions[inverse[k]][3]
+                else:
+                    error = ANONYMOUS_ROW
+                errors.append({"row": first_row + i, "error": error, "row_data": row})
+        return items, errors
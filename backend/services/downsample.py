@@ -0,0 +1,36 @@
+import numpy as np
+
+# ------------------------------------------------------------------------------
+# Redução de séries para gráficos
+# ------------------------------------------------------------------------------
+
+
+def lttb_indices(t: np.ndarray, v: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: índices de `n_out` pontos que preservam o
+    formato visual da série (picos e vales). `t` deve estar ordenado.
+    O laço é por bucket; dentro de cada bucket o cálculo é vetorizado.
+    """
+    n = len(t)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    t = t.astype(np.float64)
+    v = v.astype(np.float64)
+    # Primeiro e último ficam fixos; o miolo é dividido em n_out - 2 buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    out = np.empty(n_out, dtype=np.int64)
+    out[0] = 0
+    out[-1] = n - 1
+    prev = 0
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        # Média do próximo bucket (ou o último ponto) como terceiro vértice
+        nlo, nhi = hi, edges[b + 2] if b + 2 < len(edges) else n
+        avg_t = t[nlo:nhi].mean() if nhi > nlo else t[-1]
+        avg_v = v[nlo:nhi].mean() if nhi > nlo else v[-1]
+        pt, pv = t[prev], v[prev]
+        area = np.abs((pt - avg_t) * (v[lo:hi] - pv) - (pt - t[lo:hi]) * (avg_v - pv))
+        prev = lo + int(np.argmax(area))
+        out[b + 1] = prev
+    return out
@@ -1,4 +1,31 @@
-from typing import Dict, List, Optional, Union, Any
+from typing import Dict, List, Optional, Sequence, Union, Any
+
+import numpy as np
+
+SKILL_KEYS = [
+    "controle_bola", "drible", "passe_curto", "passe_longo", "finalizacao",
+    "cabeceio", "desarme", "visao_jogo", "compostura", "agressividade"
+]
+FEATURE_KEYS = SKILL_KEYS + ["velocidade", "agilidade", "salto", "resistencia"]
+
+# Pesos por posição
+POSITION_WEIGHTS = {
+    "goleiro": {"compostura": 0.30, "salto": 0.25, "visao_jogo": 0.20, "passe_curto": 0.15, "passe_longo": 0.10},
+    "zagueiro": {"desarme": 0.25, "cabeceio": 0.20, "compostura": 0.15, "passe_curto": 0.10, "agressividade": 0.15, "salto": 0.15},
+    "lateral": {"velocidade": 0.25, "drible": 0.15, "passe_longo": 0.10, "desarme": 0.15, "resistencia": 0.20, "agilidade": 0.15},
+    "volante": {"desarme": 0.20, "passe_curto": 0.20, "compostura": 0.15, "visao_jogo": 0.20, "agressividade": 0.10, "resistencia": 0.15},
+    "meia": {"visao_jogo": 0.25, "passe_curto": 0.20, "drible": 0.15, "finalizacao": 0.15, "compostura": 0.15, "passe_longo": 0.10},
+    "ponta": {"velocidade": 0.30, "drible": 0.25, "finalizacao": 0.20, "agilidade": 0.15, "passe_curto": 0.10},
+    "atacante": {"finalizacao": 0.35, "cabeceio": 0.15, "compostura": 0.15, "visao_jogo": 0.10, "agressividade": 0.15, "controle_bola": 0.10}
+}
+POSITIONS = list(POSITION_WEIGHTS)
+
+# Mesma tabela em forma de matriz (posições x features) para o modo em lote
+WEIGHT_MATRIX = np.array([[w.get(f, 0.0) for f in FEATURE_KEYS] for w in POSITION_WEIGHTS.values()])
+WEIGHT_TOTALS = np.array([sum(w.values()) for w in POSITION_WEIGHTS.values()])
+
+# Colunas aceitas por evaluate_athletes_batch quando a entrada é um array (NaN = ausente)
+BATCH_COLUMNS = ["velocidade_sprint", "agilidade", "salto_vertical"] + SKILL_KEYS + ["peso", "altura", "idade"]
 
 def _clamp01(x: float) -> float:
     return max(0.0, min(1.0, x))
@@ -37,10 +64,7 @@ def evaluate_athlete(d: Dict[str, Any]) -> Dict[str, Any]:
     except (TypeError, ValueError, ZeroDivisionError):
         bmi = None
 
-    skill_keys = [
-        "controle_bola", "drible", "passe_curto", "passe_longo", "finalizacao", 
-        "cabeceio", "desarme", "visao_jogo", "compostura", "agressividade"
-    ]
+    skill_keys = SKILL_KEYS
     
     feats = { key: S(key) for key in skill_keys }
     feats['velocidade'] = speed
@@ -49,15 +73,7 @@ def evaluate_athlete(d: Dict[str, Any]) -> Dict[str, Any]:
     feats['resistencia'] = endurance
 
     # 3. Pesos por posição
-    positions = {
-        "goleiro": {"compostura": 0.30, "salto": 0.25, "visao_jogo": 0.20, "passe_curto": 0.15, "passe_longo": 0.10},
-        "zagueiro": {"desarme": 0.25, "cabeceio": 0.20, "compostura": 0.15, "passe_curto": 0.10, "agressividade": 0.15, "salto": 0.15},
-        "lateral": {"velocidade": 0.25, "drible": 0.15, "passe_longo": 0.10, "desarme": 0.15, "resistencia": 0.20, "agilidade": 0.15},
-        "volante": {"desarme": 0.20, "passe_curto": 0.20, "compostura": 0.15, "visao_jogo": 0.20, "agressividade": 0.10, "resistencia": 0.15},
-        "meia": {"visao_jogo": 0.25, "passe_curto": 0.20, "drible": 0.15, "finalizacao": 0.15, "compostura": 0.15, "passe_longo": 0.10},
-        "ponta": {"velocidade": 0.30, "drible": 0.25, "finalizacao": 0.20, "agilidade": 0.15, "passe_curto": 0.10},
-        "atacante": {"finalizacao": 0.35, "cabeceio": 0.15, "compostura": 0.15, "visao_jogo": 0.10, "agressividade": 0.15, "controle_bola": 0.10}
-    }
+    positions = POSITION_WEIGHTS
     
     pos_scores = {}
     for pos, weights in positions.items():
@@ -104,4 +120,116 @@ def evaluate_athlete(d: Dict[str, Any]) -> Dict[str, Any]:
         "injury_risk_label": label, 
         "bmi": round(bmi, 1) if bmi else None, 
         "notes": notes 
-    }
\ No newline at end of file
+    }
+
+def _array_0_10_from_interval(x: np.ndarray, best: float, worst: float, invert: bool = False) -> np.ndarray:
+    a, b = (best, worst) if not invert else (worst, best)
+    t = (x - a) / (b - a)
+    t = 1.0 - t if invert else t
+    out = 10.0 * np.clip(t, 0.0, 1.0)
+    return np.where(np.isnan(x), 5.0, out)
+
+def _to_float_or_nan(val: Any) -> float:
+    if val is None: return np.nan
+    return float(val)
+
+def _batch_inputs(athletes: Union[Sequence[Dict[str, Any]], np.ndarray]) -> Dict[str, np.ndarray]:
+    """Converte a entrada do modo em lote em colunas float (NaN = ausente)."""
+    if isinstance(athletes, np.ndarray):
+        arr = np.asarray(athletes, dtype=float)
+        if arr.ndim != 2 or arr.shape[1] != len(BATCH_COLUMNS):
+            raise ValueError(f"Array deve ter shape (N, {len(BATCH_COLUMNS)}) nas colunas {BATCH_COLUMNS}")
+        cols = {key: arr[:, i] for i, key in enumerate(BATCH_COLUMNS)}
+        # Peso/altura ausentes contam como 0, igual a d.get("peso", 0)
+        cols["peso"] = np.nan_to_num(cols["peso"], nan=0.0)
+        cols["altura"] = np.nan_to_num(cols["altura"], nan=0.0)
+        cols["bmi_valid"] = np.ones(len(arr), dtype=bool)
+        return cols
+
+    n = len(athletes)
+    cols = {key: np.empty(n) for key in BATCH_COLUMNS}
+    cols["bmi_valid"] = np.ones(n, dtype=bool)
+    for i, d in enumerate(athletes):
+        for key in ("velocidade_sprint", "agilidade", "salto_vertical", *SKILL_KEYS):
+            cols[key][i] = _to_float_or_nan(d.get(key))
+        try:
+            cols["peso"][i] = float(d.get("peso", 0))
+            cols["altura"][i] = float(d.get("altura", 0))
+        except (TypeError, ValueError):
+            cols["peso"][i] = cols["altura"][i] = 0.0
+            cols["bmi_valid"][i] = False
+        age = d.get("idade")
+        cols["idade"][i] = age if age and isinstance(age, int) else np.nan
+    return cols
+
+def evaluate_athletes_batch(athletes: Union[Sequence[Dict[str, Any]], np.ndarray]) -> List[Dict[str, Any]]:
+    """
+    Versão vetorizada de evaluate_athlete para N atletas.
+    Aceita uma lista de dicts (mesmo formato do escalar) ou um array (N, len(BATCH_COLUMNS)).
+    Os scores por posição saem de uma única multiplicação de matrizes; o resultado
+    é idêntico ao da função escalar.
+    """
+    c = _batch_inputs(athletes)
+    n = len(c["peso"])
+    if n == 0:
+        return []
+
+    # 1. Normalização de métricas físicas
+    speed = _array_0_10_from_interval(c["velocidade_sprint"], best=2.8, worst=4.5, invert=True)
+    agility = _array_0_10_from_interval(c["agilidade"], best=9.0, worst=12.5, invert=True)
+    jump = _array_0_10_from_interval(c["salto_vertical"], best=75.0, worst=30.0)
+    endurance = np.full(n, 5.0)
+
+    skills = np.column_stack([np.where(np.isnan(c[k]), 5.0, c[k]) for k in SKILL_KEYS])
+    feats = np.column_stack([skills, speed, agility, jump, endurance])
+
+    # 2. IMC
+    with np.errstate(divide="ignore", invalid="ignore"):
+        has_bmi = c["bmi_valid"] & (c["altura"] > 0)
+        bmi = np.where(has_bmi, c["peso"] / ((c["altura"] / 100.0) ** 2), np.nan)
+
+    # 3. Scores por posição: (N x F) @ (F x P)
+    pos_matrix = (feats @ WEIGHT_MATRIX.T) / WEIGHT_TOTALS * 10
+
+    # 4. Potencial (soma na mesma ordem do escalar)
+    tech_sum = np.zeros(n)
+    for j in range(len(SKILL_KEYS)):
+        tech_sum = tech_sum + skills[:, j]
+    tech_avg = tech_sum / len(SKILL_KEYS)
+    phys_avg = (((speed + agility) + jump) + endurance) / 4.0
+    potential = (0.6 * tech_avg + 0.4 * phys_avg) * 10
+
+    # 5. Risco de Lesão
+    with np.errstate(invalid="ignore"):
+        risk = np.where(bmi > 25, (bmi - 25) * 1.5, 0.0)
+        age = c["idade"]
+        old = age > 32
+        risk = risk + np.where(old, (age - 32) * 0.5, 0.0)
+    aggressiveness = skills[:, SKILL_KEYS.index("agressividade")]
+    risk = risk + ((10.0 - agility) * 0.4 + aggressiveness * 0.3)
+    injury = np.clip(risk / 10.0, 0.0, 1.0) * 100.0
+
+    results = []
+    for i in range(n):
+        pos_scores = {pos: round(float(pos_matrix[i, j]), 1) for j, pos in enumerate(POSITIONS)}
+        notes = []
+        b = bmi[i]
+        if not np.isnan(b):
+            if b >= 27.5: notes.append("IMC elevado, pode impactar agilidade e resistência.")
+            elif b < 18.5: notes.append("IMC baixo, atenção à massa muscular.")
+        if old[i]:
+            notes.append("Idade avançada requer cuidado com recuperação.")
+        injury_score = round(float(injury[i]), 0)
+        label = "baixo"
+        if injury_score >= 67: label = "alto"
+        elif injury_score >= 34: label = "médio"
+        results.append({
+            "best_position": max(pos_scores, key=pos_scores.get),
+            "position_scores": pos_scores,
+            "potential_score": round(float(potential[i]), 1),
+            "injury_risk_score": int(injury_score),
+            "injury_risk_label": label,
+            "bmi": round(float(b), 1) if not np.isnan(b) and b else None,
+            "notes": notes,
+        })
+    return results
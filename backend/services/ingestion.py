@@ -0,0 +1,651 @@
+import codecs
+import csv
+import hashlib
+import math
+import re
+import statistics
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import DateTime, Float, JSON, String, bindparam, func, insert, literal, or_, select, tuple_, update
+from sqlalchemy.dialects.postgresql import ARRAY, UUID, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+from services.partitions import measurement_partitions
+from services.rankings import ranking_cache
+from services.normalization import (
+    KNOWN_ID_KEYS, KNOWN_NAME_KEYS, find_column, find_date_key, metric_resolver, normalize_unit,
+)
+from services.readiness import HRV_METRIC, TRACKED_METRICS, refresh_daily_metrics
+from services.rolling_stats import RollingWindow, window_store
+
+# ------------------------------------------------------------------------------
+# Pipeline de ingestão em lote (set-based)
+# ------------------------------------------------------------------------------
+SCORE_WINDOW = timedelta(days=14)
+INSERT_CHUNK_SIZE = 1000
+READ_CHUNK_SIZE = 64 * 1024
+# Erros de linha guardados por ingestão (o total vai em error_count)
+MAX_ERRORS_KEPT = 1000
+ANONYMOUS_ROW = "atleta sem nome nem external_id"
+LOWER_IS_BETTER = {"LDH", "CORTISOL", "AST", "GLICOSE"}
+
+
+def _score_from_moments(value, n, mu, sd, higher_better=True):
+    """Score 0..100 a partir de média/desvio já calculados da janela."""
+    if not n:
+        return 50.0
+    z = (value - mu) / (sd or 1e-6)
+    if not higher_better:
+        z = -z
+    pct = 0.5 * (1 + math.erf(z / math.sqrt(2)))
+    return round(100 * pct, 2)
+
+
+def _score_from_window(value, window_values, higher_better=True):
+    """Transforma um valor em score 0..100 baseado em z-score + CDF normal."""
+    if not window_values:
+        return 50.0
+    mu = statistics.mean(window_values)
+    sd = statistics.pstdev(window_values)
+    return _score_from_moments(value, len(window_values), mu, sd, higher_better=higher_better)
+
+
+def _build_alert(player_id, metric: str, value: float, ts: datetime, score: float) -> Optional[dict]:
+    """Regras simples de alerta (exemplo)."""
+    alert = None
+    if metric == HRV_METRIC and score < 30:
+        alert = {
+            "level": "WARNING",
+            "message": f"HRV baixo (score {score})",
+            "payload": {"value": value, "ts": ts.isoformat()},
+        }
+    if metric.upper() == "LDH" and value > 250:
+        alert = {
+            "level": "CRITICAL",
+            "message": f"LDH elevado ({value})",
+            "payload": {"ts": ts.isoformat()},
+        }
+    if alert:
+        alert.update({"id": str(uuid.uuid4()), "player_id": player_id, "metric": metric})
+    return alert
+
+
+def parse_recorded_at(raw: str, date_key: str = "recorded_at") -> datetime:
+    """Data ISO-8601 ('Z' ou offset; sem fuso = UTC). Lança ValueError."""
+    try:
+        ts = datetime.fromisoformat(raw.replace("Z", "+00:00"))
+    except Exception as e:
+        raise ValueError(f"{date_key} inválido: '{raw}' ({e})")
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts
+
+
+def parse_measurement_row(row: Dict[str, str], date_key: str = "recorded_at") -> Tuple[datetime, float]:
+    """Converte a data (coluna `date_key`) e value de uma linha já 'trimada'. Lança ValueError."""
+    ts = parse_recorded_at(row[date_key], date_key)
+    try:
+        val = float(str(row["value"]).replace(",", "."))
+    except Exception:
+        raise ValueError(f"value inválido: '{row['value']}'")
+    return ts, val
+
+
+def _row_data(item: dict) -> dict:
+    """Linha crua de um item para o relatório de erros (ou seus campos, se o leitor não a guardou)."""
+    if item["row"] is not None:
+        return item["row"]
+    return {
+        "first_name": item["first_name"],
+        "last_name": item["last_name"],
+        "external_id": item["external_id"] or "",
+        "metric": item["metric"],
+        "value": item["value"],
+        "unit": item["unit"],
+        "recorded_at": item["recorded_at"].isoformat(),
+    }
+
+
+class CSVStream:
+    """
+    Leitura incremental de um CSV binário (ex.: UploadFile.file).
+
+    Lê blocos de `chunk_size` bytes com um decoder incremental; encoding e
+    delimitador são detectados no primeiro bloco. O decoder é estrito: se um
+    arquivo que parecia utf-8 trouxer bytes inválidos mais adiante (export
+    latin-1 cujo início é só ASCII), o restante é lido como latin-1 — nunca
+    se grava caractere substituído. `read_batch` devolve lotes de
+    (line_num, row) para alimentar o BulkIngestor.
+    """
+
+    def __init__(self, fileobj: BinaryIO, chunk_size: int = READ_CHUNK_SIZE):
+        self._fileobj = fileobj
+        self._chunk_size = chunk_size
+        first = fileobj.read(chunk_size)
+        self.bytes_read = len(first)
+
+        # 1) Encoding: utf-8 (com ou sem BOM), senão latin-1
+        try:
+            codecs.getincrementaldecoder("utf-8-sig")().decode(first, final=len(first) < chunk_size)
+            self.encoding = "utf-8-sig"
+        except UnicodeDecodeError:
+            self.encoding = "latin-1"
+        self._decoder = codecs.getincrementaldecoder(self.encoding)()
+        text = self._decode(first)
+
+        # 2) Detecta delimitador , ou ;
+        try:
+            self.delimiter = csv.Sniffer().sniff(text[:4096], delimiters=",;").delimiter
+        except Exception:
+            self.delimiter = ","
+
+        self._reader = csv.DictReader(self._iter_lines(text), delimiter=self.delimiter)
+        self.fieldnames = self._reader.fieldnames or []
+
+    def _iter_lines(self, text: str) -> Iterator[str]:
+        buf = text
+        while True:
+            lines = buf.split("\n")
+            buf = lines.pop()
+            for line in lines:
+                yield line + "\n"
+            chunk = self._fileobj.read(self._chunk_size)
+            if not chunk:
+                break
+            self.bytes_read += len(chunk)
+            buf += self._decode(chunk)
+        buf += self._decode(b"", final=True)
+        if buf:
+            yield buf
+
+    def _decode(self, chunk: bytes, final: bool = False) -> str:
+        pending = self._decoder.getstate()[0]
+        try:
+            return self._decoder.decode(chunk, final=final)
+        except UnicodeDecodeError:
+            # latin-1 decodifica qualquer byte, então isto só acontece uma vez.
+            # Bytes ainda pendentes no decoder + bloco atual seguem como latin-1
+            self.encoding = "latin-1"
+            self._decoder = codecs.getincrementaldecoder(self.encoding)()
+            return self._decoder.decode(pending + chunk, final=final)
+
+    def read_batch(self, size: int = INSERT_CHUNK_SIZE) -> List[Tuple[int, Dict[str, str]]]:
+        """Próximas `size` linhas já 'trimadas'; lista vazia no fim do arquivo."""
+        batch = []
+        for row in self._reader:
+            row = {k: (v or "").strip() for k, v in row.items() if k is not None}
+            batch.append((self._reader.line_num, row))
+            if len(batch) >= size:
+                break
+        return batch
+
+
+_HEADER_UNIT_RE = re.compile(r"^(.*?)\s*[\(\[]\s*([^\)\]]+?)\s*[\)\]]\s*$")
+
+
+class WideLayout:
+    """
+    CSV "largo" dos fornecedores de GPS (Catapult, STATSports): uma linha por
+    sessão e uma coluna por métrica. As colunas de métrica são reconhecidas
+    pelo METRIC_ALIASES, com unidade opcional no cabeçalho ("Total Distance
+    (km)"). `melt` converte um lote de linhas largas em linhas longas no
+    formato do BulkIngestor, sem materializar o arquivo longo.
+    """
+
+    def __init__(self, fieldnames: List[str], date_key: str, metric_columns: List[Tuple[str, str, str]]):
+        self.date_key = date_key
+        self.metric_columns = metric_columns  # (coluna, métrica canônica, unidade)
+        self.first_name = find_column(fieldnames, ["first_name"])
+        self.last_name = find_column(fieldnames, ["last_name"])
+        self.full_name = None if self.first_name else find_column(fieldnames, KNOWN_NAME_KEYS)
+        self.external_id = find_column(fieldnames, KNOWN_ID_KEYS)
+
+    @classmethod
+    def detect(cls, fieldnames: List[str]) -> Optional["WideLayout"]:
+        """Layout largo do cabeçalho; None se for o formato longo ou não houver métricas/atleta/data."""
+        if find_column(fieldnames, ["metric"]) and find_column(fieldnames, ["value"]):
+            return None
+        date_key = find_date_key(fieldnames)
+        metric_columns = []
+        for column in fieldnames:
+            if column is None or column == date_key:
+                continue
+            name, unit = column, ""
+            m = _HEADER_UNIT_RE.match(column)
+            if m and metric_resolver.known(m.group(1)):
+                name, unit = m.group(1), m.group(2)
+            metric = metric_resolver.known(name)
+            if metric:
+                metric_columns.append((column, metric, unit))
+        layout = cls(fieldnames, date_key, metric_columns) if date_key else None
+        if not metric_columns or layout is None or not (layout.first_name or layout.full_name or layout.external_id):
+            return None
+        return layout
+
+    def rows_per_batch(self, chunk_size: int) -> int:
+        """Linhas largas por leitura para que o lote derretido fique perto de `chunk_size`."""
+        return max(1, chunk_size // len(self.metric_columns))
+
+    def melt(self, batch: List[Tuple[int, Dict[str, str]]]) -> Iterator[Tuple[int, Dict[str, str]]]:
+        for line_num, row in batch:
+            if self.first_name:
+                first, last = row.get(self.first_name, ""), row.get(self.last_name, "") if self.last_name else ""
+            else:
+                first, _, last = (row.get(self.full_name, "") if self.full_name else "").partition(" ")
+            base = {
+                "first_name": first,
+                "last_name": last.strip(),
+                "external_id": row.get(self.external_id, "") if self.external_id else "",
+                "recorded_at": row.get(self.date_key, ""),
+            }
+            for column, metric, unit in self.metric_columns:
+                value = row.get(column, "")
+                if value == "":
+                    continue  # métrica não medida nesta sessão
+                yield line_num, {**base, "metric": metric, "value": value, "unit": unit, "column": column}
+
+
+class BulkIngestor:
+    """
+    Ingestão de medições em lote.
+
+    As linhas válidas são acumuladas e gravadas em blocos de `chunk_size`:
+    os jogadores do bloco são resolvidos com uma única query, os ausentes
+    criados com um único INSERT multi-linha e as medições gravadas com um
+    upsert pela chave natural (player_id, metric, recorded_at, source) —
+    reenviar um arquivo atualiza ou ignora em vez de duplicar. Score de janela
+    e alertas rodam uma vez por (jogador, métrica) do bloco, só para medições
+    novas, reproduzindo a ordem do arquivo, e cada bloco é commitado em
+    seguida — a memória usada não depende do tamanho do arquivo.
+    """
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        owner_email: str | None = None,
+        chunk_size: int = INSERT_CHUNK_SIZE,
+        source: str = "csv",
+        date_key: str = "recorded_at",
+        layout: Optional[WideLayout] = None,
+    ):
+        self.db = db
+        self.owner_email = owner_email.lower() if owner_email else None
+        self.chunk_size = chunk_size
+        self.source = source
+        self.layout = layout
+        # Linhas derretidas já trazem a data em "recorded_at"
+        self.date_key = "recorded_at" if layout else date_key
+        # Linhas do arquivo por leitura (no formato largo, cada linha vira várias)
+        self.read_size = layout.rows_per_batch(chunk_size) if layout else chunk_size
+        self.processed = 0
+        self.inserted = 0
+        self.updated = 0
+        self.skipped = 0
+        self.errors: List[dict] = []  # só os primeiros MAX_ERRORS_KEPT
+        self.error_count = 0
+        self._pending: List[dict] = []
+        self._by_external_id: Dict[str, Any] = {}
+        self._by_name: Dict[Tuple[str, str], Any] = {}
+
+    def add(self, line_num: int, row: Dict[str, str], metric: str | None = None) -> None:
+        """
+        Valida uma linha e a coloca na fila de inserção (ou registra o erro).
+        `metric` é o nome canônico já resolvido pelo lote (feed); sem ele,
+        resolve aqui.
+        """
+        self.processed += 1
+        try:
+            ts, val = parse_measurement_row(row, self.date_key)
+            metric = metric or metric_resolver.resolve(row["metric"])
+            if not metric:
+                raise ValueError("metric vazio")
+            val, unit = normalize_unit(metric, val, row.get("unit") or "")
+            if not (row["first_name"] or row["last_name"] or row["external_id"]):
+                raise ValueError(ANONYMOUS_ROW)
+            item = {
+                "line": line_num,
+                "row": row,
+                "first_name": row["first_name"],
+                "last_name": row["last_name"],
+                "external_id": row["external_id"] or None,
+                "metric": metric,
+                "value": val,
+                "unit": unit,
+                "recorded_at": ts,
+            }
+        except Exception as e:
+            self._error(line_num, str(e), row)
+            return
+        self._pending.append(item)
+
+    async def feed(self, rows: Iterable[Tuple[int, Dict[str, str]]]) -> None:
+        rows = list(self.layout.melt(rows) if self.layout else rows)
+        # Nomes de métrica resolvidos uma vez por lote (poucos distintos por arquivo)
+        metrics = metric_resolver.resolve_many(row.get("metric") or "" for _, row in rows)
+        for line_num, row in rows:
+            self.add(line_num, row, metrics[row.get("metric") or ""])
+            if len(self._pending) >= self.chunk_size:
+                await self.flush()
+
+    async def feed_validated(self, items: List[dict], errors: List[dict]) -> None:
+        """
+        Linhas já validadas e normalizadas por outro leitor (ex.: ColumnarStream),
+        no formato que `add` produz (com "row" = None); `errors` são as linhas
+        que ele recusou.
+        """
+        self.processed += len(items) + len(errors)
+        for error in errors:
+            self._error(error["row"], error["error"], error["row_data"])
+        for item in items:
+            self._pending.append(item)
+            if len(self._pending) >= self.chunk_size:
+                await self.flush()
+
+    async def flush(self) -> None:
+        """Grava o bloco pendente: resolve jogadores, faz o upsert das medições e gera alertas."""
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        known_ext, known_names = set(self._by_external_id), set(self._by_name)
+        try:
+            await measurement_partitions.ensure(item["recorded_at"] for item in batch)
+            # SAVEPOINT por bloco: uma falha descarta só o bloco atual
+            async with self.db.begin_nested():
+                await self._resolve_players(batch)
+
+                # Mesma chave natural repetida no bloco: vale a última linha
+                unique: Dict[Tuple[Any, str, datetime], dict] = {}
+                for item in batch:
+                    unique[(item["player_id"], item["metric"], item["recorded_at"])] = item
+                rows = list(unique.values())
+
+                # Janelas carregadas antes do upsert: contêm só o histórico prévio
+                windows = {}
+                for item in rows:
+                    key = (item["player_id"], item["metric"])
+                    floor = item["recorded_at"] - SCORE_WINDOW
+                    windows[key] = min(windows.get(key, floor), floor)
+                windows = {
+                    key: await window_store.window(self.db, key[0], key[1], floor)
+                    for key, floor in windows.items()
+                }
+
+                written = await self._upsert(rows)
+                groups: Dict[Tuple[Any, str], List[dict]] = {}
+                changed: List[dict] = []
+                updated_groups = set()
+                for item in rows:
+                    status = written.get((item["player_id"], item["metric"], item["recorded_at"]))
+                    if status is None:
+                        continue  # idêntica à já gravada
+                    mid, is_new = status
+                    changed.append(item)
+                    if is_new:
+                        item["id"] = mid
+                        groups.setdefault((item["player_id"], item["metric"]), []).append(item)
+                    else:
+                        updated_groups.add((item["player_id"], item["metric"]))
+
+                # Score e alertas só para medições novas; correções de valor não realertam
+                await self._score_groups(groups, windows)
+                await refresh_daily_metrics(self.db, {
+                    (item["player_id"], item["recorded_at"].astimezone(timezone.utc).date())
+                    for item in changed
+                    if item["metric"] in TRACKED_METRICS
+                })
+        except Exception as e:
+            measurement_partitions.reset()  # ex.: partição removida por outro processo
+            for player_id, metric in {(i.get("player_id"), i["metric"]) for i in batch}:
+                if player_id is not None:
+                    window_store.invalidate(player_id, metric)
+            for key in set(self._by_external_id) - known_ext:
+                del self._by_external_id[key]
+            for key in set(self._by_name) - known_names:
+                del self._by_name[key]
+            for item in batch:
+                self._error(item["line"], str(e), _row_data(item))
+            return
+
+        await self.db.commit()
+        # Valor alterado no lugar não muda count/max(id): a janela em cache ficaria velha
+        for player_id, metric in updated_groups:
+            window_store.invalidate(player_id, metric)
+        new = sum(len(items) for items in groups.values())
+        self.inserted += new
+        self.updated += len(changed) - new
+        self.skipped += len(batch) - len(changed)
+
+    async def finish(self) -> dict:
+        """Grava o restante e devolve o resumo da ingestão."""
+        await self.flush()
+        await self.db.commit()
+        if self.owner_email:
+            ranking_cache.invalidate(self.owner_email)
+        return {
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "skipped": self.skipped,
+            "error_count": self.error_count,
+            "errors": self.errors,
+        }
+
+    def _error(self, line_num: int, message: str, row: dict) -> None:
+        """Conta o erro; guarda o detalhe só dos primeiros (memória constante)."""
+        self.error_count += 1
+        if len(self.errors) < MAX_ERRORS_KEPT:
+            self.errors.append({"row": line_num, "error": message, "row_data": row})
+
+    async def _upsert(self, rows: List[dict]) -> Dict[Tuple[Any, str, datetime], Tuple[int, bool]]:
+        """
+        Grava o bloco pela chave natural em dois statements set-based:
+        INSERT ... ON CONFLICT DO NOTHING e, para as chaves que já existiam, um
+        UPDATE ... FROM unnest só onde valor/unidade mudaram. (Com tabela
+        particionada não dá para ler xmax no RETURNING de um DO UPDATE.)
+        Devolve {chave: (id, inserida?)}; linhas iguais às gravadas ficam de fora.
+        """
+        m = models.Measurement
+        key = lambda i: (i["player_id"], i["metric"], i["recorded_at"])
+
+        src = self._unnest(rows)
+        stmt = pg_insert(m).from_select(
+            ["player_id", "metric", "value", "unit", "recorded_at", "source", "meta"],
+            select(
+                src.c.player_id, src.c.metric, src.c.value, src.c.unit, src.c.recorded_at,
+                literal(self.source, String), literal({"source": self.source}, JSON),
+            ),
+        ).on_conflict_do_nothing(
+            index_elements=[m.player_id, m.metric, m.recorded_at, m.source],
+        ).returning(m.id, m.player_id, m.metric, m.recorded_at)
+        written = {(pid, metric, ts): (mid, True) for mid, pid, metric, ts in (await self.db.execute(stmt)).all()}
+
+        existing = [i for i in rows if key(i) not in written]
+        if existing:
+            src = self._unnest(existing)
+            stmt = (
+                update(m)
+                .where(
+                    m.player_id == src.c.player_id,
+                    m.metric == src.c.metric,
+                    m.recorded_at == src.c.recorded_at,
+                    m.source == self.source,
+                    or_(m.value.is_distinct_from(src.c.value), m.unit.is_distinct_from(src.c.unit)),
+                )
+                .values(value=src.c.value, unit=src.c.unit)
+                .returning(m.id, m.player_id, m.metric, m.recorded_at)
+                .execution_options(synchronize_session=False)
+            )
+            for mid, pid, metric, ts in (await self.db.execute(stmt)).all():
+                written[(pid, metric, ts)] = (mid, False)
+        return written
+
+    @staticmethod
+    def _unnest(rows: List[dict]):
+        """Linhas do bloco como tabela derivada: unnest de um array por coluna (7 parâmetros, qualquer tamanho)."""
+        return func.unnest(
+            bindparam("player_ids", [i["player_id"] for i in rows], type_=ARRAY(UUID(as_uuid=True))),
+            bindparam("metrics", [i["metric"] for i in rows], type_=ARRAY(String)),
+            bindparam("values", [i["value"] for i in rows], type_=ARRAY(Float)),
+            bindparam("units", [i["unit"] for i in rows], type_=ARRAY(String)),
+            bindparam("recorded_ats", [i["recorded_at"] for i in rows], type_=ARRAY(DateTime(timezone=True))),
+        ).table_valued("player_id", "metric", "value", "unit", "recorded_at").render_derived()
+
+    # --------------------------------------------------------------------------
+    # Jogadores
+    # --------------------------------------------------------------------------
+    async def _resolve_players(self, batch: List[dict]) -> None:
+        """Tenta achar por external_id (prosoccer) ou por (nome, sobrenome); cria os ausentes."""
+        ext_ids = {i["external_id"] for i in batch if i["external_id"] and i["external_id"] not in self._by_external_id}
+        # Sem nome (export só com id) não há o que casar por nome
+        names = {
+            (i["first_name"], i["last_name"]) for i in batch
+            if (i["first_name"] or i["last_name"]) and (i["first_name"], i["last_name"]) not in self._by_name
+        }
+
+        claim_owner: Dict[Any, dict] = {}
+        if ext_ids or names:
+            # Índices: ix_players_prosoccer_id e ix_players_name
+            conditions = []
+            if ext_ids:
+                conditions.append(models.Player.prosoccer_id.in_(ext_ids))
+            if names:
+                conditions.append(tuple_(models.Player.first_name, models.Player.last_name).in_(names))
+            q = select(
+                models.Player.id,
+                models.Player.first_name,
+                models.Player.last_name,
+                models.Player.prosoccer_id,
+                models.Player.owner_email,
+                models.Player.external_ids,
+            ).where(or_(*conditions)).order_by(models.Player.created_at)
+            r = await self.db.execute(q)
+            for pid, first, last, prosoccer, owner, ext in r.all():
+                if prosoccer in ext_ids:
+                    self._by_external_id.setdefault(prosoccer, pid)
+                if (first, last) in names and (first, last) not in self._by_name:
+                    self._by_name[(first, last)] = pid
+                    if self.owner_email and not owner:
+                        claim_owner[pid] = {**(ext or {}), "owner_email": self.owner_email}
+
+        new_players: List[dict] = []
+        claimed = set()
+        for item in batch:
+            ext_id, name = item["external_id"], (item["first_name"], item["last_name"])
+            pid = self._by_external_id.get(ext_id) if ext_id else None
+            if pid is None and any(name):
+                pid = self._by_name.get(name)
+                if pid is not None and pid in claim_owner:
+                    claimed.add(pid)
+            if pid is None:
+                pid = uuid.uuid4()
+                new_players.append({
+                    "id": pid,
+                    "first_name": name[0],
+                    "last_name": name[1],
+                    "prosoccer_id": ext_id or None,
+                    "owner_email": self.owner_email,
+                    "external_ids": {
+                        **({"prosoccer": ext_id} if ext_id else {}),
+                        **({"owner_email": self.owner_email} if self.owner_email else {}),
+                    },
+                })
+                if any(name):
+                    self._by_name[name] = pid
+                if ext_id:
+                    self._by_external_id[ext_id] = pid
+            item["player_id"] = pid
+
+        if new_players:
+            await self.db.execute(insert(models.Player), new_players)
+        if claimed:
+            stmt = (
+                update(models.Player)
+                .where(models.Player.id == bindparam("pid"))
+                .values(external_ids=bindparam("ext"), owner_email=self.owner_email)
+                .execution_options(synchronize_session=False)
+            )
+            await self.db.execute(stmt, [{"pid": pid, "ext": claim_owner[pid]} for pid in claimed])
+
+    # --------------------------------------------------------------------------
+    # Score de janela + alertas
+    # --------------------------------------------------------------------------
+    async def _score_groups(self, groups: Dict[Tuple[Any, str], List[dict]], windows: Dict[Tuple[Any, str], RollingWindow]) -> None:
+        alerts = []
+        for (player_id, metric), items in groups.items():
+            win = windows[(player_id, metric)]
+            higher_better = metric.upper() not in LOWER_IS_BETTER
+
+            # Menor início de janela ainda necessário a partir de cada linha:
+            # abaixo disso os valores podem ser expulsos de vez (O(1) amortizado).
+            floors = [i["recorded_at"] - SCORE_WINDOW for i in items]
+            for k in range(len(floors) - 2, -1, -1):
+                floors[k] = min(floors[k], floors[k + 1])
+
+            # Reproduz a ordem do arquivo: cada valor enxerga o histórico prévio
+            # e as linhas anteriores do próprio arquivo dentro da janela.
+            for item, floor in zip(items, floors):
+                ts, value = item["recorded_at"], item["value"]
+                win.push(ts, value, item["id"])
+                win.evict(floor)
+                n, mu, sd = win.moments(ts - SCORE_WINDOW)
+                score = _score_from_moments(value, n, mu, sd, higher_better=higher_better)
+                alert = _build_alert(player_id, metric, value, ts, score)
+                if alert:
+                    alerts.append(alert)
+
+        if alerts:
+            await self.db.execute(insert(models.Alert), alerts)
+
+
+# ------------------------------------------------------------------------------
+# Registro de arquivos já ingeridos (reenvio do mesmo CSV)
+# ------------------------------------------------------------------------------
+def file_sha256(fileobj: BinaryIO, chunk_size: int = READ_CHUNK_SIZE * 16) -> str:
+    """sha256 do conteúdo; devolve o arquivo posicionado no início."""
+    digest = hashlib.sha256()
+    fileobj.seek(0)
+    for chunk in iter(lambda: fileobj.read(chunk_size), b""):
+        digest.update(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+async def find_ingested_file(db: AsyncSession, owner_email: str, sha256: str) -> Optional[dict]:
+    """Resumo no formato da ingestão se o técnico já enviou este conteúdo; senão None."""
+    previous = await db.get(models.IngestedFile, (owner_email.lower(), sha256))
+    if previous is None:
+        return None
+    return {
+        "inserted": 0,
+        "updated": 0,
+        "skipped": previous.rows_processed,
+        "error_count": 0,
+        "errors": [],
+        "duplicate_of": {"filename": previous.filename, "ingested_at": previous.created_at},
+    }
+
+
+async def register_ingested_file(
+    db: AsyncSession, owner_email: str, sha256: str, filename: str | None, size_bytes: int, ingestor: BulkIngestor,
+) -> None:
+    """
+    Registra o arquivo após uma ingestão sem erros. Com erros (linha inválida,
+    bloco que falhou) o reenvio continua sendo processado — o upsert o torna
+    seguro e dá a chance de completar o que faltou.
+    """
+    if ingestor.error_count:
+        return
+    stmt = pg_insert(models.IngestedFile).values(
+        owner_email=owner_email.lower(),
+        sha256=sha256,
+        filename=filename,
+        size_bytes=size_bytes,
+        rows_processed=ingestor.processed,
+        inserted=ingestor.inserted,
+        updated=ingestor.updated,
+        skipped=ingestor.skipped,
+    ).on_conflict_do_nothing()
+    await db.execute(stmt)
+    await db.commit()
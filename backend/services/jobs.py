@@ -0,0 +1,249 @@
+import asyncio
+import logging
+import os
+import socket
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Set
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, or_, select, text, update
+
+import models
+from core.config import settings
+from database import SessionLocal
+from services.columnar import COLUMNAR_CHUNK_SIZE, ColumnarStream
+from services.ingestion import BulkIngestor, CSVStream, WideLayout, register_ingested_file
+from services.normalization import find_date_key
+
+logger = logging.getLogger("uvicorn")
+
+# Quantos erros de linha ficam guardados no job (o total vai em error_count)
+JOB_ERRORS_KEPT = 100
+# Heartbeats perdidos até um job ser considerado órfão (worker morto)
+STALE_HEARTBEATS = 4
+# Espera entre tentativas quando o técnico já tem INGEST_JOBS_PER_USER rodando
+CLAIM_RETRY_SECONDS = 2.0
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class IngestJobRunner:
+    """
+    Executa ingestões de CSV (ou Parquet/Arrow) em background, fora do ciclo da requisição.
+
+    O arquivo já foi copiado para disco pelo endpoint; aqui ele é processado
+    por um pool de no máximo INGEST_JOB_WORKERS tarefas simultâneas por
+    processo. O limite de INGEST_JOBS_PER_USER jobs rodando por técnico vale
+    entre todos os workers: é conferido no banco ao passar o job para
+    "running" (os demais ficam em "queued"). O progresso é gravado em
+    `ingest_jobs` a cada bloco, então qualquer worker responde ao polling.
+
+    Cada job registra o worker dono (host:pid) e um heartbeat renovado a cada
+    INGEST_JOB_HEARTBEAT_SECONDS. Job ativo sem heartbeat recente é de um
+    worker que morreu: `recover` (no startup e a cada heartbeat) o marca como
+    falho e apaga o arquivo dele.
+    """
+
+    def __init__(self):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._pool: asyncio.Semaphore | None = None
+        self._per_user: Dict[str, asyncio.Semaphore] = {}
+        self._per_user_jobs: Dict[str, int] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._heartbeat: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._heartbeat is None:
+            self._heartbeat = asyncio.create_task(self._heartbeat_loop())
+
+    async def stop(self) -> None:
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+
+    async def _heartbeat_loop(self) -> None:
+        while True:
+            try:
+                await self.recover()
+                async with SessionLocal() as db:
+                    await db.execute(
+                        update(models.IngestJob)
+                        .where(
+                            models.IngestJob.worker_id == self.worker_id,
+                            models.IngestJob.status.in_(ACTIVE_STATUSES),
+                        )
+                        .values(heartbeat_at=func.now())
+                    )
+                    await db.commit()
+            except Exception:
+                logger.exception("Falha no heartbeat dos jobs de ingestão")
+            await asyncio.sleep(settings.INGEST_JOB_HEARTBEAT_SECONDS)
+
+    @staticmethod
+    def _stale_before():
+        return func.now() - timedelta(seconds=settings.INGEST_JOB_HEARTBEAT_SECONDS * STALE_HEARTBEATS)
+
+    async def recover(self) -> None:
+        """
+        Jobs queued/running cujo worker parou de dar heartbeat nunca terminariam:
+        viram "failed" com um detalhe e o arquivo temporário deles é apagado.
+        Jobs de workers vivos (deste ou de outros processos) não são tocados.
+        """
+        job = models.IngestJob
+        async with SessionLocal() as db:
+            result = await db.execute(
+                update(job)
+                .where(
+                    job.status.in_(ACTIVE_STATUSES),
+                    job.worker_id.is_distinct_from(self.worker_id),
+                    or_(job.heartbeat_at.is_(None), job.heartbeat_at < self._stale_before()),
+                )
+                .values(
+                    status="failed",
+                    detail="Interrompido: o servidor que processava o job parou; envie o arquivo novamente.",
+                    finished_at=func.now(),
+                )
+                .returning(job.spool_path)
+            )
+            paths = result.scalars().all()
+            await db.commit()
+        if paths:
+            logger.warning("%d job(s) de ingestão órfão(s) marcados como falhos", len(paths))
+        for path in paths:
+            # Outro host tem outro /tmp: lá o arquivo não existe e nada acontece
+            if path:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+
+    def submit(
+        self, job_id: str, path: str, owner_email: str,
+        sha256: Optional[str] = None, filename: Optional[str] = None, columnar: bool = False,
+    ) -> None:
+        task = asyncio.create_task(self._run(job_id, path, owner_email, sha256, filename, columnar))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(
+        self, job_id: str, path: str, owner_email: str,
+        sha256: Optional[str], filename: Optional[str], columnar: bool,
+    ) -> None:
+        if self._pool is None:
+            self._pool = asyncio.Semaphore(settings.INGEST_JOB_WORKERS)
+        # O semáforo local só evita consultas inúteis; o limite real é o _claim
+        user_slot = self._per_user.setdefault(owner_email, asyncio.Semaphore(settings.INGEST_JOBS_PER_USER))
+        self._per_user_jobs[owner_email] = self._per_user_jobs.get(owner_email, 0) + 1
+        try:
+            async with user_slot:
+                while True:
+                    async with self._pool:
+                        if await self._claim(job_id, owner_email):
+                            await self._process(job_id, path, owner_email, sha256, filename, columnar)
+                            break
+                    await asyncio.sleep(CLAIM_RETRY_SECONDS)
+        finally:
+            # Sem jobs do técnico (rodando ou na fila): libera o semáforo dele
+            self._per_user_jobs[owner_email] -= 1
+            if not self._per_user_jobs[owner_email]:
+                del self._per_user_jobs[owner_email]
+                del self._per_user[owner_email]
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    async def _claim(self, job_id: str, owner_email: str) -> bool:
+        """
+        Passa o job para "running" se o técnico tiver menos de
+        INGEST_JOBS_PER_USER jobs rodando (com heartbeat recente) em qualquer
+        worker. O advisory lock por técnico serializa a contagem entre processos.
+        """
+        job = models.IngestJob
+        async with SessionLocal() as db:
+            await db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": f"ingest_jobs:{owner_email}"})
+            running = (await db.execute(
+                select(func.count()).select_from(job).where(
+                    job.owner_email == owner_email,
+                    job.status == "running",
+                    job.heartbeat_at >= self._stale_before(),
+                )
+            )).scalar_one()
+            if running >= settings.INGEST_JOBS_PER_USER:
+                await db.rollback()
+                return False
+            await db.execute(update(job).where(job.id == job_id).values(
+                status="running",
+                started_at=datetime.now(timezone.utc),
+                worker_id=self.worker_id,
+                heartbeat_at=func.now(),
+            ))
+            await db.commit()
+        return True
+
+    async def _process(
+        self, job_id: str, path: str, owner_email: str,
+        sha256: Optional[str], filename: Optional[str], columnar: bool,
+    ) -> None:
+        async with SessionLocal() as db:
+            try:
+                with open(path, "rb") as fh:
+                    # Cabeçalho (e tipos, no colunar) já validados no endpoint
+                    stream = await run_in_threadpool(ColumnarStream if columnar else CSVStream, fh)
+                    date_key = find_date_key(stream.fieldnames) or "recorded_at"
+                    layout = WideLayout.detect(stream.fieldnames)
+                    if columnar:
+                        ingestor = BulkIngestor(
+                            db, owner_email=owner_email, chunk_size=COLUMNAR_CHUNK_SIZE, source=stream.source,
+                        )
+                    else:
+                        ingestor = BulkIngestor(db, owner_email=owner_email, date_key=date_key, layout=layout)
+                    while True:
+                        if columnar:
+                            batch = await run_in_threadpool(stream.read_batch, date_key, layout)
+                            if batch is None:
+                                break
+                            await ingestor.feed_validated(*batch)
+                        else:
+                            batch = await run_in_threadpool(stream.read_batch, ingestor.read_size)
+                            if not batch:
+                                break
+                            await ingestor.feed(batch)
+                        await self._update(db, job_id, **self._progress(ingestor, stream))
+                    await ingestor.finish()
+                if sha256:
+                    await register_ingested_file(db, owner_email, sha256, filename, stream.bytes_read, ingestor)
+                await self._update(
+                    db, job_id,
+                    status="done",
+                    finished_at=datetime.now(timezone.utc),
+                    **self._progress(ingestor, stream),
+                )
+            except Exception as e:
+                logger.exception("Falha no job de ingestão %s", job_id)
+                await db.rollback()
+                await self._update(
+                    db, job_id,
+                    status="failed",
+                    detail=str(e),
+                    finished_at=datetime.now(timezone.utc),
+                )
+
+    @staticmethod
+    def _progress(ingestor: BulkIngestor, stream) -> dict:
+        return {
+            "bytes_read": stream.bytes_read,
+            "rows_processed": ingestor.processed,
+            "inserted": ingestor.inserted,
+            "updated": ingestor.updated,
+            "skipped": ingestor.skipped,
+            "error_count": ingestor.error_count,
+            "errors": ingestor.errors[:JOB_ERRORS_KEPT],
+        }
+
+    @staticmethod
+    async def _update(db, job_id: str, **values) -> None:
+        await db.execute(update(models.IngestJob).where(models.IngestJob.id == job_id).values(**values))
+        await db.commit()
+
+
+ingest_jobs = IngestJobRunner()
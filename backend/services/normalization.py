@@ -0,0 +1,143 @@
+import re
+from typing import Dict, Iterable, Optional, Tuple
+
+# ------------------------------------------------------------------------------
+# Nomes de métricas, unidades e colunas de data dos CSVs de GPS/HRV
+# ------------------------------------------------------------------------------
+KNOWN_DATE_KEYS = ["recorded_at","date","data","dia","datetime","timestamp","Date"]
+# Identificação do atleta nos exports largos dos fornecedores (uma linha por sessão)
+KNOWN_NAME_KEYS = ["player name", "athlete name", "athlete", "player", "name", "nome", "atleta"]
+KNOWN_ID_KEYS = ["external_id", "player id", "athlete id", "player_id", "athlete_id"]
+METRIC_ALIASES = {
+    "Total Distance": "total_distance",
+    "total_distance": "total_distance",
+    "Distance": "total_distance",
+    "Distância Total": "total_distance",
+    "High Speed Running Distance": "high_speed_distance",
+    "HSR Distance": "high_speed_distance",
+    "HMLD": "high_metabolic_load_distance",
+    "High Speed Distance": "high_speed_distance",
+    "Sprint Distance": "sprint_distance",
+    "Max Speed": "max_speed",
+    "Max Velocity": "max_speed",
+    "Top Speed": "max_speed",
+    "Velocidade Máxima": "max_speed",
+    "rMSSD": "hrv_rmssd",
+    "HRV": "hrv_rmssd",
+    "avg_hrv": "hrv_rmssd",
+    "ACWR": "acwr",
+    "session_load": "session_load",
+    "Player Load": "player_load",
+    "PlayerLoad": "player_load",
+    "Dynamic Stress Load": "dynamic_stress_load",
+    "Accelerations": "accelerations",
+    "Decelerations": "decelerations",
+}
+
+# Unidade canônica por métrica; métricas fora daqui guardam a unidade recebida
+CANONICAL_UNITS = {
+    "total_distance": "m",
+    "high_speed_distance": "m",
+    "high_metabolic_load_distance": "m",
+    "sprint_distance": "m",
+    "max_speed": "km/h",
+    "hrv_rmssd": "ms",
+}
+UNIT_ALIASES = {
+    "m": "m", "metro": "m", "metros": "m", "meter": "m", "meters": "m", "metre": "m", "metres": "m",
+    "km": "km", "quilometro": "km", "quilometros": "km", "kilometer": "km", "kilometers": "km",
+    "mi": "mi", "mile": "mi", "miles": "mi",
+    "yd": "yd", "yard": "yd", "yards": "yd",
+    "ms": "ms", "msec": "ms", "millisecond": "ms", "milliseconds": "ms", "milissegundos": "ms",
+    "s": "s", "sec": "s", "second": "s", "seconds": "s", "segundos": "s",
+    "km/h": "km/h", "kmh": "km/h", "kph": "km/h",
+    "m/s": "m/s", "mps": "m/s",
+    "mph": "mph",
+}
+# Fator para a unidade canônica: valor_canônico = valor * fator
+UNIT_FACTORS = {
+    "m": {"m": 1.0, "km": 1000.0, "mi": 1609.344, "yd": 0.9144},
+    "ms": {"ms": 1.0, "s": 1000.0},
+    "km/h": {"km/h": 1.0, "m/s": 3.6, "mph": 1.609344},
+}
+# Entradas memorizadas por processo (nomes crus distintos costumam ser poucos)
+MAX_MEMO = 10000
+
+_SEPARATORS = re.compile(r"[\s_\-]+")
+
+
+def _fold(name: str) -> str:
+    """Chave de comparação: sem caixa, e espaços/_/- colapsados."""
+    return _SEPARATORS.sub(" ", name).strip().casefold()
+
+
+class MetricResolver:
+    """
+    Traduz o nome de métrica escrito no arquivo para a chave canônica.
+
+    A tabela de aliases é compilada uma vez (chaves dobradas por _fold) e o
+    resultado de cada nome cru é memorizado. Nomes sem alias viram snake_case
+    minúsculo ("Player Load" -> "player_load").
+    """
+
+    def __init__(self, aliases: Dict[str, str], max_memo: int = MAX_MEMO):
+        self._table = {_fold(canonical): canonical for canonical in aliases.values()}
+        self._table.update({_fold(alias): canonical for alias, canonical in aliases.items()})
+        self.max_memo = max_memo
+        self._memo: Dict[str, str] = {}
+
+    def resolve(self, raw: str) -> str:
+        canonical = self._memo.get(raw)
+        if canonical is None:
+            folded = _fold(raw)
+            canonical = self._table.get(folded) or folded.replace(" ", "_")
+            if len(self._memo) >= self.max_memo:
+                self._memo.clear()
+            self._memo[raw] = canonical
+        return canonical
+
+    def resolve_many(self, names: Iterable[str]) -> Dict[str, str]:
+        return {name: self.resolve(name) for name in set(names)}
+
+    def known(self, raw: str) -> Optional[str]:
+        """Nome canônico só se `raw` estiver na tabela de aliases (sem fallback)."""
+        return self._table.get(_fold(raw))
+
+
+def normalize_unit(metric: str, value: float, unit: str) -> Tuple[float, str]:
+    """
+    Converte para a unidade canônica da métrica. Só unidade vazia é tratada
+    como a canônica; unidade desconhecida (typo, grandeza não mapeada) ou de
+    outra grandeza é erro — gravar com o rótulo canônico trocaria a magnitude.
+    """
+    canonical = CANONICAL_UNITS.get(metric)
+    if canonical is None:
+        return value, unit
+    if not unit:
+        return value, canonical
+    known = UNIT_ALIASES.get(_fold(unit))
+    if known is None:
+        raise ValueError(f"unidade '{unit}' desconhecida para {metric} (esperado {canonical})")
+    factor = UNIT_FACTORS[canonical].get(known)
+    if factor is None:
+        raise ValueError(f"unidade '{unit}' incompatível com {metric} (esperado {canonical})")
+    return value * factor, canonical
+
+
+def find_column(fieldnames: Iterable[str], candidates: Iterable[str]) -> Optional[str]:
+    """Primeira coluna do arquivo que casa (sem caixa/espaços) com `candidates`, em ordem."""
+    by_fold = {}
+    for name in fieldnames:
+        by_fold.setdefault(_fold(name), name)
+    for key in candidates:
+        if _fold(key) in by_fold:
+            return by_fold[_fold(key)]
+    return None
+
+
+def find_date_key(fieldnames: Iterable[str]) -> Optional[str]:
+    """Coluna de data do arquivo, na ordem de preferência de KNOWN_DATE_KEYS."""
+    return find_column(fieldnames, KNOWN_DATE_KEYS)
+
+
+metric_resolver = MetricResolver(METRIC_ALIASES)
@@ -0,0 +1,119 @@
+import logging
+from datetime import datetime, timezone
+from typing import Iterable, Optional, Set, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from database import engine
+
+logger = logging.getLogger("uvicorn")
+
+# ------------------------------------------------------------------------------
+# Partições mensais (RANGE em recorded_at, UTC) da tabela measurements
+# ------------------------------------------------------------------------------
+PARENT_TABLE = "measurements"
+
+
+def partition_name(year: int, month: int) -> str:
+    return f"{PARENT_TABLE}_y{year}m{month:02d}"
+
+
+def month_bounds(year: int, month: int) -> Tuple[datetime, datetime]:
+    start = datetime(year, month, 1, tzinfo=timezone.utc)
+    end = datetime(year + (month == 12), month % 12 + 1, 1, tzinfo=timezone.utc)
+    return start, end
+
+
+async def create_month_partition(conn: AsyncConnection, year: int, month: int) -> None:
+    start, end = month_bounds(year, month)
+    await conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {partition_name(year, month)} PARTITION OF {PARENT_TABLE} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    ))
+
+
+async def is_partitioned(conn: AsyncConnection) -> bool:
+    relkind = (await conn.execute(
+        text("SELECT relkind::text FROM pg_class WHERE oid = to_regclass(:name)"), {"name": PARENT_TABLE}
+    )).scalar_one_or_none()
+    return relkind == "p"
+
+
+class MeasurementPartitions:
+    """
+    Garante que existe partição para cada mês que uma ingestão vai gravar.
+
+    A criação roda em conexão própria (transação curta, com advisory lock para
+    workers concorrentes), fora do bloco da ingestão, para não segurar o lock
+    da tabela mãe enquanto o bloco é processado. Meses já vistos ficam em
+    memória. Em bancos com measurements ainda não particionada é um no-op.
+    """
+
+    def __init__(self):
+        self._known: Set[Tuple[int, int]] = set()
+        self._partitioned: Optional[bool] = None
+
+    def reset(self) -> None:
+        self._known.clear()
+        self._partitioned = None
+
+    async def ensure(self, timestamps: Iterable[datetime]) -> None:
+        months = {(ts.astimezone(timezone.utc).year, ts.astimezone(timezone.utc).month) for ts in timestamps}
+        missing = months - self._known
+        if not missing:
+            return
+        async with engine.begin() as conn:
+            if self._partitioned is None:
+                self._partitioned = await is_partitioned(conn)
+            if self._partitioned:
+                await conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('measurements_partitions'))"))
+                for year, month in sorted(missing):
+                    await create_month_partition(conn, year, month)
+                logger.info("Partições de measurements garantidas: %s", sorted(missing))
+        self._known |= missing
+
+
+measurement_partitions = MeasurementPartitions()
+
+
+async def convert_to_partitioned(conn: AsyncConnection, keep_old: bool = False) -> Tuple[int, int]:
+    """
+    Converte uma measurements comum em particionada (uma vez, via managed_db.py).
+    Copia os dados para partições mensais preservando os ids; linhas sem
+    recorded_at não cabem em nenhuma partição e ficam de fora.
+    Devolve (linhas copiadas, linhas ignoradas).
+    """
+    import models
+
+    if await is_partitioned(conn):
+        return 0, 0
+    old = f"{PARENT_TABLE}_unpartitioned"
+    await conn.execute(text(f"LOCK TABLE {PARENT_TABLE} IN ACCESS EXCLUSIVE MODE"))
+    # Nomes de índices e sequências são únicos no schema: libera-os para a tabela nova
+    await conn.execute(text(f"ALTER TABLE {PARENT_TABLE} RENAME TO {old}"))
+    await conn.execute(text(f"ALTER TABLE {old} RENAME CONSTRAINT {PARENT_TABLE}_pkey TO {old}_pkey"))
+    await conn.execute(text(f"ALTER INDEX IF EXISTS ux_measurements_natural_key RENAME TO ux_{old}_natural_key"))
+    await conn.execute(text(f"ALTER INDEX IF EXISTS ix_measurements_player_id RENAME TO ix_{old}_player_id"))
+    await conn.execute(text(f"ALTER SEQUENCE IF EXISTS {PARENT_TABLE}_id_seq RENAME TO {old}_id_seq"))
+    await conn.run_sync(models.Measurement.__table__.create)
+
+    months = (await conn.execute(text(
+        f"SELECT DISTINCT date_part('year', recorded_at AT TIME ZONE 'UTC')::int, "
+        f"date_part('month', recorded_at AT TIME ZONE 'UTC')::int "
+        f"FROM {old} WHERE recorded_at IS NOT NULL"
+    ))).all()
+    for year, month in months:
+        await create_month_partition(conn, year, month)
+
+    copied = (await conn.execute(text(
+        f"INSERT INTO {PARENT_TABLE} (id, player_id, metric, value, unit, recorded_at, source, meta) "
+        f"SELECT id, player_id, metric, value, unit, recorded_at, source, meta FROM {old} WHERE recorded_at IS NOT NULL"
+    ))).rowcount
+    skipped = (await conn.execute(text(f"SELECT count(*) FROM {old} WHERE recorded_at IS NULL"))).scalar_one()
+    await conn.execute(text(
+        f"SELECT setval('{PARENT_TABLE}_id_seq', (SELECT COALESCE(max(id), 0) + 1 FROM {PARENT_TABLE}), false)"
+    ))
+    if not keep_old:
+        await conn.execute(text(f"DROP TABLE {old}"))
+    return copied, skipped
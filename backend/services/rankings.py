@@ -0,0 +1,121 @@
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+from core.config import settings
+from services.evaluation import POSITIONS, evaluate_athletes_batch
+
+# Vagas por posição em cada esquema tático (11 titulares)
+FORMATIONS = {
+    "4-3-3": {"goleiro": 1, "zagueiro": 2, "lateral": 2, "volante": 1, "meia": 2, "ponta": 2, "atacante": 1},
+    "4-4-2": {"goleiro": 1, "zagueiro": 2, "lateral": 2, "volante": 2, "meia": 2, "ponta": 0, "atacante": 2},
+    "4-2-3-1": {"goleiro": 1, "zagueiro": 2, "lateral": 2, "volante": 2, "meia": 1, "ponta": 2, "atacante": 1},
+    "3-5-2": {"goleiro": 1, "zagueiro": 3, "lateral": 2, "volante": 2, "meia": 1, "ponta": 0, "atacante": 2},
+}
+
+
+def eval_input(first_name: Optional[str], last_name: Optional[str], assessment: Dict[str, Any]) -> Dict[str, Any]:
+    """Adapta a avaliação salva para o formato esperado por evaluate_athlete."""
+    return {
+        "nome": first_name,
+        "sobrenome": last_name or "",
+        "idade": 20,
+        **assessment,
+    }
+
+
+class ScoreTable:
+    """Scores por posição (N atletas x posições) de um técnico, prontos para ranking."""
+
+    __slots__ = ("players", "scores", "potential")
+
+    def __init__(self, players: List[dict], scores: np.ndarray, potential: np.ndarray):
+        self.players = players
+        self.scores = scores
+        self.potential = potential
+
+    def top_k(self, position: str, k: int) -> List[dict]:
+        col = POSITIONS.index(position)
+        order = np.argsort(-self.scores[:, col], kind="stable")[:k]
+        return [
+            {
+                **self.players[i],
+                "score": float(self.scores[i, col]),
+                "potential_score": float(self.potential[i]),
+            }
+            for i in order
+        ]
+
+    def best_lineup(self, formation: Dict[str, int]) -> List[dict]:
+        """Atribuição atleta -> vaga que maximiza a soma dos scores (Hungarian)."""
+        slots = [pos for pos in POSITIONS for _ in range(formation.get(pos, 0))]
+        if not slots or not self.players:
+            return []
+        cols = [POSITIONS.index(pos) for pos in slots]
+        cost = -self.scores[:, cols]
+        rows, assigned = linear_sum_assignment(cost)
+        lineup = [
+            {
+                "position": slots[j],
+                **self.players[i],
+                "score": float(self.scores[i, cols[j]]),
+            }
+            for i, j in zip(rows, assigned)
+        ]
+        lineup.sort(key=lambda item: POSITIONS.index(item["position"]))
+        return lineup
+
+
+class RankingCache:
+    """
+    Cache em processo das ScoreTables por técnico (owner_email), com TTL.
+    Invalidado neste processo quando uma avaliação é gravada
+    (update_assessment), um atleta é cadastrado ou uma ingestão termina;
+    em outros workers a defasagem máxima é o TTL.
+    """
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self._tables: Dict[str, Tuple[float, ScoreTable]] = {}
+
+    def invalidate(self, owner_email: Optional[str] = None) -> None:
+        if owner_email is None:
+            self._tables.clear()
+        else:
+            self._tables.pop(owner_email.lower(), None)
+
+    async def table(self, db: AsyncSession, owner_email: str) -> ScoreTable:
+        owner_email = owner_email.lower()
+        now = time.monotonic()
+        cached = self._tables.get(owner_email)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+
+        q = select(
+            models.Player.id, models.Player.first_name, models.Player.last_name, models.Player.external_ids,
+        ).where(models.Player.owner_email == owner_email)
+        players, inputs = [], []
+        for pid, first, last, ext in (await db.execute(q)).all():
+            assessment = (ext or {}).get("assessment")
+            if not assessment:
+                continue
+            players.append({"player_id": str(pid), "first_name": first, "last_name": last})
+            inputs.append(eval_input(first, last, assessment))
+
+        results = evaluate_athletes_batch(inputs)
+        scores = np.array([[r["position_scores"][pos] for pos in POSITIONS] for r in results]).reshape(-1, len(POSITIONS))
+        potential = np.array([r["potential_score"] for r in results])
+        table = ScoreTable(players, scores, potential)
+        if self.ttl > 0:
+            # Descarta as expiradas para o dicionário não crescer com técnicos inativos
+            self._tables = {k: v for k, v in self._tables.items() if v[0] > now}
+            self._tables[owner_email] = (now + self.ttl, table)
+        return table
+
+
+ranking_cache = RankingCache(settings.RANKING_CACHE_TTL_SECONDS)
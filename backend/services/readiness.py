@@ -0,0 +1,181 @@
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Date, cast, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+
+# ------------------------------------------------------------------------------
+# Agregados diários de carga/HRV (player_daily_metrics) e regras de prontidão
+# ------------------------------------------------------------------------------
+HRV_METRIC = "hrv_rmssd"
+LOAD_METRIC = "total_distance"  # ou session_load se tiver
+TRACKED_METRICS = (HRV_METRIC, LOAD_METRIC)
+WINDOW_DAYS = 28
+ACUTE_DAYS = 7
+HRV_RECENT_DAYS = 3
+HRV_MIN_BASELINE = 5
+
+
+def _day_of(column):
+    return cast(func.timezone("UTC", column), Date)
+
+
+async def refresh_daily_metrics(db: AsyncSession, touched: Iterable[Tuple[Any, date]]) -> None:
+    """
+    Recalcula, a partir de `measurements`, os dias tocados por uma ingestão.
+    Recalcular (em vez de somar deltas) deixa a operação idempotente.
+    """
+    touched = set(touched)
+    if not touched:
+        return
+    player_ids = {pid for pid, _ in touched}
+    first_day = min(day for _, day in touched)
+    last_day = max(day for _, day in touched)
+    start = datetime.combine(first_day, datetime.min.time(), tzinfo=timezone.utc)
+    end = datetime.combine(last_day + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc)
+    await _upsert_daily_from_measurements(
+        db,
+        models.Measurement.player_id.in_(player_ids),
+        models.Measurement.recorded_at >= start,
+        models.Measurement.recorded_at < end,
+    )
+
+
+async def rebuild_daily_metrics(db: AsyncSession) -> None:
+    """Reconstrói a tabela inteira (backfill / correção)."""
+    await _upsert_daily_from_measurements(db)
+
+
+async def _upsert_daily_from_measurements(db: AsyncSession, *conditions) -> None:
+    m = models.Measurement
+    is_load = m.metric == LOAD_METRIC
+    is_hrv = m.metric == HRV_METRIC
+    day = _day_of(m.recorded_at).label("day")
+    source = (
+        select(
+            m.player_id,
+            day,
+            func.coalesce(func.sum(m.value).filter(is_load), 0.0),
+            func.count().filter(is_load),
+            func.coalesce(func.sum(m.value).filter(is_hrv), 0.0),
+            func.count().filter(is_hrv),
+        )
+        .where(m.metric.in_(TRACKED_METRICS), m.player_id.is_not(None), *conditions)
+        .group_by(m.player_id, day)
+    )
+    daily = models.PlayerDailyMetric
+    stmt = pg_insert(daily).from_select(
+        ["player_id", "day", "load_total", "load_count", "hrv_sum", "hrv_count"], source
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[daily.player_id, daily.day],
+        set_={
+            "load_total": stmt.excluded.load_total,
+            "load_count": stmt.excluded.load_count,
+            "hrv_sum": stmt.excluded.hrv_sum,
+            "hrv_count": stmt.excluded.hrv_count,
+            "updated_at": func.now(),
+        },
+    )
+    await db.execute(stmt)
+
+
+async def load_daily_metrics(db: AsyncSession, player_ids, now: Optional[datetime] = None) -> Dict[Any, list]:
+    """Linhas diárias dos últimos WINDOW_DAYS para vários atletas, em uma query."""
+    now = now or datetime.now(timezone.utc)
+    since = (now - timedelta(days=WINDOW_DAYS)).date()
+    daily = models.PlayerDailyMetric
+    q = select(
+        daily.player_id, daily.day, daily.load_total, daily.hrv_sum, daily.hrv_count,
+    ).where(
+        daily.player_id.in_(list(player_ids)),
+        daily.day >= since,
+    ).order_by(daily.player_id, daily.day.desc())
+    rows: Dict[Any, list] = {pid: [] for pid in player_ids}
+    for pid, day, load_total, hrv_sum, hrv_count in (await db.execute(q)).all():
+        rows.setdefault(pid, []).append((day, load_total, hrv_sum, hrv_count))
+    return rows
+
+
+def summarize_daily(rows: List[tuple], now: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Aplica as regras de HRV e ACWR sobre as linhas diárias de um atleta
+    (day, load_total, hrv_sum, hrv_count), da mais recente para a mais antiga.
+    `risk` soma o peso de cada alerta (usado para ordenar o elenco).
+
+    As regras trabalham em dias UTC, não em medições individuais como a versão
+    antiga (uma query de `measurements` por atleta):
+    - "HRV recente" é a média das leituras dos últimos HRV_RECENT_DAYS dias
+      *com leitura* (antes: das últimas 3 leituras); com uma leitura por dia,
+      que é o caso normal, dá o mesmo resultado;
+    - as janelas aguda e crônica do ACWR cortam na virada do dia: entra o dia
+      inteiro de (hoje - ACUTE_DAYS) e de (hoje - WINDOW_DAYS), em vez de só as
+      leituras a menos de 8 dias (aguda) / 28 dias (crônica) de `now`.
+    """
+    now = now or datetime.now(timezone.utc)
+    today = now.date()
+    result: Dict[str, Any] = {
+        "hrv_recent": None,
+        "hrv_baseline": None,
+        "hrv_drop_pct": None,
+        "acwr": None,
+        "acute_load": None,
+        "chronic_weekly_avg": None,
+        "summary": [],
+        "alerts": [],
+        "risk": 0,
+    }
+    summary, alerts = result["summary"], result["alerts"]
+
+    # 1. Regra de Ouro: HRV (rMSSD)
+    # Se a média dos últimos 3 dias for 20% menor que a média do restante da janela -> Fadiga
+    hrv_days = [(s, c) for _, _, s, c in rows if c]
+    if len(hrv_days) >= HRV_RECENT_DAYS:
+        recent = hrv_days[:HRV_RECENT_DAYS]
+        avg_3 = sum(s for s, _ in recent) / sum(c for _, c in recent)
+        result["hrv_recent"] = avg_3
+
+        rest = hrv_days[HRV_RECENT_DAYS:]
+        rest_count = sum(c for _, c in rest)
+        if rest_count >= HRV_MIN_BASELINE:  # precisa de um mínimo de histórico
+            avg_chronic = sum(s for s, _ in rest) / rest_count
+            drop_pct = (avg_chronic - avg_3) / avg_chronic * 100
+            result["hrv_baseline"] = avg_chronic
+            result["hrv_drop_pct"] = drop_pct
+
+            summary.append(f"HRV Recente (3d): {avg_3:.1f}ms | Basal: {avg_chronic:.1f}ms")
+
+            if drop_pct > 20:
+                alerts.append(f"ALERTA CRÍTICO: Queda de {drop_pct:.1f}% no HRV. Sinal forte de fadiga acumulada ou má recuperação.")
+                result["risk"] += 3
+            elif drop_pct > 10:
+                alerts.append(f"ATENÇÃO: Queda de {drop_pct:.1f}% no HRV. Monitorar carga.")
+                result["risk"] += 1
+        else:
+            summary.append(f"HRV Recente: {avg_3:.1f}ms (Sem histórico suficiente para baseline)")
+
+    # 2. ACWR (Total Distance ou Load)
+    # Razão Aguda (7 dias) / Crônica (28 dias)
+    load_days = [(day, total) for day, total, _, _ in rows if total]
+    if load_days:
+        acute_load = sum(total for day, total in load_days if (today - day).days <= ACUTE_DAYS)
+        chronic_avg = sum(total for _, total in load_days) / 4  # média semanal do mês
+        result["acute_load"] = acute_load
+        result["chronic_weekly_avg"] = chronic_avg
+
+        if chronic_avg > 0:
+            acwr = acute_load / chronic_avg
+            result["acwr"] = acwr
+            summary.append(f"ACWR (Carga Aguda/Crônica): {acwr:.2f}")
+
+            if acwr > 1.5:
+                alerts.append(f"RISCO DE LESÃO: ACWR de {acwr:.2f} (Muito alto). Pico agudo de carga.")
+                result["risk"] += 2
+            elif acwr < 0.8:
+                alerts.append(f"Destreinamento: ACWR de {acwr:.2f} (Baixo).")
+                result["risk"] += 1
+
+    return result
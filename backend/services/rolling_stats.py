@@ -0,0 +1,146 @@
+import bisect
+import math
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Iterable, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+
+# Quantos grupos (jogador, métrica) ficam em memória (LRU)
+MAX_GROUPS = 20000
+
+
+class RollingWindow:
+    """
+    Agregados de uma janela temporal de (jogador, métrica).
+
+    Guarda count, soma e soma dos quadrados (deslocados por `shift` para não
+    perder precisão) e os valores ordenados por data, para poder expulsar os
+    que saem da janela. Vale para todo recorded_at >= `horizon`.
+    """
+
+    __slots__ = ("horizon", "entries", "head", "count", "s1", "s2", "shift", "max_id")
+
+    def __init__(self, horizon: datetime, rows: Iterable[Tuple[int, datetime, float]] = ()):
+        self.horizon = horizon
+        self.entries: list = []
+        self.head = 0
+        self.count = 0
+        self.s1 = 0.0
+        self.s2 = 0.0
+        self.shift: Optional[float] = None
+        self.max_id = 0
+        for mid, ts, value in rows:
+            self.push(ts, value, mid)
+
+    def push(self, ts: datetime, value: float, mid: Optional[int] = None) -> None:
+        if self.shift is None:
+            self.shift = value
+        entry = (ts, value)
+        if self.head == len(self.entries) or entry >= self.entries[-1]:
+            self.entries.append(entry)
+        else:
+            bisect.insort(self.entries, entry, lo=self.head)
+        d = value - self.shift
+        self.count += 1
+        self.s1 += d
+        self.s2 += d * d
+        if mid is not None and mid > self.max_id:
+            self.max_id = mid
+
+    def evict(self, floor: datetime) -> None:
+        """Remove definitivamente os valores com ts < floor."""
+        entries = self.entries
+        while self.head < len(entries) and entries[self.head][0] < floor:
+            d = entries[self.head][1] - self.shift
+            self.count -= 1
+            self.s1 -= d
+            self.s2 -= d * d
+            self.head += 1
+        if floor > self.horizon:
+            self.horizon = floor
+        if self.count == 0:
+            self.entries, self.head = [], 0
+            self.s1 = self.s2 = 0.0
+            self.shift = None
+        elif self.head > 1024 and self.head * 2 > len(entries):
+            self.entries, self.head = entries[self.head:], 0
+
+    def moments(self, since: datetime) -> Tuple[int, float, float]:
+        """(n, média, desvio padrão populacional) dos valores com ts >= since."""
+        n, s1, s2 = self.count, self.s1, self.s2
+        i = self.head
+        # Só percorre algo quando há valores fora de ordem ainda retidos
+        while i < len(self.entries) and self.entries[i][0] < since:
+            d = self.entries[i][1] - self.shift
+            n -= 1
+            s1 -= d
+            s2 -= d * d
+            i += 1
+        if n <= 0:
+            return 0, 0.0, 0.0
+        mean_d = s1 / n
+        var = max(s2 / n - mean_d * mean_d, 0.0)
+        return n, self.shift + mean_d, math.sqrt(var)
+
+
+class RollingStatsStore:
+    """
+    Cache em processo de RollingWindow por (jogador, métrica).
+
+    É reconstruível a partir de `measurements`: cada uso é validado com um
+    count/max(id) barato e, se o banco divergir (outro worker, deleção) ou a
+    janela pedida for mais antiga que o horizonte em memória, a janela é
+    recarregada.
+    """
+
+    def __init__(self, max_groups: int = MAX_GROUPS):
+        self.max_groups = max_groups
+        self._groups: "OrderedDict[Tuple[Any, str], RollingWindow]" = OrderedDict()
+
+    def invalidate(self, player_id=None, metric: str | None = None) -> None:
+        if player_id is None:
+            self._groups.clear()
+            return
+        for key in [k for k in self._groups if k[0] == player_id and (metric is None or k[1] == metric)]:
+            del self._groups[key]
+
+    async def window(self, db: AsyncSession, player_id, metric: str, floor: datetime) -> RollingWindow:
+        """Janela válida para todo recorded_at >= floor, coerente com o banco."""
+        key = (player_id, metric)
+        win = self._groups.get(key)
+        if win is not None and win.horizon <= floor:
+            q = select(func.count(), func.coalesce(func.max(models.Measurement.id), 0)).where(
+                models.Measurement.player_id == player_id,
+                models.Measurement.metric == metric,
+                models.Measurement.recorded_at >= win.horizon,
+            )
+            count, max_id = (await db.execute(q)).one()
+            if count != win.count or max_id != win.max_id:
+                win = None
+        else:
+            win = None
+
+        if win is None:
+            q = select(
+                models.Measurement.id,
+                models.Measurement.recorded_at,
+                models.Measurement.value,
+            ).where(
+                models.Measurement.player_id == player_id,
+                models.Measurement.metric == metric,
+                models.Measurement.recorded_at >= floor,
+            ).order_by(models.Measurement.recorded_at)
+            win = RollingWindow(floor, (await db.execute(q)).all())
+
+        self._groups[key] = win
+        self._groups.move_to_end(key)
+        while len(self._groups) > self.max_groups:
+            self._groups.popitem(last=False)
+        return win
+
+
+window_store = RollingStatsStore()
@@ -0,0 +1,45 @@
+import os
+import sys
+
+import pytest
+
+# Os módulos do backend importam como "services.x", "core.x" (rodando de backend/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Testes de banco só rodam com TEST_DATABASE_URL (o schema public é recriado!);
+# sem ele, uma URL fictícia basta: criar o engine não abre conexão.
+if os.environ.get("TEST_DATABASE_URL"):
+    os.environ["DATABASE_URL"] = os.environ["TEST_DATABASE_URL"]
+os.environ.setdefault("DATABASE_URL", "postgresql+asyncpg://test@localhost/test")
+os.environ.setdefault("GEMINI_API_KEY", "test")
+os.environ.setdefault("JWT_SECRET", "test")
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def db():
+    """Sessão num banco recriado do zero (create_all + migrações); pula sem TEST_DATABASE_URL."""
+    if not os.environ.get("TEST_DATABASE_URL"):
+        pytest.skip("TEST_DATABASE_URL não configurada")
+    from sqlalchemy import text
+
+    from database import SessionLocal, engine
+    from migrations import run_migrations
+    from models import Base
+    from services.partitions import measurement_partitions
+    from services.rolling_stats import window_store
+
+    async with engine.begin() as conn:
+        await conn.execute(text("DROP SCHEMA public CASCADE"))
+        await conn.execute(text("CREATE SCHEMA public"))
+        await conn.run_sync(Base.metadata.create_all)
+        await run_migrations(conn)
+    measurement_partitions.reset()
+    window_store.invalidate()
+    async with SessionLocal() as session:
+        yield session
+    await engine.dispose()
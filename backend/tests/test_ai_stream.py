@@ -0,0 +1,158 @@
+import json
+import random
+import re
+
+import bleach
+import pytest
+
+from routers.ai import _ALLOWED_TAGS, _HTML_FIELDS, _sanitize
+from services.ai_stream import AnalysisStreamParser, HTMLStreamSanitizer
+
+# Entradas que o bleach e o sanitizador em streaming devem tratar igual
+CASES = [
+    "<p>Olá <strong>mundo</strong></p>",
+    "<ul><li>um</li><li>dois</li></ul><p>fim</p>",
+    "<P>caixa alta</P><BR>",
+    "<p\nclass='x'>quebra de linha na tag</p>",
+    "<span style=\"color:red\">x</span>",
+    "<p onclick=\"roubar()\">a</p>",
+    "<p onmouseover=alert(1)>b</p>",
+    "<a href=\"javascript:alert(1)\">link</a>",
+    "<a href='JaVaScRiPt:alert(1)'>link</a>",
+    "<img src=x onerror=alert(1)>",
+    "<p title=\"a>b\">atributo com &gt;</p>",
+    "<p title='x\" onclick=\"y'>aspas misturadas</p>",
+    "<script>alert(1)</script>texto",
+    "<scr<script>ipt>alert(1)</script>",
+    "<<script>>",
+    "<style>p{}</style>",
+    "<iframe src=\"javascript:alert(1)\"></iframe>",
+    "<!-- comentário com <script> dentro --><p>x</p>",
+    "<!-- a > b --><p>depois</p>",
+    "<!--><!---><p>vazios</p>",
+    "<!DOCTYPE html><?xml x?></ 1></>texto",
+    "<!--a--!>b<p>fim<!-- sem fim",
+    "x<p title=\"cortada",
+    "a < b e c > d & e",
+    "5 > 3 &amp;&amp; 2 <3",
+    "&amp; &lt; &#39; &#x27; &nbsp; &eacute; &bogus; &",
+    "&CounterClockwiseContourIntegral; &amp",
+    "<br><br/></br>",
+    "x</p>",
+    "<p>não fechado",
+    "<ul><li>um<li>dois</ul>",
+    "<p>um<p>dois",
+    "\"aspas\" 'simples'",
+    "<p>Carga aguda 1.4x a crônica: <strong>risco</strong> de lesão.</p>"
+    "<ul><li>Reduzir volume</li><li>HRV &lt; 50ms</li></ul>",
+]
+
+# Tags cortadas em pontos perigosos: nenhum pedaço pode vazar markup
+ADVERSARIAL_SPLITS = [
+    ["<scr", "ipt>alert(1)</scr", "ipt>"],
+    ["<p on", "click=\"x()\">a</p>"],
+    ["<p onclick", "=\"x()\">a</p>"],
+    ["<a href=\"java", "script:alert(1)\">l</a>"],
+    ["<p title=\"a", ">b\" onclick=\"x\">c</p>"],
+    ["<img src=x one", "rror=alert(1)>"],
+    ["&am", "p; &l", "t;script&g", "t;"],
+    ["<", "!-", "- <script> -", "-> ok"],
+    ["<", "/p", ">", "<", "b", ">x</b"],
+]
+
+
+def bleach_clean(text: str) -> str:
+    return bleach.clean(text, tags=_ALLOWED_TAGS, strip=True)
+
+
+def stream_clean(chunks) -> str:
+    san = HTMLStreamSanitizer(_ALLOWED_TAGS)
+    return "".join(san.feed(chunk) for chunk in chunks) + san.close()
+
+
+def assert_safe(out: str) -> None:
+    for tag in re.findall(r"<[^>]*>", out):
+        assert re.fullmatch(r"</?(%s)>" % "|".join(_ALLOWED_TAGS), tag), tag
+    lowered = out.lower()
+    assert "<script" not in lowered and "<img" not in lowered and "<a" not in lowered
+    assert not re.search(r"<[^>]*(on\w+\s*=|javascript:)", lowered)
+
+
+@pytest.mark.parametrize("text", CASES)
+def test_matches_bleach(text):
+    assert stream_clean([text]) == bleach_clean(text)
+
+
+@pytest.mark.parametrize("text", CASES)
+def test_every_split_point_matches_unsplit(text):
+    expected = stream_clean([text])
+    for k in range(len(text) + 1):
+        assert stream_clean([text[:k], text[k:]]) == expected, k
+    assert stream_clean(list(text)) == expected
+
+
+@pytest.mark.parametrize("chunks", ADVERSARIAL_SPLITS)
+def test_adversarial_splits(chunks):
+    text = "".join(chunks)
+    out = stream_clean(chunks)
+    assert out == stream_clean([text]) == bleach_clean(text)
+    assert_safe(out)
+
+
+def test_random_chunking_is_safe():
+    rng = random.Random(11)
+    alphabet = ["<", ">", "/", "&", ";", "=", "\"", "'", " ", "!", "-", "p", "b", "li", "script",
+                "on", "click", "javascript:", "amp", "#39", "x"]
+    for _ in range(300):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 40)))
+        cuts = sorted(rng.sample(range(len(text) + 1), min(3, len(text) + 1)))
+        chunks = [text[a:b] for a, b in zip([0] + cuts, cuts + [len(text)])]
+        out = stream_clean(chunks)
+        assert out == stream_clean([text]), text
+        assert_safe(out)
+
+
+def test_unclosed_tag_is_escaped_on_close():
+    san = HTMLStreamSanitizer(_ALLOWED_TAGS)
+    assert san.feed("<p>texto <scr") == "<p>texto "
+    assert san.close() == "&lt;scr</p>"
+
+
+def parse_streamed(raw: str, chunks):
+    parser = AnalysisStreamParser(_HTML_FIELDS, _ALLOWED_TAGS)
+    got = {}
+    for chunk in chunks:
+        for field, html in parser.feed(chunk):
+            got[field] = got.get(field, "") + html
+    for field, html in parser.close():
+        got[field] = got.get(field, "") + html
+    return got
+
+
+def expected_fields(raw: str):
+    final = _sanitize(json.loads(raw))
+    return {k: final[k] for k in _HTML_FIELDS if k in final}
+
+
+PAYLOADS = [
+    {
+        "relatorio": "<p>Atleta com <strong>HRV</strong> em queda</p><script>alert(1)</script>",
+        "comparacao": "Linha 1\nLinha 2 \"citada\" \\ barra <a href=\"javascript:x\">l</a>",
+        "plano_treino": "<ul><li>Regenerativo</li><li>Sono ≥ 8h 😴</li></ul>",
+        "risco": 3,
+        "detalhes": {"relatorio": "<b>não é o campo</b>", "lista": [1, "dois", {"x": "}"}]},
+    },
+    {"relatorio": "<p onclick=\"x()\">a &amp; b &bogus;</p>", "comparacao": "", "plano_treino": "x<!-- sem fim"},
+]
+
+
+@pytest.mark.parametrize("payload", PAYLOADS)
+@pytest.mark.parametrize("ensure_ascii", [True, False])
+def test_parser_matches_final_sanitize(payload, ensure_ascii):
+    raw = json.dumps(payload, ensure_ascii=ensure_ascii, indent=1)
+    expected = {k: v for k, v in expected_fields(raw).items() if v}
+    assert parse_streamed(raw, [raw]) == expected
+    # Cada ponto de corte (escapes \uXXXX, surrogates, chaves e tags divididas)
+    for cut in range(len(raw) + 1):
+        assert parse_streamed(raw, [raw[:cut], raw[cut:]]) == expected, cut
+    assert parse_streamed(raw, list(raw)) == expected
@@ -0,0 +1,194 @@
+import io
+from datetime import date, datetime, timezone
+
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+import pytest
+
+from services.columnar import ColumnarStream
+from services.ingestion import ANONYMOUS_ROW, BulkIngestor, WideLayout
+
+
+def parquet(table: pa.Table) -> io.BytesIO:
+    buf = io.BytesIO()
+    pq.write_table(table, buf)
+    buf.seek(0)
+    return buf
+
+
+def read_all(fileobj, batch_rows=10000):
+    stream = ColumnarStream(fileobj, batch_rows=batch_rows)
+    layout = WideLayout.detect(stream.fieldnames)
+    date_key = layout.date_key if layout else "recorded_at"
+    items, errors = [], []
+    while (batch := stream.read_batch(date_key, layout)) is not None:
+        items += batch[0]
+        errors += batch[1]
+    return stream, items, errors
+
+
+def long_table(**overrides):
+    columns = {
+        "first_name": ["Ana", "Ana", "Bia"],
+        "last_name": ["Silva", "Silva", "Souza"],
+        "external_id": ["E1", "E1", ""],
+        "metric": ["Total Distance", "rMSSD", "Max Speed"],
+        "value": [5.5, 60.0, 10.0],
+        "unit": ["km", "", "m/s"],
+        "recorded_at": pa.array([datetime(2026, 3, 1, 10, tzinfo=timezone.utc)] * 3, pa.timestamp("us", "UTC")),
+    }
+    columns.update(overrides)
+    return pa.table(columns)
+
+
+def test_typed_long_parquet_is_normalized():
+    stream, items, errors = read_all(parquet(long_table()))
+    assert (stream.format, stream.source) == ("parquet", "parquet")
+    assert errors == []
+    assert [(i["metric"], i["value"], i["unit"]) for i in items] == [
+        ("total_distance", 5500.0, "m"), ("hrv_rmssd", 60.0, "ms"), ("max_speed", 36.0, "km/h"),
+    ]
+    assert items[0]["recorded_at"] == datetime(2026, 3, 1, 10, tzinfo=timezone.utc)
+    assert items[0]["external_id"] == "E1" and items[2]["external_id"] is None
+    assert [i["line"] for i in items] == [1, 2, 3]
+
+
+def test_arrow_file_and_stream_are_detected_and_rebatched():
+    table = long_table()
+    file_buf, stream_buf = io.BytesIO(), io.BytesIO()
+    with ipc.new_file(file_buf, table.schema) as writer:
+        writer.write_table(table)
+    with ipc.new_stream(stream_buf, table.schema) as writer:
+        writer.write_table(table)
+    for buf, fmt in ((file_buf, "arrow"), (stream_buf, "arrow-stream")):
+        buf.seek(0)
+        stream, items, errors = read_all(buf, batch_rows=2)
+        assert (stream.format, stream.source) == (fmt, "arrow")
+        assert len(items) == 3 and errors == []
+
+
+def test_text_columns_parse_like_csv():
+    table = long_table(
+        value=["5,5", " 60 ", "abc"],
+        recorded_at=["2026-03-01T10:00:00Z", "2026-03-01", "2026-03-01 09:00"],
+    )
+    _, items, errors = read_all(parquet(table))
+    assert [i["value"] for i in items] == [5500.0, 60.0]
+    assert items[1]["recorded_at"] == datetime(2026, 3, 1, tzinfo=timezone.utc)
+    assert errors == [{"row": 3, "error": "value inválido: 'abc'", "row_data": {
+        "first_name": "Bia", "last_name": "Souza", "external_id": "", "metric": "Max Speed",
+        "value": "abc", "unit": "m/s", "recorded_at": "2026-03-01 09:00",
+    }}]
+
+
+def test_row_errors_in_check_order():
+    table = long_table(
+        metric=["Total Distance", "", "Total Distance"],
+        value=pa.array([1.0, 2.0, float("nan")]),
+        unit=["km/h", "", "km"],
+        recorded_at=pa.array([date(2026, 3, 1), None, date(2026, 3, 1)], pa.date32()),
+    )
+    _, items, errors = read_all(parquet(table))
+    assert items == []
+    assert [(e["row"], e["error"]) for e in errors] == [
+        (1, "unidade 'km/h' incompatível com total_distance (esperado m)"),
+        (2, "recorded_at inválido: ''"),
+        (3, "value inválido: 'nan'"),
+    ]
+
+
+def test_anonymous_rows_are_errors():
+    table = long_table(first_name=["", "Ana", ""], last_name=["", "Silva", ""], external_id=["", "", "E9"])
+    _, items, errors = read_all(parquet(table))
+    assert [i["line"] for i in items] == [2, 3]
+    assert [(e["row"], e["error"]) for e in errors] == [(1, ANONYMOUS_ROW)]
+
+
+def test_wide_layout_melts_and_skips_empty_cells():
+    table = pa.table({
+        "Player Name": ["Ana Maria Silva", "Bia Souza"],
+        "Date": pa.array([date(2026, 3, 1), date(2026, 3, 2)], pa.date32()),
+        "Total Distance (km)": [5.0, None],
+        "Max Velocity [m/s]": [float("nan"), 8.0],
+        "Session": ["Treino", "Jogo"],
+    })
+    _, items, errors = read_all(parquet(table))
+    assert errors == []
+    assert [(i["first_name"], i["last_name"], i["metric"], i["value"], i["unit"]) for i in items] == [
+        ("Ana", "Maria Silva", "total_distance", 5000.0, "m"),
+        ("Bia", "Souza", "max_speed", pytest.approx(28.8), "km/h"),
+    ]
+
+
+def test_wide_layout_with_only_an_id_column():
+    # Regressão: sem coluna de nome o read_batch quebrava com AttributeError
+    table = pa.table({
+        "external_id": pa.array([101, 102], pa.int64()),
+        "date": ["2026-03-01T10:00:00Z", "2026-03-01T10:00:00Z"],
+        "Total Distance (km)": [5.0, 6.0],
+    })
+    stream, items, errors = read_all(parquet(table))
+    assert WideLayout.detect(stream.fieldnames) is not None
+    assert errors == []
+    assert [(i["first_name"], i["last_name"], i["external_id"], i["value"]) for i in items] == [
+        ("", "", "101", 5000.0), ("", "", "102", 6000.0),
+    ]
+
+
+def test_unsupported_column_type_is_rejected_up_front():
+    table = long_table(recorded_at=pa.array([[1], [2], [3]], pa.list_(pa.int64())))
+    stream = ColumnarStream(parquet(table))
+    with pytest.raises(ValueError, match="recorded_at"):
+        stream.check_types("recorded_at")
+
+
+@pytest.mark.anyio
+async def test_id_only_rows_become_distinct_players(db):
+    from sqlalchemy import text
+
+    table = pa.table({
+        "external_id": ["101", "102", "101"],
+        "date": ["2026-03-01T10:00:00Z", "2026-03-01T10:00:00Z", "2026-03-02T10:00:00Z"],
+        "Total Distance": [5000.0, 6000.0, 7000.0],
+    })
+    _, items, errors = read_all(parquet(table))
+    ingestor = BulkIngestor(db, owner_email="coach@x.com")
+    await ingestor.feed_validated(items, errors)
+    summary = await ingestor.finish()
+    assert (summary["inserted"], summary["error_count"]) == (3, 0)
+    players = (await db.execute(text("SELECT prosoccer_id, count(*) FROM players GROUP BY 1 ORDER BY 1"))).all()
+    assert players == [("101", 1), ("102", 1)]
+
+
+def test_spool_keeps_the_upload_extension():
+    from routers.ingest import _spool_suffix
+
+    assert _spool_suffix("treino.PARQUET", True) == ".parquet"
+    assert _spool_suffix("treino.feather", True) == ".feather"
+    assert _spool_suffix("sem_extensao", True) == ".bin"
+    assert _spool_suffix("../x.c$v", False) == ".csv"
+
+
+@pytest.mark.anyio
+async def test_csv_and_parquet_uploads_do_not_share_the_natural_key(db):
+    from fastapi import UploadFile
+    from sqlalchemy import text
+
+    import models
+    from routers.ingest import ingest_columnar, ingest_csv
+    from services.partitions import measurement_partitions
+
+    await measurement_partitions.ensure([datetime(2026, 3, 1, tzinfo=timezone.utc)])
+    user = models.User(email="coach@x.com")
+    csv = b"first_name,last_name,external_id,metric,value,unit,recorded_at\nAna,Silva,E1,rMSSD,60,ms,2026-03-01T10:00:00Z\n"
+    table = pa.table({
+        "first_name": ["Ana"], "last_name": ["Silva"], "external_id": ["E1"], "metric": ["rMSSD"],
+        "value": [70.0], "unit": ["ms"],
+        "recorded_at": pa.array([datetime(2026, 3, 1, 10, tzinfo=timezone.utc)], pa.timestamp("us", "UTC")),
+    })
+    await ingest_csv(file=UploadFile(io.BytesIO(csv), filename="a.csv"), current_user=user, db=db)
+    summary = await ingest_columnar(file=UploadFile(parquet(table), filename="a.parquet"), current_user=user, db=db)
+    assert summary["inserted"] == 1
+    rows = (await db.execute(text("SELECT source, value FROM measurements ORDER BY source"))).all()
+    assert rows == [("csv", 60.0), ("parquet", 70.0)]
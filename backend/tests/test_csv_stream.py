@@ -0,0 +1,69 @@
+import io
+
+from services.ingestion import MAX_ERRORS_KEPT, BulkIngestor, CSVStream
+
+
+def read_all(stream: CSVStream):
+    rows = []
+    while True:
+        batch = stream.read_batch(500)
+        if not batch:
+            return rows
+        rows.extend(batch)
+
+
+def test_utf8_with_bom_and_semicolon():
+    body = "first_name;last_name\nJoão;Conceição\n".encode("utf-8-sig")
+    stream = CSVStream(io.BytesIO(body))
+    assert stream.encoding == "utf-8-sig"
+    assert stream.delimiter == ";"
+    assert stream.fieldnames == ["first_name", "last_name"]
+    assert read_all(stream) == [(2, {"first_name": "João", "last_name": "Conceição"})]
+
+
+def test_latin1_detected_in_first_chunk():
+    body = "first_name,last_name\nJoão,Conceição\n".encode("latin-1")
+    stream = CSVStream(io.BytesIO(body))
+    assert stream.encoding == "latin-1"
+    assert stream.delimiter == ","
+    assert read_all(stream)[0][1] == {"first_name": "João", "last_name": "Conceição"}
+
+
+def test_reads_only_the_chunks_it_needs():
+    body = ("first_name,last_name\n" + "".join(f"A{i},B\n" for i in range(20000))).encode()
+    raw = io.BytesIO(body)
+    stream = CSVStream(raw, chunk_size=1024)
+    first = stream.read_batch(100)
+    assert [line for line, _ in first] == list(range(2, 102))
+    assert raw.tell() <= 4 * 1024
+    rest = read_all(stream)
+    assert len(rest) == 20000 - 100
+    assert rest[-1] == (20001, {"first_name": "A19999", "last_name": "B"})
+
+
+def test_latin1_after_ascii_prefix_is_not_replaced():
+    # Primeiro bloco só ASCII (parece utf-8); o acento aparece bem depois
+    body = ("first_name,last_name\n" + "Ana,Silva\n" * 5000 + "João,Conceição\n").encode("latin-1")
+    stream = CSVStream(io.BytesIO(body), chunk_size=1024)
+    rows = read_all(stream)
+    assert len(rows) == 5001
+    assert rows[-1][1] == {"first_name": "João", "last_name": "Conceição"}
+    assert stream.encoding == "latin-1"
+    assert not any("�" in v for _, row in rows for v in row.values())
+
+
+def test_multibyte_utf8_split_across_chunks():
+    body = ("first_name,last_name\n" + "Conceição,Ç\n" * 300).encode("utf-8")
+    stream = CSVStream(io.BytesIO(body), chunk_size=7)
+    rows = read_all(stream)
+    assert stream.encoding == "utf-8-sig"
+    assert {row["first_name"] for _, row in rows} == {"Conceição"}
+
+
+def test_errors_are_bounded():
+    ingestor = BulkIngestor(None)
+    row = {"first_name": "A", "last_name": "B", "external_id": "", "metric": "HRV", "value": "x", "unit": "", "recorded_at": "2026-01-01"}
+    for line in range(MAX_ERRORS_KEPT + 50):
+        ingestor.add(line, row)
+    assert ingestor.error_count == MAX_ERRORS_KEPT + 50
+    assert len(ingestor.errors) == MAX_ERRORS_KEPT
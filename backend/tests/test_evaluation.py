@@ -0,0 +1,53 @@
+import random
+
+import numpy as np
+import pytest
+
+from services.evaluation import BATCH_COLUMNS, SKILL_KEYS, evaluate_athlete, evaluate_athletes_batch
+
+
+def random_athlete(rng: random.Random) -> dict:
+    d = {
+        "velocidade_sprint": round(rng.uniform(2.5, 5.0), 2),
+        "agilidade": round(rng.uniform(8.5, 13.0), 2),
+        "salto_vertical": round(rng.uniform(25, 80), 1),
+        "peso": round(rng.uniform(50, 100), 1),
+        "altura": rng.randint(155, 200),
+        "idade": rng.randint(15, 40),
+        **{k: rng.randint(0, 10) for k in SKILL_KEYS},
+    }
+    # Campos ausentes exercitam os valores padrão (5.0 / sem IMC / sem idade)
+    for key in rng.sample(list(d), rng.randint(0, 4)):
+        del d[key]
+    return d
+
+
+def test_batch_matches_scalar_on_random_athletes():
+    rng = random.Random(7)
+    athletes = [random_athlete(rng) for _ in range(2000)]
+    assert evaluate_athletes_batch(athletes) == [evaluate_athlete(d) for d in athletes]
+
+
+@pytest.mark.parametrize("athlete", [
+    {},
+    {"peso": "abc", "altura": 180},
+    {"peso": 80, "altura": 0},
+    {"peso": 95, "altura": 170, "idade": 35, "agressividade": 10},
+    {"peso": 45, "altura": 180, "idade": 33.5},
+    {"velocidade_sprint": 1.0, "agilidade": 20, "salto_vertical": 100},
+])
+def test_batch_matches_scalar_on_edge_cases(athlete):
+    assert evaluate_athletes_batch([athlete]) == [evaluate_athlete(athlete)]
+
+
+def test_array_input_matches_dict_input():
+    rng = random.Random(11)
+    athletes = [random_athlete(rng) for _ in range(200)]
+    arr = np.array([[d.get(k, np.nan) for k in BATCH_COLUMNS] for d in athletes], dtype=float)
+    assert evaluate_athletes_batch(arr) == evaluate_athletes_batch(athletes)
+
+
+def test_empty_and_bad_shape():
+    assert evaluate_athletes_batch([]) == []
+    with pytest.raises(ValueError):
+        evaluate_athletes_batch(np.zeros((3, 2)))
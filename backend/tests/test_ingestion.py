@@ -0,0 +1,130 @@
+import io
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import event, func, select
+
+import models
+from database import engine
+from services.ingestion import BulkIngestor, CSVStream, file_sha256, find_ingested_file, register_ingested_file
+from services.normalization import find_date_key
+
+pytestmark = pytest.mark.anyio
+
+OWNER = "coach@x.com"
+T0 = datetime(2026, 3, 1, 8, tzinfo=timezone.utc)
+CSV = """first_name,last_name,external_id,metric,value,unit,recorded_at
+Ana,Silva,E1,Total Distance,5.5,km,2026-03-01T10:00:00Z
+Ana,Silva,E1,rMSSD,60,ms,2026-03-01T10:00:00Z
+Bia,Souza,,Total Distance,4200,m,2026-03-01T10:00:00Z
+Bia,Souza,,Total Distance,4300,m,2026-03-02T10:00:00Z
+Ana,Silva,E1,Total Distance,6,km,2026-04-01T10:00:00Z
+"""
+
+
+async def ingest(db, content: str, source: str = "csv", chunk_size: int = 2) -> BulkIngestor:
+    stream = CSVStream(io.BytesIO(content.encode()))
+    ingestor = BulkIngestor(
+        db, owner_email=OWNER, chunk_size=chunk_size, source=source,
+        date_key=find_date_key(stream.fieldnames) or "recorded_at",
+    )
+    while batch := stream.read_batch(chunk_size):
+        await ingestor.feed(batch)
+    await ingestor.finish()
+    return ingestor
+
+
+def counts(ingestor: BulkIngestor):
+    return ingestor.inserted, ingestor.updated, ingestor.skipped, ingestor.error_count
+
+
+async def measurement_count(db) -> int:
+    return (await db.execute(select(func.count()).select_from(models.Measurement))).scalar_one()
+
+
+def row(first_name: str, value, minutes: int = 0, external_id: str = "") -> dict:
+    return {
+        "first_name": first_name, "last_name": "Silva", "external_id": external_id, "metric": "rMSSD",
+        "value": str(value), "unit": "ms", "recorded_at": (T0 + timedelta(minutes=minutes)).isoformat(),
+    }
+
+
+async def test_rows_are_grouped_into_chunks(db):
+    rows = [
+        (2, row("Ana", 60, 0, "E1")),
+        (3, row("Bia", 55, 0)),
+        (4, row("Ana", "x", 1, "E1")),
+        (5, row("Ana", 62, 2, "E1")),
+        (6, row("Bia", 57, 2)),
+    ]
+    ingestor = BulkIngestor(db, owner_email=OWNER, chunk_size=2)
+    await ingestor.feed(rows)
+    summary = await ingestor.finish()
+    assert summary["inserted"] == 4
+    assert [e["row"] for e in summary["errors"]] == [4]
+    players = (await db.execute(select(func.count()).select_from(models.Player))).scalar_one()
+    assert players == 2
+
+
+async def test_statements_do_not_grow_with_rows(db):
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    async def run(rows) -> int:
+        statements.clear()
+        ingestor = BulkIngestor(db, owner_email=OWNER)
+        await ingestor.feed(enumerate(rows, start=2))
+        await ingestor.finish()
+        return len(statements)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", count)
+    try:
+        small = await run([row("Ana", 60), row("Bia", 55)])
+        big = await run([row(name, 50 + k % 20, 10 + k) for k in range(100) for name in ("Ana", "Bia")])
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", count)
+    assert 0 < big <= small
+
+
+async def test_reupload_is_skipped(db):
+    assert counts(await ingest(db, CSV)) == (5, 0, 0, 0)
+    assert counts(await ingest(db, CSV, chunk_size=1000)) == (0, 0, 5, 0)
+    assert await measurement_count(db) == 5
+    assert (await db.execute(select(func.count()).select_from(models.Player))).scalar_one() == 2
+
+
+async def test_changed_values_are_updated(db):
+    await ingest(db, CSV)
+    # 5.5 km == 5500 m: mesma medição canônica, nada muda; 60 -> 65 ms é atualização
+    changed = CSV.replace("5.5,km", "5500,m").replace("rMSSD,60", "rMSSD,65")
+    assert counts(await ingest(db, changed)) == (0, 1, 4, 0)
+    values = (await db.execute(
+        select(models.Measurement.value).where(models.Measurement.metric == "hrv_rmssd")
+    )).scalars().all()
+    assert values == [65.0]
+    assert await measurement_count(db) == 5
+
+
+async def test_source_is_part_of_the_key(db):
+    await ingest(db, CSV)
+    assert counts(await ingest(db, CSV, source="catapult")) == (5, 0, 0, 0)
+    assert await measurement_count(db) == 10
+
+
+async def test_file_registry_only_for_clean_ingests(db):
+    raw = io.BytesIO(CSV.encode())
+    sha = file_sha256(raw)
+    assert raw.tell() == 0
+    ingestor = await ingest(db, CSV)
+    await register_ingested_file(db, OWNER, sha, "gps.csv", len(CSV), ingestor)
+    previous = await find_ingested_file(db, OWNER.upper(), sha)
+    assert previous["skipped"] == 5 and previous["duplicate_of"]["filename"] == "gps.csv"
+    assert await find_ingested_file(db, "other@x.com", sha) is None
+
+    bad = CSV + "Ana,Silva,E1,Total Distance,abc,km,2026-03-03T10:00:00Z\n"
+    ingestor = await ingest(db, bad)
+    assert counts(ingestor) == (0, 0, 5, 1)
+    await register_ingested_file(db, OWNER, "f" * 64, "bad.csv", len(bad), ingestor)
+    assert await find_ingested_file(db, OWNER, "f" * 64) is None
@@ -0,0 +1,123 @@
+import asyncio
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import select
+
+import models
+from routers.ingest import get_ingest_job
+from services.jobs import IngestJobRunner
+
+pytestmark = pytest.mark.anyio
+
+OWNER = "c@x.com"
+CSV = (
+    b"first_name,last_name,external_id,metric,value,unit,recorded_at\n"
+    b"Ana,Silva,E1,rMSSD,60,ms,2026-03-01T10:00:00Z\n"
+    b"Ana,Silva,E1,rMSSD,abc,ms,2026-03-02T10:00:00Z\n"
+)
+
+
+def spool() -> str:
+    return tempfile.NamedTemporaryFile(prefix="ingest-", delete=False).name
+
+
+async def _add_job(db, job_id: str, status: str, worker_id: str | None, heartbeat_age: float | None, path=None):
+    heartbeat = None if heartbeat_age is None else datetime.now(timezone.utc) - timedelta(seconds=heartbeat_age)
+    db.add(models.IngestJob(
+        id=job_id, owner_email=OWNER, status=status, worker_id=worker_id, heartbeat_at=heartbeat, spool_path=path,
+    ))
+    await db.commit()
+
+
+async def _statuses(db) -> dict:
+    db.expire_all()
+    return dict((await db.execute(select(models.IngestJob.id, models.IngestJob.status))).all())
+
+
+async def test_job_runs_in_background_and_reports_progress(db):
+    runner = IngestJobRunner()
+    with tempfile.NamedTemporaryFile(prefix="ingest-", delete=False) as fh:
+        fh.write(CSV)
+    db.add(models.IngestJob(id="job", owner_email=OWNER, status="queued", total_bytes=len(CSV)))
+    await db.commit()
+
+    runner.submit("job", fh.name, OWNER)
+    await asyncio.gather(*runner._tasks)
+    assert not os.path.exists(fh.name)
+
+    db.expire_all()
+    progress = await get_ingest_job("job", current_user=models.User(email=OWNER), db=db)
+    assert progress["status"] == "done"
+    assert (progress["rows_processed"], progress["inserted"], progress["error_count"]) == (2, 1, 1)
+    assert progress["errors"][0]["row"] == 3
+    assert progress["bytes_read"] == progress["total_bytes"] == len(CSV)
+    assert progress["rows_per_second"] > 0 and progress["eta_seconds"] is None
+
+
+async def test_recover_only_touches_jobs_of_dead_workers(db):
+    runner = IngestJobRunner()
+    dead_path, live_path = spool(), spool()
+    try:
+        await _add_job(db, "dead-running", "running", "other:1", 3600, dead_path)
+        await _add_job(db, "dead-queued", "queued", "other:1", 3600)
+        await _add_job(db, "legacy", "running", None, None)
+        await _add_job(db, "live-sibling", "running", "other:2", 1, live_path)
+        await _add_job(db, "mine", "queued", runner.worker_id, 3600)
+        await _add_job(db, "done", "done", "other:1", 3600)
+
+        await runner.recover()
+
+        assert not os.path.exists(dead_path) and os.path.exists(live_path)
+    finally:
+        os.unlink(live_path)
+    assert await _statuses(db) == {
+        "dead-running": "failed", "dead-queued": "failed", "legacy": "failed",
+        "live-sibling": "running", "mine": "queued", "done": "done",
+    }
+    detail = (await db.execute(select(models.IngestJob.detail).where(models.IngestJob.id == "dead-running"))).scalar_one()
+    assert "envie o arquivo novamente" in detail
+
+
+async def test_claim_enforces_per_user_cap_across_workers(db, monkeypatch):
+    monkeypatch.setattr("services.jobs.settings.INGEST_JOBS_PER_USER", 1)
+    runner = IngestJobRunner()
+    await _add_job(db, "sibling", "running", "other:2", 1)
+    await _add_job(db, "new", "queued", runner.worker_id, 0)
+
+    assert not await runner._claim("new", OWNER)
+    assert (await _statuses(db))["new"] == "queued"
+
+    # Worker irmão morreu: o job dele não ocupa mais a vaga
+    await db.execute(models.IngestJob.__table__.update().where(models.IngestJob.id == "sibling").values(
+        heartbeat_at=datetime.now(timezone.utc) - timedelta(hours=1),
+    ))
+    await db.commit()
+    assert await runner._claim("new", OWNER)
+    job = await db.get(models.IngestJob, "new")
+    await db.refresh(job)
+    assert (job.status, job.worker_id) == ("running", runner.worker_id) and job.started_at is not None
+
+
+async def test_per_user_semaphore_released_when_idle(monkeypatch):
+    runner = IngestJobRunner()
+    gate = asyncio.Event()
+
+    async def claim(*args):
+        return True
+
+    async def process(*args):
+        await gate.wait()
+
+    monkeypatch.setattr(runner, "_claim", claim)
+    monkeypatch.setattr(runner, "_process", process)
+    for job_id in ("a", "b", "c"):
+        runner.submit(job_id, "/nonexistent", OWNER)
+    await asyncio.sleep(0)
+    assert list(runner._per_user) == [OWNER]
+
+    gate.set()
+    await asyncio.gather(*runner._tasks)
+    assert runner._per_user == {} and runner._per_user_jobs == {}
@@ -0,0 +1,88 @@
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import text
+
+from migrations import run_migrations
+from services.partitions import measurement_partitions
+
+pytestmark = pytest.mark.anyio
+
+
+async def _rerun(db, name: str) -> None:
+    await db.execute(text("DELETE FROM schema_migrations WHERE name = :name"), {"name": name})
+    await run_migrations(await db.connection())
+    await db.commit()
+
+
+async def test_017_renumbers_duplicate_player_codes(db):
+    # Estado deixado pelo gerador antigo: códigos repetidos, sem índice único
+    await db.execute(text("DROP INDEX ux_players_owner_player_code"))
+    await db.execute(text("DELETE FROM player_code_sequences"))
+    codes = ["FLACOA001", "FLACOA002", "FLACOA002", "FLACOA002", "SAOCOA001"]
+    for n, code in enumerate(codes):
+        await db.execute(text(
+            "INSERT INTO players (id, first_name, last_name, owner_email, club_code, player_code, external_ids, created_at) "
+            "VALUES (:id, 'P', :last, 'c@x.com', :club, CAST(:code AS varchar), "
+            "json_build_object('manual', json_build_object('player_code', CAST(:code AS varchar), 'coach_code', 'COA')), "
+            "now() + make_interval(secs => CAST(:n AS int)))"
+        ), {"id": uuid.uuid4(), "last": str(n), "club": code[:3], "code": code, "n": n})
+    await db.commit()
+
+    await _rerun(db, "017_player_code_sequences")
+
+    rows = (await db.execute(text(
+        "SELECT last_name, player_code, external_ids -> 'manual' ->> 'player_code' FROM players ORDER BY last_name"
+    ))).all()
+    assert [code for _, code, _ in rows] == ["FLACOA001", "FLACOA002", "FLACOA003", "FLACOA004", "SAOCOA001"]
+    assert all(code == manual for _, code, manual in rows)
+    seqs = dict((await db.execute(text("SELECT club_code, last_value FROM player_code_sequences"))).all())
+    assert seqs == {"FLA": 4, "SAO": 1}
+
+
+async def test_005_backfills_daily_metrics_from_existing_measurements(db):
+    # Banco anterior ao agregado: medições gravadas, player_daily_metrics vazia
+    await measurement_partitions.ensure([datetime(2026, 3, 1, tzinfo=timezone.utc)])
+    pid = uuid.uuid4()
+    await db.execute(text("INSERT INTO players (id, first_name, last_name, external_ids) VALUES (:id, 'A', 'B', json_build_object())"), {"id": pid})
+    for metric, value, ts in [
+        ("hrv_rmssd", 60.0, "2026-03-01T08:00:00Z"),
+        ("hrv_rmssd", 70.0, "2026-03-01T20:00:00Z"),
+        ("total_distance", 400.0, "2026-03-01T10:00:00Z"),
+        ("total_distance", 300.0, "2026-03-02T10:00:00Z"),
+    ]:
+        await db.execute(text(
+            "INSERT INTO measurements (player_id, metric, value, unit, recorded_at, source, meta) "
+            "VALUES (:pid, :metric, :value, '', :ts, 'csv', json_build_object())"
+        ), {"pid": pid, "metric": metric, "value": value, "ts": datetime.fromisoformat(ts)})
+    await db.execute(text("DELETE FROM player_daily_metrics"))
+    await db.commit()
+
+    await _rerun(db, "005_player_daily_metrics_backfill")
+
+    rows = (await db.execute(text(
+        "SELECT day::text, load_total, load_count, hrv_sum, hrv_count FROM player_daily_metrics ORDER BY day"
+    ))).all()
+    assert rows == [("2026-03-01", 400.0, 1, 130.0, 2), ("2026-03-02", 300.0, 1, 0.0, 0)]
+
+
+async def test_023_converts_known_units_and_skips_unknown_ones(db):
+    await measurement_partitions.ensure([datetime(2026, 3, 1, tzinfo=timezone.utc)])
+    pid = uuid.uuid4()
+    await db.execute(text("INSERT INTO players (id, first_name, last_name, external_ids) VALUES (:id, 'A', 'B', json_build_object())"), {"id": pid})
+    for n, (metric, value, unit) in enumerate([
+        ("Total Distance", 5.0, "km"),
+        ("total_distance", 300.0, ""),
+        ("total_distance", 12.0, "furlong"),
+    ]):
+        await db.execute(text(
+            "INSERT INTO measurements (player_id, metric, value, unit, recorded_at, source, meta) "
+            "VALUES (:pid, :metric, :value, :unit, :ts, 'csv', json_build_object())"
+        ), {"pid": pid, "metric": metric, "value": value, "unit": unit, "ts": datetime(2026, 3, 1, n, tzinfo=timezone.utc)})
+    await db.commit()
+
+    await _rerun(db, "023_canonical_metric_names")
+
+    rows = (await db.execute(text("SELECT metric, value, unit FROM measurements ORDER BY recorded_at"))).all()
+    assert rows == [("total_distance", 5000.0, "m"), ("total_distance", 300.0, "m"), ("total_distance", 12.0, "furlong")]
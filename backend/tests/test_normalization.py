@@ -0,0 +1,56 @@
+import pytest
+
+from services.normalization import MetricResolver, find_date_key, metric_resolver, normalize_unit
+
+
+def test_aliases_fold_case_spaces_and_separators():
+    assert metric_resolver.resolve("Total Distance") == "total_distance"
+    assert metric_resolver.resolve("  total-DISTANCE ") == "total_distance"
+    assert metric_resolver.resolve("rMSSD") == "hrv_rmssd"
+    assert metric_resolver.resolve("Max Velocity") == "max_speed"
+
+
+def test_unknown_metric_becomes_snake_case_but_is_not_known():
+    assert metric_resolver.resolve("Some New Metric") == "some_new_metric"
+    assert metric_resolver.known("Some New Metric") is None
+    assert metric_resolver.known("HSR Distance") == "high_speed_distance"
+
+
+def test_memo_is_bounded():
+    resolver = MetricResolver({"A": "a"}, max_memo=3)
+    for n in range(10):
+        resolver.resolve(f"m{n}")
+    assert len(resolver._memo) <= 3
+
+
+@pytest.mark.parametrize("metric, value, unit, expected", [
+    ("total_distance", 5.5, "km", (5500.0, "m")),
+    ("total_distance", 100.0, "yd", (91.44, "m")),
+    ("total_distance", 7000.0, "m", (7000.0, "m")),
+    ("total_distance", 7000.0, "", (7000.0, "m")),
+    ("max_speed", 10.0, "m/s", (36.0, "km/h")),
+    ("max_speed", 10.0, "mph", (16.09344, "km/h")),
+    ("hrv_rmssd", 0.06, "s", (60.0, "ms")),
+    ("player_load", 400.0, "au", (400.0, "au")),  # sem unidade canônica: fica a recebida
+])
+def test_normalize_unit_converts_to_canonical(metric, value, unit, expected):
+    converted, canonical = normalize_unit(metric, value, unit)
+    assert canonical == expected[1]
+    assert converted == pytest.approx(expected[0])
+
+
+def test_incompatible_unit_is_an_error():
+    with pytest.raises(ValueError, match="incompatível"):
+        normalize_unit("total_distance", 5.0, "km/h")
+
+
+@pytest.mark.parametrize("unit", ["furlong", "kn", "metros por segundo"])
+def test_unknown_unit_is_an_error_not_the_canonical_one(unit):
+    with pytest.raises(ValueError, match="desconhecida"):
+        normalize_unit("total_distance", 5.0, unit)
+
+
+def test_find_date_key_prefers_recorded_at():
+    assert find_date_key(["Date", "recorded_at"]) == "recorded_at"
+    assert find_date_key(["Player", "DATA"]) == "DATA"
+    assert find_date_key(["Player"]) is None
@@ -0,0 +1,51 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException, Response
+
+import models
+from core.pagination import decode_cursor, encode_cursor
+from routers.players import list_players
+
+
+@pytest.mark.parametrize("ts, key, key_type", [
+    (datetime(2026, 3, 1, 10, 0, 0, 123456, tzinfo=timezone.utc), uuid.uuid4(), uuid.UUID),
+    (datetime(2026, 3, 1, 7, 0, tzinfo=timezone(timedelta(hours=-3))), 42, int),
+])
+def test_cursor_round_trip(ts, key, key_type):
+    cursor = encode_cursor(ts, key)
+    assert "=" not in cursor
+    assert decode_cursor(cursor, key_type) == (ts, key)
+
+
+@pytest.mark.parametrize("cursor", ["###", encode_cursor(datetime(2026, 3, 1), "nao-e-uuid"), "bm9waXBl"])
+def test_tampered_cursor_is_400(cursor):
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor(cursor)
+    assert exc.value.status_code == 400
+
+
+@pytest.mark.anyio
+async def test_player_pages_cover_every_row_once(db):
+    # Vários atletas com o mesmo created_at: o id desempata no keyset
+    base = datetime(2026, 3, 1, tzinfo=timezone.utc)
+    expected = []
+    for i in range(7):
+        pid = uuid.uuid4()
+        created_at = base + timedelta(minutes=i // 3)
+        db.add(models.Player(id=pid, first_name=f"P{i}", owner_email="coach@x.com", player_code=f"C{i}", created_at=created_at))
+        expected.append((created_at, pid))
+    db.add(models.Player(id=uuid.uuid4(), first_name="Outro", owner_email="other@x.com", player_code="X1", created_at=base))
+    await db.commit()
+
+    user = models.User(email="Coach@x.com")
+    seen, cursor = [], None
+    while True:
+        response = Response()
+        page = await list_players(response, limit=3, cursor=cursor, current_user=user, db=db)
+        seen += [p.id for p in page]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert seen == [pid for _, pid in sorted(expected, reverse=True)]
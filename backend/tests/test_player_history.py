@@ -0,0 +1,65 @@
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import models
+from routers.players import get_player_history
+from services.partitions import measurement_partitions
+
+pytestmark = pytest.mark.anyio
+
+START = datetime.now(timezone.utc).replace(hour=8, minute=0, second=0, microsecond=0) - timedelta(days=3)
+# Instantes com fração de segundo: nenhum modo pode arredondar para o segundo
+TIMES = [START + timedelta(minutes=k, milliseconds=250 * k, microseconds=7) for k in range(10)]
+
+
+async def _player_with_hrv(db) -> uuid.UUID:
+    await measurement_partitions.ensure(TIMES)
+    pid = uuid.uuid4()
+    db.add(models.Player(id=pid, first_name="Ana", owner_email="coach@x.com"))
+    await db.flush()
+    db.add_all(
+        models.Measurement(player_id=pid, metric="hrv_rmssd", value=50.0 + (k % 3) * 10, unit="ms", recorded_at=ts)
+        for k, ts in enumerate(TIMES)
+    )
+    await db.commit()
+    return pid
+
+
+async def _history(db, pid, **params):
+    params = {"days": 28, "metric": None, "format": "points", "bucket": None, "points": None, **params}
+    out = await get_player_history(player_id=pid, _current_user=None, db=db, **params)
+    return json.loads(out.body) if params["format"] == "columnar" else out
+
+
+async def test_points_keep_the_recorded_precision(db):
+    pid = await _player_with_hrv(db)
+    history = await _history(db, pid)
+    assert [p["date"] for p in history["hrv_rmssd"]] == [ts.isoformat() for ts in TIMES]
+
+
+async def test_columnar_and_lttb_use_milliseconds(db):
+    pid = await _player_with_hrv(db)
+    millis = [int(ts.timestamp() * 1000) for ts in TIMES]
+    columnar = await _history(db, pid, format="columnar")
+    assert columnar["hrv_rmssd"]["t"] == millis
+
+    reduced = await _history(db, pid, format="columnar", points=4)
+    assert len(reduced["hrv_rmssd"]["t"]) == 4
+    assert set(reduced["hrv_rmssd"]["t"]) <= set(millis)
+    # Os mesmos pontos escolhidos pelo LTTB, no formato points
+    by_ms = dict(zip(millis, TIMES))
+    points = await _history(db, pid, points=4)
+    assert [p["date"] for p in points["hrv_rmssd"]] == [by_ms[t].isoformat() for t in reduced["hrv_rmssd"]["t"]]
+
+
+async def test_buckets_start_at_midnight_utc(db):
+    pid = await _player_with_hrv(db)
+    day = START.replace(hour=0)
+    columnar = await _history(db, pid, format="columnar", bucket="day")
+    assert columnar["hrv_rmssd"]["t"] == [int(day.timestamp() * 1000)]
+    assert columnar["hrv_rmssd"]["n"] == [len(TIMES)]
+    points = await _history(db, pid, bucket="day")
+    assert points["hrv_rmssd"][0]["date"] == day.isoformat()
@@ -0,0 +1,63 @@
+import uuid
+
+import pytest
+from sqlalchemy import update
+
+import models
+from services.ingestion import BulkIngestor
+from services.rankings import RankingCache, ranking_cache
+
+pytestmark = pytest.mark.anyio
+
+OWNER = "coach@x.com"
+ASSESSMENT = {"velocidade_sprint": 3.2, "agilidade": 10.0, "salto_vertical": 50, "finalizacao": 7}
+
+
+async def _add_player(db, first_name: str, assessment=ASSESSMENT) -> uuid.UUID:
+    pid = uuid.uuid4()
+    db.add(models.Player(id=pid, first_name=first_name, owner_email=OWNER, external_ids={"assessment": assessment}))
+    await db.commit()
+    return pid
+
+
+async def test_cached_until_invalidated(db):
+    cache = RankingCache(ttl=300)
+    await _add_player(db, "Ana")
+    first = await cache.table(db, OWNER.upper())
+    await _add_player(db, "Bia")
+    assert await cache.table(db, OWNER) is first
+
+    cache.invalidate(OWNER)
+    assert sorted(p["first_name"] for p in (await cache.table(db, OWNER)).players) == ["Ana", "Bia"]
+
+
+async def test_entries_expire_after_ttl(db, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr("services.rankings.time.monotonic", lambda: clock[0])
+    cache = RankingCache(ttl=60)
+    pid = await _add_player(db, "Ana")
+    before = (await cache.table(db, OWNER)).scores.copy()
+
+    await db.execute(update(models.Player).where(models.Player.id == pid).values(
+        external_ids={"assessment": {**ASSESSMENT, "finalizacao": 10}},
+    ))
+    await db.commit()
+    clock[0] += 59
+    assert ((await cache.table(db, OWNER)).scores == before).all()
+    clock[0] += 2
+    assert ((await cache.table(db, OWNER)).scores != before).any()
+
+
+async def test_zero_ttl_disables_cache(db):
+    cache = RankingCache(ttl=0)
+    await _add_player(db, "Ana")
+    assert await cache.table(db, OWNER) is not await cache.table(db, OWNER)
+
+
+async def test_ingest_invalidates_owner(db):
+    ranking_cache.invalidate()
+    await _add_player(db, "Ana")
+    table = await ranking_cache.table(db, OWNER)
+    ingestor = BulkIngestor(db, owner_email=OWNER)
+    await ingestor.finish()
+    assert await ranking_cache.table(db, OWNER) is not table
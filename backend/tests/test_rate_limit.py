@@ -0,0 +1,57 @@
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from core import rate_limit
+from core.rate_limit import SlidingWindowLimiter, client_ip
+
+
+def make_request(peer: str, **headers: str) -> Request:
+    return Request({
+        "type": "http",
+        "headers": [(k.replace("_", "-").encode(), v.encode()) for k, v in headers.items()],
+        "client": (peer, 12345),
+    })
+
+
+@pytest.fixture
+def trusted(monkeypatch):
+    monkeypatch.setattr(rate_limit, "trusted_proxies", rate_limit._parse_networks("10.0.0.0/8, ::1"))
+
+
+def test_forwarded_headers_ignored_without_trusted_proxy():
+    req = make_request("203.0.113.5", x_forwarded_for="1.2.3.4", x_real_ip="5.6.7.8")
+    assert client_ip(req) == "203.0.113.5"
+
+
+def test_forwarded_for_from_trusted_proxy(trusted):
+    # Cliente forjou o primeiro endereço; vale o mais à direita fora dos proxies
+    req = make_request("10.0.0.2", x_forwarded_for="6.6.6.6, 198.51.100.7, 10.0.0.9")
+    assert client_ip(req) == "198.51.100.7"
+    assert client_ip(make_request("10.0.0.2", x_real_ip="198.51.100.8")) == "198.51.100.8"
+    assert client_ip(make_request("10.0.0.2")) == "10.0.0.2"
+    assert client_ip(make_request("203.0.113.5", x_forwarded_for="1.2.3.4")) == "203.0.113.5"
+
+
+def test_limit_and_reset():
+    limiter = SlidingWindowLimiter(limit=2, window=60)
+    limiter.hit("ip:a")
+    limiter.hit("ip:a")
+    with pytest.raises(HTTPException) as exc:
+        limiter.hit("ip:a", "ip:b")
+    assert exc.value.status_code == 429 and int(exc.value.headers["Retry-After"]) >= 1
+    limiter.hit("ip:b")  # a rejeitada não conta para as outras chaves
+
+    limiter.record("email:x", "email:x")
+    with pytest.raises(HTTPException):
+        limiter.check("email:x")
+    limiter.reset("email:x")
+    limiter.check("email:x")
+    assert limiter.stats()["rejected"] == 2
+
+
+def test_disabled_limiter_never_rejects():
+    limiter = SlidingWindowLimiter(limit=0, window=60)
+    for _ in range(5):
+        limiter.hit("ip:a")
+    assert limiter.stats()["tracked_keys"] == 0
@@ -0,0 +1,147 @@
+import random
+import statistics
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import models
+from services.partitions import measurement_partitions
+from services.readiness import HRV_METRIC, LOAD_METRIC, load_daily_metrics, rebuild_daily_metrics, summarize_daily
+
+NOW = datetime(2026, 3, 29, 13, 0, tzinfo=timezone.utc)
+
+
+def per_measurement_summary(readings, now):
+    """Regras como eram antes dos agregados diários (uma leitura por vez), para comparação."""
+    data = defaultdict(list)
+    for ts, metric, value in readings:
+        if ts >= now - timedelta(days=28):
+            data[metric].append((ts, value))
+    alerts, summary = [], []
+    if HRV_METRIC in data:
+        vals = sorted(data[HRV_METRIC], key=lambda x: x[0], reverse=True)
+        if len(vals) >= 3:
+            avg_3 = statistics.mean(v for _, v in vals[:3])
+            rest = [v for _, v in vals[3:]]
+            if len(rest) >= 5:
+                avg_chronic = statistics.mean(rest)
+                drop_pct = (avg_chronic - avg_3) / avg_chronic * 100
+                summary.append(f"HRV Recente (3d): {avg_3:.1f}ms | Basal: {avg_chronic:.1f}ms")
+                if drop_pct > 20:
+                    alerts.append(f"ALERTA CRÍTICO: Queda de {drop_pct:.1f}% no HRV. Sinal forte de fadiga acumulada ou má recuperação.")
+                elif drop_pct > 10:
+                    alerts.append(f"ATENÇÃO: Queda de {drop_pct:.1f}% no HRV. Monitorar carga.")
+            else:
+                summary.append(f"HRV Recente: {avg_3:.1f}ms (Sem histórico suficiente para baseline)")
+    if LOAD_METRIC in data:
+        vals = data[LOAD_METRIC]
+        acute = sum(v for ts, v in vals if (now - ts).days <= 7)
+        chronic_avg = sum(v for ts, v in vals if (now - ts).days <= 28) / 4
+        if chronic_avg > 0:
+            acwr = acute / chronic_avg
+            summary.append(f"ACWR (Carga Aguda/Crônica): {acwr:.2f}")
+            if acwr > 1.5:
+                alerts.append(f"RISCO DE LESÃO: ACWR de {acwr:.2f} (Muito alto). Pico agudo de carga.")
+            elif acwr < 0.8:
+                alerts.append(f"Destreinamento: ACWR de {acwr:.2f} (Baixo).")
+    return summary, alerts
+
+
+def daily_rows(readings, now):
+    """O que player_daily_metrics + load_daily_metrics devolvem para essas leituras."""
+    days = defaultdict(lambda: [0.0, 0.0, 0])
+    for ts, metric, value in readings:
+        agg = days[ts.astimezone(timezone.utc).date()]
+        if metric == LOAD_METRIC:
+            agg[0] += value
+        elif metric == HRV_METRIC:
+            agg[1] += value
+            agg[2] += 1
+    since = (now - timedelta(days=28)).date()
+    return [(day, *agg) for day, agg in sorted(days.items(), reverse=True) if day >= since]
+
+
+def random_readings(rng: random.Random):
+    """
+    Uma leitura de HRV por dia (às 7h) e cargas ao longo do dia, longe das
+    viradas de janela. Valores inteiros: as médias saem iguais nas duas versões
+    (statistics.mean é exata, a diária é soma/contagem em float).
+    """
+    readings = []
+    fatigue = rng.random() < 0.5
+    spike = rng.random() < 0.4
+    for k in range(28):
+        day = NOW.replace(hour=0) - timedelta(days=k)
+        if rng.random() < 0.85:
+            hrv = rng.gauss(60, 4) * (0.7 if fatigue and k < 3 else 1.0)
+            readings.append((day + timedelta(hours=7), HRV_METRIC, round(hrv)))
+        for hour in rng.sample(range(8, 13), rng.randint(0, 2)):
+            load = rng.uniform(3000, 9000) * (2.5 if spike and k <= 7 else 1.0)
+            readings.append((day + timedelta(hours=hour), LOAD_METRIC, round(load)))
+    return readings
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_daily_rules_match_per_measurement_rules(seed):
+    readings = random_readings(random.Random(seed))
+    result = summarize_daily(daily_rows(readings, NOW), now=NOW)
+    assert (result["summary"], result["alerts"]) == per_measurement_summary(readings, NOW)
+
+
+def test_risk_weights():
+    rng = random.Random(3)
+    rows = [(NOW.date() - timedelta(days=k), 0.0, 40.0 if k < 3 else 60.0, 1) for k in range(10)]
+    assert summarize_daily(rows, now=NOW)["risk"] == 3
+    rows = [(NOW.date() - timedelta(days=k), 20000.0 if k < 3 else rng.uniform(1, 2), 0.0, 0) for k in range(20)]
+    result = summarize_daily(rows, now=NOW)
+    assert result["acwr"] > 1.5 and result["risk"] == 2
+    assert summarize_daily([], now=NOW)["risk"] == 0
+
+
+def test_recent_hrv_uses_days_not_readings():
+    # Duas leituras por dia: a versão antiga pegava as 3 últimas leituras
+    # (1,5 dia); a diária pega os 3 últimos dias com leitura (6 leituras)
+    readings = []
+    for k in range(8):
+        day = NOW.replace(hour=0) - timedelta(days=k)
+        readings += [(day + timedelta(hours=7), HRV_METRIC, 40.0 if k == 0 else 60.0),
+                     (day + timedelta(hours=19), HRV_METRIC, 40.0 if k == 0 else 60.0)]
+    old_summary, old_alerts = per_measurement_summary(readings, NOW)
+    result = summarize_daily(daily_rows(readings, NOW), now=NOW)
+    assert old_summary == ["HRV Recente (3d): 46.7ms | Basal: 60.0ms"]
+    assert result["hrv_recent"] == pytest.approx((40 * 2 + 60 * 4) / 6)
+    assert result["hrv_baseline"] == 60.0
+    assert old_alerts and old_alerts[0].startswith("ALERTA CRÍTICO")
+    assert result["alerts"][0].startswith("ATENÇÃO")
+
+
+def test_acute_window_cuts_on_day_boundary():
+    now = NOW.replace(hour=1)
+    # 7 dias e 2 horas antes de `now`: agudo por timestamp, fora pelo dia (hoje - 8)
+    edge = now - timedelta(days=7, hours=2)
+    readings = [(edge, LOAD_METRIC, 1000.0), (now - timedelta(days=20), LOAD_METRIC, 1000.0)]
+    old_summary, _ = per_measurement_summary(readings, now)
+    result = summarize_daily(daily_rows(readings, now), now=now)
+    assert old_summary == ["ACWR (Carga Aguda/Crônica): 2.00"]
+    assert result["acwr"] == 0.0 and result["acute_load"] == 0.0
+
+
+@pytest.mark.anyio
+async def test_daily_rows_helper_matches_database(db):
+    readings = random_readings(random.Random(5))
+    # Partições antes de qualquer escrita: o DDL esperaria pela transação da sessão
+    await measurement_partitions.ensure([ts for ts, _, _ in readings])
+    pid = uuid.uuid4()
+    db.add(models.Player(id=pid, first_name="Ana", owner_email="c@x.com"))
+    await db.flush()
+    db.add_all(models.Measurement(player_id=pid, metric=metric, value=value, unit="", recorded_at=ts)
+               for ts, metric, value in readings)
+    await db.flush()
+    await rebuild_daily_metrics(db)
+    await db.commit()
+
+    rows = (await load_daily_metrics(db, [pid], now=NOW))[pid]
+    expected = [(day, load, hrv, count) for day, load, hrv, count in daily_rows(readings, NOW) if load or count]
+    assert [(d, pytest.approx(l), pytest.approx(h), c) for d, l, h, c in rows] == expected
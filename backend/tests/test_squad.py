@@ -0,0 +1,59 @@
+import io
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import models
+from routers.squad import squad_readiness
+from services.ingestion import BulkIngestor, CSVStream
+from services.readiness import load_daily_metrics, summarize_daily
+
+pytestmark = pytest.mark.anyio
+
+HEADER = "first_name,last_name,external_id,metric,value,unit,recorded_at\n"
+
+
+def _csv(now: datetime) -> str:
+    lines = []
+    for k in range(28):
+        ts = (now - timedelta(days=k)).replace(hour=7, minute=0, second=0, microsecond=0).isoformat()
+        # Ana: HRV em queda nos 3 últimos dias + pico de carga na semana; Bia: estável
+        lines.append(f"Ana,Silva,A1,rMSSD,{40 if k < 3 else 60},ms,{ts}")
+        lines.append(f"Ana,Silva,A1,Total Distance,{15000 if k < 7 else 1000},m,{ts}")
+        lines.append(f"Bia,Souza,B1,rMSSD,60,ms,{ts}")
+        lines.append(f"Bia,Souza,B1,Total Distance,5000,m,{ts}")
+    return HEADER + "\n".join(lines) + "\n"
+
+
+async def _ingest(db, owner: str, content: str) -> None:
+    stream = CSVStream(io.BytesIO(content.encode()))
+    ingestor = BulkIngestor(db, owner_email=owner)
+    while batch := stream.read_batch(ingestor.read_size):
+        await ingestor.feed(batch)
+    await ingestor.finish()
+
+
+async def test_squad_sorted_by_risk_and_matches_summary(db):
+    now = datetime.now(timezone.utc)
+    await _ingest(db, "coach@x.com", _csv(now))
+    await _ingest(db, "other@x.com", HEADER + f"Caio,Lima,C1,rMSSD,50,ms,{now.isoformat()}\n")
+
+    result = await squad_readiness(current_user=models.User(email="Coach@x.com"), db=db)
+    players = result["players"]
+    assert [p["first_name"] for p in players] == ["Ana", "Bia"]
+    ana, bia = players
+    assert ana["risk"] == 5 and bia["risk"] == 0
+    assert ana["hrv_drop_pct"] == pytest.approx(33.3, abs=0.05) and ana["acwr"] > 1.5
+    assert len(ana["alerts"]) == 2 and bia["alerts"] == []
+
+    pid = uuid.UUID(ana["player_id"])
+    daily = await load_daily_metrics(db, [pid], now=result["generated_at"])
+    expected = summarize_daily(daily[pid], now=result["generated_at"])
+    assert ana["alerts"] == expected["alerts"]
+    assert ana["acwr"] == round(expected["acwr"], 2)
+
+
+async def test_empty_squad(db):
+    result = await squad_readiness(current_user=models.User(email="nobody@x.com"), db=db)
+    assert result["players"] == []
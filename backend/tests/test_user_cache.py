@@ -0,0 +1,70 @@
+import asyncio
+import uuid
+from datetime import timedelta
+
+import pytest
+from fastapi.security import HTTPAuthorizationCredentials
+
+import models
+from core import deps
+from core.deps import UserCache, get_current_user, get_current_user_record, notify_user_changed
+from core.security import create_access_token
+
+pytestmark = pytest.mark.anyio
+
+
+async def _wait_for(predicate, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline, "NOTIFY não chegou"
+        await asyncio.sleep(0.01)
+
+
+async def test_notify_from_another_session_invalidates(db):
+    cache = UserCache(ttl=300, max_entries=10)
+    await cache.listen()
+    try:
+        assert cache.stats()["listening"]
+        for email in ("a@x.com", "b@x.com"):
+            cache.set(models.User(id=uuid.uuid4(), email=email, password_hash="h", role="coach"))
+
+        await notify_user_changed(db, "A@x.com")
+        await db.commit()
+        await _wait_for(lambda: cache.get("a@x.com") is None)
+        assert cache.get("b@x.com") is not None
+
+        await notify_user_changed(db)
+        await db.commit()
+        await _wait_for(lambda: cache.get("b@x.com") is None)
+    finally:
+        await cache.close()
+    assert not cache.stats()["listening"]
+
+
+async def test_rolled_back_change_does_not_invalidate(db):
+    cache = UserCache(ttl=300, max_entries=10)
+    await cache.listen()
+    try:
+        cache.set(models.User(id=uuid.uuid4(), email="a@x.com", password_hash="h", role="coach"))
+        await notify_user_changed(db, "a@x.com")
+        await db.rollback()
+        await asyncio.sleep(0.1)
+        assert cache.get("a@x.com") is not None
+    finally:
+        await cache.close()
+
+
+async def test_stateless_mode_only_for_claim_fields(db, monkeypatch):
+    user = models.User(email="coach@x.com", password_hash="h", role="coach")
+    db.add(user)
+    await db.commit()
+    await db.refresh(user)
+    monkeypatch.setattr(deps.settings, "AUTH_STATELESS", True)
+    deps.user_cache.invalidate()
+    token = create_access_token({"sub": user.email, "role": "coach", "uid": str(user.id)}, timedelta(minutes=5))
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+    claims_only = await get_current_user(credentials, db)
+    assert (claims_only.id, claims_only.email, claims_only.role, claims_only.created_at) == (user.id, user.email, "coach", None)
+    full = await get_current_user_record(credentials, db)
+    assert full.created_at == user.created_at
@@ -0,0 +1,88 @@
+import io
+
+import pytest
+from sqlalchemy import select
+
+import models
+from services.ingestion import BulkIngestor, CSVStream, WideLayout
+
+WIDE = """Player Name,Player ID,Date,Total Distance (km),Max Velocity [m/s],rMSSD,Session Type
+Ana Maria Silva,E1,2026-03-01,5.5,8.5,60,Treino
+Bia Souza,E2,2026-03-01,4.2,,,Jogo
+Caio Lima,E3,2026-03-02,abc,7,55,Treino
+"""
+
+
+def stream(content: str) -> CSVStream:
+    return CSVStream(io.BytesIO(content.encode()))
+
+
+@pytest.mark.parametrize("header", [
+    "first_name,last_name,metric,value,unit,recorded_at",  # formato longo
+    "Player Name,Date,Session Type",  # nenhuma coluna de métrica
+    "Date,Total Distance,Max Speed",  # sem atleta
+    "Player Name,Total Distance,Max Speed",  # sem data
+])
+def test_detect_rejects_non_wide_headers(header):
+    assert WideLayout.detect(header.split(",")) is None
+
+
+def test_detect_columns_and_units():
+    layout = WideLayout.detect(stream(WIDE).fieldnames)
+    assert layout.date_key == "Date"
+    assert (layout.first_name, layout.full_name, layout.external_id) == (None, "Player Name", "Player ID")
+    assert layout.metric_columns == [
+        ("Total Distance (km)", "total_distance", "km"),
+        ("Max Velocity [m/s]", "max_speed", "m/s"),
+        ("rMSSD", "hrv_rmssd", ""),
+    ]
+    assert layout.rows_per_batch(1000) == 333 and layout.rows_per_batch(2) == 1
+
+
+def test_melt_splits_names_and_skips_empty_cells():
+    s = stream(WIDE)
+    layout = WideLayout.detect(s.fieldnames)
+    melted = list(layout.melt(s.read_batch(10)))
+    assert [(n, r["first_name"], r["last_name"], r["metric"], r["value"]) for n, r in melted] == [
+        (2, "Ana", "Maria Silva", "total_distance", "5.5"),
+        (2, "Ana", "Maria Silva", "max_speed", "8.5"),
+        (2, "Ana", "Maria Silva", "hrv_rmssd", "60"),
+        (3, "Bia", "Souza", "total_distance", "4.2"),
+        (4, "Caio", "Lima", "total_distance", "abc"),
+        (4, "Caio", "Lima", "max_speed", "7"),
+        (4, "Caio", "Lima", "hrv_rmssd", "55"),
+    ]
+    assert melted[0][1]["external_id"] == "E1" and melted[0][1]["recorded_at"] == "2026-03-01"
+    assert melted[0][1]["unit"] == "km" and melted[0][1]["column"] == "Total Distance (km)"
+
+
+def test_first_and_last_name_columns_take_precedence():
+    layout = WideLayout.detect(["first_name", "last_name", "Player Name", "date", "Total Distance"])
+    rows = list(layout.melt([(2, {"first_name": "Ana", "last_name": "Silva", "Player Name": "X Y", "date": "2026-03-01", "Total Distance": "1"})]))
+    assert (rows[0][1]["first_name"], rows[0][1]["last_name"]) == ("Ana", "Silva")
+
+
+@pytest.mark.anyio
+async def test_wide_ingest_writes_one_measurement_per_cell(db):
+    s = stream(WIDE)
+    layout = WideLayout.detect(s.fieldnames)
+    ingestor = BulkIngestor(db, owner_email="coach@x.com", chunk_size=2, layout=layout)
+    while batch := s.read_batch(ingestor.read_size):
+        await ingestor.feed(batch)
+    summary = await ingestor.finish()
+    assert (summary["inserted"], summary["error_count"]) == (6, 1)
+    assert summary["errors"][0]["row"] == 4 and "abc" in summary["errors"][0]["error"]
+
+    m, p = models.Measurement, models.Player
+    rows = (await db.execute(
+        select(p.first_name, p.prosoccer_id, m.metric, m.value, m.unit)
+        .join(p, p.id == m.player_id).order_by(p.first_name, m.metric)
+    )).all()
+    assert [tuple(r) for r in rows] == [
+        ("Ana", "E1", "hrv_rmssd", 60.0, "ms"),
+        ("Ana", "E1", "max_speed", pytest.approx(30.6), "km/h"),
+        ("Ana", "E1", "total_distance", 5500.0, "m"),
+        ("Bia", "E2", "total_distance", 4200.0, "m"),
+        ("Caio", "E3", "hrv_rmssd", 55.0, "ms"),
+        ("Caio", "E3", "max_speed", pytest.approx(25.2), "km/h"),
+    ]
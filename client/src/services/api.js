@@ -5,8 +5,15 @@ const api = axios.create({
 });
 
 export const getPlayers = async () => {
-    const response = await api.get('/players');
-    return response.data;
+    // A API pagina por cursor (header X-Next-Cursor)
+    const players = [];
+    let cursor = null;
+    do {
+        const response = await api.get('/players', { params: { limit: 500, cursor: cursor || undefined } });
+        players.push(...response.data);
+        cursor = response.headers['x-next-cursor'];
+    } while (cursor);
+    return players;
 };
 
 export const uploadCSV = async (file) => {
@@ -430,14 +430,23 @@ document.addEventListener('DOMContentLoaded', () => {
 
         if (elements.uploadStatus) elements.uploadStatus.textContent = 'Enviando...';
 
+        // Parquet/Arrow vão para o endpoint colunar (tipos lidos direto do arquivo)
+        const extension = file.name.split('.').pop().toLowerCase();
+        const endpoint = extension === 'parquet' ? 'parquet'
+            : ['arrow', 'feather', 'arrows', 'ipc'].includes(extension) ? 'arrow' : 'csv';
+
         try {
-            const response = await authorizedFetch(`${API_BASE_URL}/api/ingest/csv`, {
+            const response = await authorizedFetch(`${API_BASE_URL}/api/ingest/${endpoint}`, {
                 method: 'POST',
                 body: formData
             });
             if (!response.ok) throw new Error('Erro no upload');
             const res = await response.json();
-            if (elements.uploadStatus) elements.uploadStatus.textContent = `Sucesso: ${res.inserted} registros inseridos.`;
+            if (elements.uploadStatus) {
+                elements.uploadStatus.textContent = res.duplicate_of
+                    ? `Arquivo já importado (${res.duplicate_of.filename || 'sem nome'}); nada a fazer.`
+                    : `Sucesso: ${res.inserted} inseridos, ${res.updated} atualizados, ${res.skipped} já existentes.`;
+            }
         } catch (error) {
             console.error(error);
             if (elements.uploadStatus) elements.uploadStatus.textContent = 'Erro no upload.';
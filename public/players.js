@@ -51,9 +51,17 @@ document.addEventListener('DOMContentLoaded', () => {
   async function loadPlayers() {
     tbl.innerHTML = `<tr><td colspan="5" class="px-3 py-6 text-center text-white/70">Carregando...</td></tr>`;
     try {
-      const r = await af(`${API_BASE_URL}/api/players`);
-      if (!r.ok) throw new Error('Falha ao listar atletas');
-      cacheList = await r.json();
+      // A API pagina por cursor (header X-Next-Cursor)
+      const list = [];
+      let cursor = null;
+      do {
+        const qs = cursor ? `?limit=500&cursor=${encodeURIComponent(cursor)}` : '?limit=500';
+        const r = await af(`${API_BASE_URL}/api/players${qs}`);
+        if (!r.ok) throw new Error('Falha ao listar atletas');
+        list.push(...await r.json());
+        cursor = r.headers.get('X-Next-Cursor');
+      } while (cursor);
+      cacheList = list;
       renderTable();
     } catch (e) {
       tbl.innerHTML = `<tr><td colspan="5" class="px-3 py-6 text-center text-red-300">Erro ao carregar atletas.</td></tr>`;
@@ -884,11 +884,18 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     try {
-      const response = await authorizedFetch(`${API_BASE_URL}/api/reports`);
-      if (!response.ok) {
-        throw new Error('Falha ao carregar relatórios.');
-      }
-      const reports = await response.json();
+      // Lista só o resumo (id, nome, data), paginada por cursor (header X-Next-Cursor)
+      const reports = [];
+      let cursor = null;
+      do {
+        const qs = cursor ? `?limit=200&cursor=${encodeURIComponent(cursor)}` : '?limit=200';
+        const response = await authorizedFetch(`${API_BASE_URL}/api/reports${qs}`);
+        if (!response.ok) {
+          throw new Error('Falha ao carregar relatórios.');
+        }
+        reports.push(...await response.json());
+        cursor = response.headers.get('X-Next-Cursor');
+      } while (cursor);
       elements.reportsListContainer.innerHTML = '';
 
       if (reports.length === 0) {
@@ -909,11 +916,21 @@ document.addEventListener('DOMContentLoaded', () => {
             </button>
           `;
 
-          listItem.querySelector('.report-item-view').addEventListener('click', () => {
-            displayAnalysis(report.dados_atleta, report.analysis);
-            elements.resultsDiv.classList.remove('hidden');
-            elements.resultsDiv.scrollIntoView({ behavior: 'smooth' });
-            elements.reportsModal.classList.add('hidden');
+          listItem.querySelector('.report-item-view').addEventListener('click', async () => {
+            try {
+              const response = await authorizedFetch(`${API_BASE_URL}/api/reports/${report.id}`);
+              if (!response.ok) {
+                throw new Error('Falha ao carregar relatório.');
+              }
+              const full = await response.json();
+              displayAnalysis(full.dados_atleta, full.analysis);
+              elements.resultsDiv.classList.remove('hidden');
+              elements.resultsDiv.scrollIntoView({ behavior: 'smooth' });
+              elements.reportsModal.classList.add('hidden');
+            } catch (error) {
+              console.error('Erro ao carregar relatório:', error);
+              setAuthStatus('Não foi possível abrir o relatório.', true);
+            }
           });
 
           listItem.querySelector('.delete-report-btn').addEventListener('click', (e) => {